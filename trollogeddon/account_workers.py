@@ -0,0 +1,249 @@
+# Copyright 2023 resurtm@gmail.com
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the "Software"), to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions
+# of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED
+# TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF
+# CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+#
+# https://opensource.org/licenses/MIT
+
+
+"""Deletion of the messages of several accounts in parallel, one worker process per account.
+
+Every worker process runs its own event loop with its own Telegram client and rate limiter, so a flood wait of one
+account never slows the other accounts down. The progress of the workers is sent back over a queue, the cancellation
+is sent to the workers over a shared event.
+"""
+
+import asyncio
+import logging
+import multiprocessing
+import pickle
+import queue
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Callable, Collection, Dict, Final, List, Mapping, Optional
+
+from archive import account_archive_path
+from message_filter import MessageFilter
+from telegram import (
+    CancelToken,
+    DeletionProgress,
+    DeletionResult,
+    delete_messages,
+    shutdown,
+    use_account,
+)
+
+_LOGGER: Final = logging.getLogger(__name__)
+
+# Interval in seconds between the reads of the progress queue and the checks of the cancel event.
+_PROGRESS_POLL_INTERVAL: Final = 0.2
+
+# Progress queue of the current worker process, set by `_init_worker`.
+_events: Optional[Any] = None
+
+# Cancel event shared by the worker processes, set by `_init_worker`.
+_cancel_event: Optional[Any] = None
+
+
+@dataclass(frozen=True)
+class AccountProgress:
+    """Progress of the deletion from a single entity of an account."""
+
+    account: str
+    progress: DeletionProgress
+
+
+async def delete_in_workers(
+    entity_ids: Mapping[str, Collection[int]],
+    concurrency: int,
+    message_filter: MessageFilter,
+    on_progress: Callable[[AccountProgress], None],
+    cancel_token: Optional[CancelToken] = None,
+    archive_path: str = "",
+) -> Dict[str, Dict[int, DeletionResult]]:
+    """Delete the messages of several accounts in parallel, one worker process per account.
+
+    The callers have to `shutdown` the Telegram client of their own process first, so the session, the cache and the
+    journal files of the accounts are not used by two processes at the same time.
+
+    Args:
+        entity_ids: Entity IDs to be used to delete the messages from, mapped by the account names.
+        concurrency: Maximum amount of entities of each account which messages are being deleted from at the same time.
+        message_filter: Filter of the messages to be deleted, all the user's messages if it's empty.
+        on_progress: Called in the event loop of the caller with the progress of the workers.
+        cancel_token: Stops the deletion of all the accounts if provided and cancelled.
+        archive_path: Archives the messages before they're deleted if provided, each account gets its own archive
+            with the account name inserted into the file name.
+
+    Returns:
+        Deletion results mapped by entity IDs, mapped by the account names.
+    """
+    _LOGGER.debug("Delete in workers, begin, accounts: %s", list(entity_ids))
+
+    # Spawning is used since forking a process with the Qt state is not safe.
+    context = multiprocessing.get_context("spawn")
+    events = context.Queue()
+    cancel_event = context.Event()
+    loop = asyncio.get_running_loop()
+    with ProcessPoolExecutor(
+        max_workers=max(1, len(entity_ids)),
+        mp_context=context,
+        initializer=_init_worker,
+        initargs=(events, cancel_event),
+    ) as pool:
+        futures = {
+            account: loop.run_in_executor(
+                pool,
+                _delete_worker,
+                account,
+                list(ids),
+                concurrency,
+                message_filter.to_dict(),
+                account_archive_path(archive_path, account) if archive_path else "",
+            )
+            for account, ids in entity_ids.items()
+        }
+        pending = set(futures.values())
+        while pending:
+            _, pending = await asyncio.wait(pending, timeout=_PROGRESS_POLL_INTERVAL)
+            _drain_events(events, on_progress)
+            if cancel_token is not None and cancel_token.cancelled and not cancel_event.is_set():
+                _LOGGER.debug("Delete in workers, cancelled")
+                cancel_event.set()
+
+    results = {}
+    for account, future in futures.items():
+        try:
+            results[account] = future.result()
+        except Exception as error:
+            _LOGGER.error("Delete in workers, %s, failed: %r", account, error)
+            results[account] = {entity_id: DeletionResult(error=error) for entity_id in entity_ids[account]}
+
+    _LOGGER.debug("Delete in workers, end")
+    return results
+
+
+def _drain_events(events: Any, on_progress: Callable[[AccountProgress], None]) -> None:
+    """Pass all the progress events which are in the queue to the callback, without waiting for more.
+
+    Args:
+        events: Progress queue of the workers.
+        on_progress: Progress callback.
+    """
+    while True:
+        try:
+            event = events.get_nowait()
+        except queue.Empty:
+            return
+        on_progress(event)
+
+
+def _init_worker(events: Any, cancel_event: Any) -> None:
+    """Initialize the worker process.
+
+    Args:
+        events: Progress queue of the workers.
+        cancel_event: Cancel event shared by the workers.
+    """
+    global _events, _cancel_event
+    _events = events
+    _cancel_event = cancel_event
+
+
+def _delete_worker(
+    account: str, entity_ids: List[int], concurrency: int, filters: Dict[str, Any], archive_path: str = ""
+) -> Dict[int, DeletionResult]:
+    """Delete the messages of a single account in its own event loop. Runs in the worker process.
+
+    Args:
+        account: Name of the account.
+        entity_ids: Entity IDs to be used to delete the messages from.
+        concurrency: Maximum amount of entities which messages are being deleted from at the same time.
+        filters: Message filter converted to the dictionary.
+        archive_path: Path to the archive of the account, empty if the messages are not archived.
+
+    Returns:
+        Deletion results mapped by entity IDs.
+    """
+    return asyncio.run(
+        _delete_account(account, entity_ids, concurrency, MessageFilter.from_dict(filters), archive_path)
+    )
+
+
+async def _delete_account(
+    account: str, entity_ids: List[int], concurrency: int, message_filter: MessageFilter, archive_path: str = ""
+) -> Dict[int, DeletionResult]:
+    """Delete the messages of a single account and report the progress to the progress queue.
+
+    The deletion is cancelled once the cancel event shared by the workers is set.
+
+    Args:
+        account: Name of the account.
+        entity_ids: Entity IDs to be used to delete the messages from.
+        concurrency: Maximum amount of entities which messages are being deleted from at the same time.
+        message_filter: Filter of the messages to be deleted.
+        archive_path: Path to the archive of the account, empty if the messages are not archived.
+
+    Returns:
+        Deletion results mapped by entity IDs, with the errors which can be sent back to the parent process.
+    """
+    cancel_token = CancelToken()
+
+    def report(progress: DeletionProgress) -> None:
+        if _events is not None:
+            _events.put(AccountProgress(account, progress))
+
+    async def watch_cancel_event() -> None:
+        while _cancel_event is not None and not _cancel_event.is_set():
+            await asyncio.sleep(_PROGRESS_POLL_INTERVAL)
+        if _cancel_event is not None:
+            cancel_token.cancel()
+
+    watcher = asyncio.ensure_future(watch_cancel_event())
+    await use_account(account)
+    try:
+        results = await delete_messages(
+            entity_ids,
+            concurrency=concurrency,
+            message_filter=message_filter,
+            progress=report,
+            cancel_token=cancel_token,
+            archive_path=archive_path,
+        )
+    finally:
+        watcher.cancel()
+        await shutdown()
+    return {entity_id: _picklable(result) for entity_id, result in results.items()}
+
+
+def _picklable(result: DeletionResult) -> DeletionResult:
+    """Make sure the deletion result can be sent to the parent process.
+
+    Errors which can't be pickled, e.g. the ones holding the connection state, are replaced by runtime errors with
+    the same message.
+
+    Args:
+        result: Deletion result.
+
+    Returns:
+        The same result or its copy with the replaced error.
+    """
+    if result.error is None:
+        return result
+    try:
+        pickle.loads(pickle.dumps(result.error))
+        return result
+    except Exception:
+        error = RuntimeError(f"{type(result.error).__name__}: {result.error}")
+        return DeletionResult(deleted_count=result.deleted_count, error=error)
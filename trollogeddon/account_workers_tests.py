@@ -0,0 +1,113 @@
+# Copyright 2023 resurtm@gmail.com
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the "Software"), to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions
+# of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED
+# TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF
+# CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+#
+# https://opensource.org/licenses/MIT
+
+
+"""Deletion of the messages of several accounts in parallel. Tests."""
+
+import asyncio
+import queue
+import threading
+
+import pytest
+from account_workers import AccountProgress, _delete_account, _picklable
+from message_filter import MessageFilter
+from pytest_mock.plugin import MockerFixture
+from telegram import (
+    CancelToken,
+    DeletionCancelledError,
+    DeletionProgress,
+    DeletionResult,
+)
+
+
+@pytest.mark.asyncio
+async def test_delete_account(mocker: MockerFixture) -> None:
+    """Test the worker switches the account, reports the progress and shuts the client down.
+
+    Args:
+        mocker: Mocker fixture instance to mock the things.
+    """
+    events: queue.Queue = queue.Queue()
+    mocker.patch("account_workers._events", events)
+    use_account_mock = mocker.patch("account_workers.use_account")
+    shutdown_mock = mocker.patch("account_workers.shutdown")
+
+    async def delete_messages(entity_ids, concurrency, message_filter, progress, cancel_token, archive_path):
+        assert (entity_ids, concurrency, message_filter) == ([1, 2], 3, MessageFilter(search="x"))
+        assert archive_path == "archive-second.jsonl.gz"
+        assert isinstance(cancel_token, CancelToken)
+        progress(DeletionProgress(1, 100, 100, 10.0))
+        progress(DeletionProgress(1, 150, 150, 15.0, done=True))
+        return {1: DeletionResult(150), 2: DeletionResult(0, ValueError("boom"))}
+
+    mocker.patch("account_workers.delete_messages", delete_messages)
+
+    results = await _delete_account("second", [1, 2], 3, MessageFilter(search="x"), "archive-second.jsonl.gz")
+
+    assert list(results) == [1, 2]
+    assert results[1] == DeletionResult(150)
+    assert isinstance(results[2].error, ValueError)
+    use_account_mock.assert_awaited_once_with("second")
+    shutdown_mock.assert_awaited_once_with()
+    assert [events.get_nowait(), events.get_nowait()] == [
+        AccountProgress("second", DeletionProgress(1, 100, 100, 10.0)),
+        AccountProgress("second", DeletionProgress(1, 150, 150, 15.0, done=True)),
+    ]
+    assert events.empty()
+
+
+@pytest.mark.asyncio
+async def test_delete_account_cancelled(mocker: MockerFixture) -> None:
+    """Test the worker cancels its deletion once the shared cancel event is set.
+
+    Args:
+        mocker: Mocker fixture instance to mock the things.
+    """
+    cancel_event = threading.Event()
+    mocker.patch("account_workers._events", None)
+    mocker.patch("account_workers._cancel_event", cancel_event)
+    mocker.patch("account_workers._PROGRESS_POLL_INTERVAL", 0.01)
+    mocker.patch("account_workers.use_account")
+    mocker.patch("account_workers.shutdown")
+
+    async def delete_messages(entity_ids, concurrency, message_filter, progress, cancel_token, archive_path):
+        cancel_event.set()
+        while not cancel_token.cancelled:
+            await asyncio.sleep(0.01)
+        return {1: DeletionResult(0, DeletionCancelledError())}
+
+    mocker.patch("account_workers.delete_messages", delete_messages)
+
+    results = await asyncio.wait_for(_delete_account("second", [1], 3, MessageFilter()), timeout=5)
+
+    assert isinstance(results[1].error, DeletionCancelledError)
+
+
+def test_picklable() -> None:
+    """Test the errors which can't be sent to the parent process are replaced by the runtime errors."""
+
+    class LocalError(Exception):
+        """Error which can't be pickled since it's defined locally."""
+
+    result = _picklable(DeletionResult(5, LocalError("boom")))
+
+    assert result.deleted_count == 5
+    assert isinstance(result.error, RuntimeError)
+    assert str(result.error) == "LocalError: boom"
+    ok = DeletionResult(1)
+    assert _picklable(ok) is ok
@@ -21,15 +21,20 @@
 """Application entry file."""
 
 import asyncio
-import logging
 import sys
+from typing import Final
 
 import qasync  # type: ignore
+from app_logging import configure_logging
 from main_window import MainWindow
 from PySide6.QtWidgets import QApplication
+from settings import app_settings
+
+# Files the RPC metrics are written into on exit, in the JSON and the Prometheus text formats.
+_METRICS_DUMP_PATHS: Final = ("trollogeddon.metrics.json", "trollogeddon.metrics.prom")
 
 if __name__ == "__main__":
-    logging.basicConfig(level=logging.DEBUG)
+    log_listener = configure_logging(app_settings().log_level())
 
     app = QApplication(sys.argv)
     loop = qasync.QEventLoop(app)
@@ -37,6 +42,16 @@ if __name__ == "__main__":
 
     window = MainWindow()
     window.show()
+    # The window is painted before the deferred startup loads Telethon.
+    app.processEvents()
+    window.finish_startup()
 
     with loop:
         loop.run_forever()
+
+    # Imported once the event loop has finished, importing it on startup would load Telethon before the window.
+    from telegram import rpc_metrics
+
+    for path in _METRICS_DUMP_PATHS:
+        rpc_metrics().dump(path)
+    log_listener.stop()
@@ -0,0 +1,128 @@
+# Copyright 2023 resurtm@gmail.com
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the "Software"), to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions
+# of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED
+# TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF
+# CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+#
+# https://opensource.org/licenses/MIT
+
+
+"""Logging configuration and the throttled progress log used on the hot paths."""
+
+import logging
+import queue
+import time
+from logging.handlers import QueueHandler, QueueListener
+from typing import Callable, Final, Optional, TextIO
+
+# Level names which may be selected in the settings or on the command line.
+LOG_LEVELS: Final = ("DEBUG", "INFO", "WARNING", "ERROR")
+DEFAULT_LOG_LEVEL: Final = "WARNING"
+
+_LOG_FORMAT: Final = "%(asctime)s %(levelname)s %(name)s: %(message)s"
+
+
+def configure_logging(level: str, stream: Optional[TextIO] = None) -> QueueListener:
+    """Configure the root logger to write through a queue, so the event loop never waits for the console or files.
+
+    The records are only put into the queue by the logging calls, a background thread of the returned listener
+    formats and writes them. The listener has to be stopped on exit to flush the remaining records.
+
+    Args:
+        level: Name of the root logger level, one of `LOG_LEVELS`.
+        stream: Stream the records are written into, standard error if not provided.
+
+    Returns:
+        The started queue listener.
+    """
+    records: "queue.SimpleQueue[logging.LogRecord]" = queue.SimpleQueue()
+    handler = logging.StreamHandler(stream)
+    handler.setFormatter(logging.Formatter(_LOG_FORMAT))
+
+    root = logging.getLogger()
+    for existing in list(root.handlers):
+        root.removeHandler(existing)
+    root.addHandler(QueueHandler(records))
+    root.setLevel(level)
+
+    listener = QueueListener(records, handler)
+    listener.start()
+    return listener
+
+
+class ProgressLog:
+    """Aggregates the progress of a long operation into a log line every N items or every T seconds.
+
+    Adding progress is a couple of arithmetic operations, nothing is formatted until a line is due, so it's cheap
+    enough to be called for every processed batch.
+    """
+
+    def __init__(
+        self,
+        logger: logging.Logger,
+        label: str,
+        every_items: int = 1000,
+        every_seconds: float = 5.0,
+        level: int = logging.INFO,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        """Construct a new instance of the progress log.
+
+        Args:
+            logger: Logger the lines are written into.
+            label: Description of the operation which starts every line.
+            every_items: Write a line once this many items are added since the previous line.
+            every_seconds: Write a line once this many seconds passed since the previous line.
+            level: Level of the lines.
+            clock: Monotonic clock function, seconds.
+        """
+        self._logger = logger
+        self._label = label
+        self._every_items = every_items
+        self._every_seconds = every_seconds
+        self._level = level
+        self._clock = clock
+        self._started_at = self._logged_at = clock()
+        self._total = 0
+        self._pending = 0
+
+    @property
+    def total(self) -> int:
+        """Get the amount of the items added so far.
+
+        Returns:
+            The amount of the items.
+        """
+        return self._total
+
+    def add(self, count: int) -> None:
+        """Add the processed items, writing a line if it's due.
+
+        Args:
+            count: Amount of the newly processed items.
+        """
+        self._total += count
+        self._pending += count
+        if self._pending < self._every_items and self._clock() - self._logged_at < self._every_seconds:
+            return
+        self.flush()
+
+    def flush(self) -> None:
+        """Write a line with the current progress, if there's any progress since the previous line."""
+        now = self._clock()
+        if self._pending and self._logger.isEnabledFor(self._level):
+            elapsed = now - self._started_at
+            rate = self._total / elapsed if elapsed > 0 else 0.0
+            self._logger.log(self._level, "%s, %d items, %.1f items/s", self._label, self._total, rate)
+        self._pending = 0
+        self._logged_at = now
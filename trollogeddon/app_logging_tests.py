@@ -0,0 +1,76 @@
+# Copyright 2023 resurtm@gmail.com
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the "Software"), to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions
+# of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED
+# TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF
+# CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+#
+# https://opensource.org/licenses/MIT
+
+
+"""Logging configuration and the throttled progress log. Tests."""
+
+import io
+import logging
+from typing import Iterator, List
+
+import pytest
+from app_logging import ProgressLog, configure_logging
+
+
+@pytest.fixture
+def _restore_root_logger() -> Iterator[None]:
+    """Restore the root logger handlers and level replaced by the test."""
+    root = logging.getLogger()
+    handlers, level = list(root.handlers), root.level
+    yield
+    root.handlers[:] = handlers
+    root.setLevel(level)
+
+
+@pytest.mark.usefixtures("_restore_root_logger")
+def test_configure_logging() -> None:
+    """Test the records go through the queue and are written once the listener is stopped."""
+    stream = io.StringIO()
+    listener = configure_logging("INFO", stream)
+    logger = logging.getLogger("app_logging_tests")
+
+    logger.debug("hidden")
+    logger.info("shown %d", 1)
+    listener.stop()
+
+    assert "hidden" not in stream.getvalue()
+    assert stream.getvalue().endswith(" INFO app_logging_tests: shown 1\n")
+
+
+def test_progress_log(caplog: pytest.LogCaptureFixture) -> None:
+    """Test the progress is written every N items or every T seconds, not on every addition."""
+    now: List[float] = [0.0]
+    progress_log = ProgressLog(
+        logging.getLogger("app_logging_tests"), "Job", every_items=100, every_seconds=10.0, clock=lambda: now[0]
+    )
+
+    with caplog.at_level(logging.INFO):
+        for _ in range(25):
+            progress_log.add(10)
+        now[0] = 5.0
+        progress_log.add(10)
+        now[0] = 20.0
+        progress_log.add(10)
+        progress_log.flush()
+
+    assert progress_log.total == 270
+    assert [record.getMessage() for record in caplog.records] == [
+        "Job, 100 items, 0.0 items/s",
+        "Job, 200 items, 0.0 items/s",
+        "Job, 270 items, 13.5 items/s",
+    ]
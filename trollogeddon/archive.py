@@ -0,0 +1,200 @@
+# Copyright 2023 resurtm@gmail.com
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the "Software"), to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions
+# of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED
+# TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF
+# CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+#
+# https://opensource.org/licenses/MIT
+
+"""Compressed append-only archive of the user's messages which are written before they are deleted."""
+
+import gzip
+import json
+import logging
+import os
+import zlib
+from datetime import datetime
+from typing import Any, BinaryIO, Dict, Final, Iterator, List, Optional, Tuple
+
+_LOGGER: Final = logging.getLogger(__name__)
+
+# Default file name of the archive, one JSON object per line compressed with gzip.
+DEFAULT_ARCHIVE_NAME: Final = "trollogeddon-archive.jsonl.gz"
+# First bytes of a gzip member: the magic number and the deflate compression method.
+_GZIP_HEADER: Final = b"\x1f\x8b\x08"
+# Window bits which make zlib expect the gzip header and trailer.
+_GZIP_WBITS: Final = 16 + zlib.MAX_WBITS
+# Amount of the bytes read from the archive file at once.
+_READ_SIZE: Final = 64 * 1024
+
+
+class MessageArchive:
+    """Streams the messages into a gzip compressed JSON lines file, one message per line.
+
+    The file is opened for appending and every `flush` appends the buffered lines as a complete gzip member, which
+    `read_archive` reads as a single stream. The messages are deleted only once they are flushed, so a process killed
+    in the middle of a deletion leaves at most a truncated last member with the messages which were not deleted, and
+    the resumed deletion keeps extending the same archive after it.
+    """
+
+    def __init__(self, path: str) -> None:
+        """Construct a new instance of the archive, opening the file for appending.
+
+        Args:
+            path: Path to the archive file, the file is created if it doesn't exist.
+        """
+        _LOGGER.debug("MessageArchive, constructor, path: %s", path)
+        self.path = path
+        self._file = open(path, "ab")
+        self._lines: List[str] = []
+        self.count = 0
+
+    def write(self, entity_id: int, message: Any) -> None:
+        """Append the message to the archive.
+
+        Args:
+            entity_id: Entity ID of the dialog the message belongs to.
+            message: Telethon message.
+        """
+        self._lines.append(json.dumps(message_record(entity_id, message), ensure_ascii=False) + "\n")
+        self.count += 1
+
+    def flush(self) -> None:
+        """Write the buffered messages as a gzip member, so they survive the process being killed after the deletion."""
+        if not self._lines:
+            return
+        self._file.write(gzip.compress("".join(self._lines).encode("utf-8")))
+        self._file.flush()
+        self._lines = []
+
+    def close(self) -> None:
+        """Write the buffered messages and close the file."""
+        _LOGGER.debug("MessageArchive, close, messages: %d", self.count)
+        self.flush()
+        self._file.close()
+
+
+def message_record(entity_id: int, message: Any) -> Dict[str, Any]:
+    """Convert the message into the JSON serializable archive record.
+
+    Args:
+        entity_id: Entity ID of the dialog the message belongs to.
+        message: Telethon message.
+
+    Returns:
+        The archive record with the dialog, the ID, the date, the text, the media type and the replied message ID.
+    """
+    date: Optional[datetime] = getattr(message, "date", None)
+    media = getattr(message, "media", None)
+    return {
+        "entity_id": entity_id,
+        "id": message.id,
+        "date": date.isoformat() if date is not None else None,
+        "text": getattr(message, "message", None) or "",
+        "media": type(media).__name__ if media is not None else None,
+        "reply_to": getattr(message, "reply_to_msg_id", None),
+    }
+
+
+def read_archive(path: str) -> Iterator[Dict[str, Any]]:
+    """Read the archive records, line by line.
+
+    The damaged gzip members, e.g. the last one cut short by a killed process, are read up to their last complete
+    line and the members after them are read as usual.
+
+    Args:
+        path: Path to the archive file.
+
+    Yields:
+        The archive records in the order they were written.
+    """
+    with open(path, "rb") as file:
+        for data, complete in _read_members(file):
+            lines = data.decode("utf-8", errors="replace").split("\n")
+            # The last item is empty unless the member was cut short in the middle of a line.
+            for line in lines[:-1]:
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    if complete:
+                        raise
+                    _LOGGER.warning("Read archive, skipped a damaged line: %s", path)
+
+
+def _read_members(file: BinaryIO) -> Iterator[Tuple[bytes, bool]]:
+    """Decompress the gzip members of the file one by one, skipping the bytes which can't be decompressed.
+
+    Args:
+        file: Archive file opened for reading in the binary mode.
+
+    Yields:
+        The decompressed data of every member and whether the member was complete, i.e. its checksum matched.
+    """
+    buffer = b""
+    pieces: List[bytes] = []
+    decompressor: Optional[Any] = None
+    while True:
+        chunk = file.read(_READ_SIZE)
+        buffer += chunk
+        while buffer:
+            if decompressor is None:
+                start = buffer.find(_GZIP_HEADER)
+                if start < 0:
+                    # The header could be split between the reads.
+                    buffer = buffer[-len(_GZIP_HEADER) + 1 :] if chunk else b""
+                    break
+                buffer = buffer[start:]
+                decompressor = zlib.decompressobj(_GZIP_WBITS)
+                # Skipped when the member is damaged, so the search for the next member moves past its header.
+                skip = 1
+            intact = decompressor.copy()
+            try:
+                pieces.append(decompressor.decompress(buffer))
+            except zlib.error:
+                _LOGGER.warning("Read archive, damaged gzip member")
+                # The data decompressed before the damaged bytes is kept, byte by byte to find where they start.
+                for index in range(len(buffer)):
+                    try:
+                        pieces.append(intact.decompress(buffer[index : index + 1]))
+                    except zlib.error:
+                        break
+                yield b"".join(pieces), False
+                # The next member starts somewhere in the bytes the damaged one failed on.
+                buffer, pieces, decompressor = buffer[skip:], [], None
+                continue
+            skip = 0
+            if decompressor.eof:
+                yield b"".join(pieces), True
+                buffer, pieces, decompressor = decompressor.unused_data, [], None
+            else:
+                buffer = b""
+        if not chunk:
+            if decompressor is not None:
+                _LOGGER.warning("Read archive, truncated gzip member")
+                yield b"".join(pieces), False
+            return
+
+
+def account_archive_path(path: str, account: str) -> str:
+    """Get the archive path of the account, so the parallel account workers never append to the same file.
+
+    Args:
+        path: Archive path chosen by the user.
+        account: Name of the account.
+
+    Returns:
+        The path with the account name inserted before the extensions.
+    """
+    directory, name = os.path.split(path)
+    stem, dot, extensions = name.partition(".")
+    return os.path.join(directory, f"{stem}-{account}{dot}{extensions}")
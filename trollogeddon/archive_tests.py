@@ -0,0 +1,93 @@
+# Copyright 2023 resurtm@gmail.com
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the "Software"), to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions
+# of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED
+# TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF
+# CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+#
+# https://opensource.org/licenses/MIT
+
+
+"""Contains unit tests for the archive module."""
+
+import gzip
+import os
+import shutil
+from datetime import datetime, timezone
+from pathlib import Path
+
+from archive import MessageArchive, account_archive_path, read_archive
+from mocks import get_mocked_messages
+
+
+def test_archive_appends(tmp_path: Path) -> None:
+    """Test the archive is appended to across the runs and keeps the message fields."""
+    path = str(tmp_path / "archive.jsonl.gz")
+    first, second = get_mocked_messages(2)
+    first.date = datetime(2023, 1, 2, 3, 4, 5, tzinfo=timezone.utc)
+    for message in (first, second):
+        archive = MessageArchive(path)
+        archive.write(7, message)
+        archive.flush()
+        archive.close()
+
+    records = list(read_archive(path))
+    assert [(record["entity_id"], record["id"]) for record in records] == [(7, 1), (7, 2)]
+    assert records[0]["date"] == "2023-01-02T03:04:05+00:00"
+    assert (records[1]["date"], records[1]["text"], records[1]["media"]) == (None, "", None)
+
+
+def test_archive_crash_resume(tmp_path: Path) -> None:
+    """Test the archive of a killed process is extended by the resumed one and read back up to the damaged member."""
+    path = str(tmp_path / "archive.jsonl.gz")
+    crashed = str(tmp_path / "crashed.jsonl.gz")
+    messages = get_mocked_messages(5)
+    archive = MessageArchive(path)
+    archive.write(7, messages[0])
+    archive.flush()
+    first_size = os.path.getsize(path)
+    archive.write(7, messages[1])
+    archive.flush()
+    # The process is killed in the middle of the write of the second member, the file is never closed.
+    shutil.copyfile(path, crashed)
+    with open(crashed, "r+b") as file:
+        file.truncate((first_size + os.path.getsize(path)) // 2)
+    for message in messages[2:4]:
+        resumed = MessageArchive(crashed)
+        resumed.write(7, message)
+        resumed.close()
+
+    assert [record["id"] for record in read_archive(crashed)] == [1, 3, 4]
+
+
+def test_archive_legacy_crash_resume(tmp_path: Path) -> None:
+    """Test the flushed lines of an archive written as a single unfinished gzip member are read before the resumed."""
+    path = str(tmp_path / "archive.jsonl.gz")
+    first, second = get_mocked_messages(2)
+    legacy = gzip.open(path, "at", encoding="utf-8")
+    legacy.write('{"entity_id": 7, "id": 1}\n')
+    legacy.flush()
+    shutil.copyfile(path, path + ".crashed")
+    legacy.close()
+    resumed = MessageArchive(path + ".crashed")
+    resumed.write(7, second)
+    resumed.close()
+
+    assert [record["id"] for record in read_archive(path + ".crashed")] == [first.id, second.id]
+
+
+def test_account_archive_path() -> None:
+    """Test the account name is inserted before the extensions of the archive file name."""
+    assert account_archive_path(os.path.join("a.b", "archive.jsonl.gz"), "work") == os.path.join(
+        "a.b", "archive-work.jsonl.gz"
+    )
+    assert account_archive_path("archive", "work") == "archive-work"
@@ -0,0 +1,436 @@
+# Copyright 2023 resurtm@gmail.com
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the "Software"), to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions
+# of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED
+# TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF
+# CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+#
+# https://opensource.org/licenses/MIT
+
+
+"""Throughput benchmark of the dialogs fetching and the messages deletion against the fake Telegram backend.
+
+Run it as `python trollogeddon/benchmark.py`, see `--help` for the options. Peak memory is measured with
+`tracemalloc`, which slows the allocation heavy code down, so the numbers are only comparable between the runs of
+the benchmark itself. `--startup` measures the imports of the GUI before its window is shown with `-X importtime`
+instead.
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import math
+import os
+import re
+import subprocess
+import sys
+import time
+import tracemalloc
+from contextlib import ExitStack
+from dataclasses import asdict, dataclass, field
+from typing import Any, Awaitable, Callable, Dict, Final, List, Optional, Sequence
+from unittest.mock import patch
+
+import telegram
+from cache import Cache
+from fake_telegram import SEARCH_TERM, FakeTelegramClient
+from journal import DeletionJournal
+from message_filter import MessageFilter
+from rate_limiter import RateLimiter
+from settings import DEFAULT_DELETE_CONCURRENCY
+
+# Rate limit which never makes the requests wait, the default one of the benchmark.
+_UNLIMITED_RATE: Final = 1e9
+
+# Entry module of the GUI, importing it runs its module level imports only, the `__main__` block is skipped.
+STARTUP_MODULE: Final = "app"
+# Modules which are loaded lazily after the window is shown, importing any of them on startup fails the benchmark.
+DEFERRED_MODULES: Final = ("telethon", "telegram", "account_workers", "ensure_dialog", "settings_dialog", "retention")
+# Line of the `-X importtime` output: self and cumulative microseconds, and the indented module name.
+_IMPORT_TIME_LINE: Final = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \| (\s*)(\S+)$")
+
+
+@dataclass(frozen=True)
+class BenchmarkConfig:
+    """Parameters of the synthetic workload and the fake backend."""
+
+    dialogs: int = 20
+    messages: int = 1000
+    latency: float = 0.005
+    flood_probability: float = 0.01
+    flood_seconds: float = 0.05
+    rate: float = _UNLIMITED_RATE
+    concurrency: int = DEFAULT_DELETE_CONCURRENCY
+    # Delete stage workers of the deletion pipeline, the concurrency if zero.
+    delete_workers: int = 0
+    seed: int = 1
+
+
+@dataclass
+class BenchmarkResult:
+    """Measurements of a single strategy run."""
+
+    strategy: str
+    items: int = 0
+    seconds: float = 0.0
+    rpc_count: int = 0
+    flood_wait_count: int = 0
+    peak_memory: int = 0
+    batch_latencies: List[float] = field(default_factory=list)
+
+    @property
+    def items_per_second(self) -> float:
+        """Get the throughput.
+
+        Returns:
+            Processed dialogs or deleted messages per second.
+        """
+        return self.items / self.seconds if self.seconds else 0.0
+
+    def latency_percentile(self, percentile: float) -> float:
+        """Get the percentile of the batch latencies, nearest rank method.
+
+        Args:
+            percentile: Percentile from 0 to 100.
+
+        Returns:
+            The batch latency, seconds, zero if there were no batches.
+        """
+        if not self.batch_latencies:
+            return 0.0
+        ordered = sorted(self.batch_latencies)
+        return ordered[max(0, math.ceil(percentile / 100 * len(ordered)) - 1)]
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Convert the result into a JSON serializable dictionary.
+
+        Returns:
+            Dictionary with the measurements, the latencies are replaced by their percentiles.
+        """
+        result = asdict(self)
+        del result["batch_latencies"]
+        result.update(
+            items_per_second=self.items_per_second,
+            p50_batch_seconds=self.latency_percentile(50),
+            p99_batch_seconds=self.latency_percentile(99),
+        )
+        return result
+
+
+async def run_strategy(strategy: str, config: BenchmarkConfig) -> BenchmarkResult:
+    """Run a single strategy against a fresh fake backend, cache and journal.
+
+    Args:
+        strategy: Name of the strategy, one of `STRATEGIES`.
+        config: Workload and backend parameters.
+
+    Returns:
+        Measurements of the run.
+    """
+    client = FakeTelegramClient(
+        dialog_count=config.dialogs,
+        messages_per_dialog=config.messages,
+        latency=config.latency,
+        flood_probability=config.flood_probability,
+        flood_seconds=config.flood_seconds,
+        seed=config.seed,
+    )
+    cache = Cache(":memory:")
+    journal = DeletionJournal(":memory:")
+    result = BenchmarkResult(strategy)
+    delete_chunk = telegram._delete_chunk
+
+    async def timed_delete_chunk(**kwargs: Any) -> int:
+        started_at = time.perf_counter()
+        try:
+            return await delete_chunk(**kwargs)
+        finally:
+            result.batch_latencies.append(time.perf_counter() - started_at)
+
+    with ExitStack() as stack:
+        stack.enter_context(patch.object(telegram, "_create_client", return_value=client))
+        stack.enter_context(patch.object(telegram, "_CLIENT_MANAGER", telegram.ClientManager()))
+        stack.enter_context(
+            patch.object(telegram, "_RATE_LIMITER", RateLimiter(rate=config.rate, max_rate=config.rate))
+        )
+        stack.enter_context(patch.object(telegram, "_cache", return_value=cache))
+        stack.enter_context(patch.object(telegram, "_journal", return_value=journal))
+        stack.enter_context(patch.object(telegram, "_delete_chunk", timed_delete_chunk))
+        if strategy == "warm":
+            for entity_id in client.entity_ids:
+                cache.add_message_ids(entity_id, client.message_ids(entity_id))
+
+        tracemalloc.start()
+        started_at = time.perf_counter()
+        try:
+            result.items = await STRATEGIES[strategy](config, client, result.batch_latencies)
+        finally:
+            result.seconds = time.perf_counter() - started_at
+            result.peak_memory = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+
+    result.rpc_count = client.rpc_count
+    result.flood_wait_count = client.flood_wait_count
+    cache.close()
+    journal.close()
+    return result
+
+
+async def _fetch_dialogs(config: BenchmarkConfig, client: FakeTelegramClient, latencies: List[float]) -> int:
+    """Fetch all the dialogs page by page, the batch latency is the time of a page.
+
+    Returns:
+        Amount of the fetched dialogs.
+    """
+    count = 0
+    started_at = time.perf_counter()
+    async for page in telegram.iter_dialogs_pages(resync=True):
+        latencies.append(time.perf_counter() - started_at)
+        count += len(page)
+        started_at = time.perf_counter()
+    return count
+
+
+async def _delete_all(config: BenchmarkConfig, client: FakeTelegramClient, latencies: List[float]) -> int:
+    """Delete all the own messages, the cache is either empty or warmed up before.
+
+    Returns:
+        Amount of the deleted messages.
+    """
+    results = await telegram.delete_messages(
+        client.entity_ids, concurrency=config.concurrency, delete_workers=config.delete_workers or None
+    )
+    return _deleted_count(results)
+
+
+async def _delete_filtered(config: BenchmarkConfig, client: FakeTelegramClient, latencies: List[float]) -> int:
+    """Delete the own messages found by the server side text search.
+
+    Returns:
+        Amount of the deleted messages.
+    """
+    message_filter = MessageFilter(search=SEARCH_TERM)
+    results = await telegram.delete_messages(
+        client.entity_ids,
+        concurrency=config.concurrency,
+        message_filter=message_filter,
+        delete_workers=config.delete_workers or None,
+    )
+    return _deleted_count(results)
+
+
+def _deleted_count(results: Dict[int, telegram.DeletionResult]) -> int:
+    """Sum up the deleted messages, a failed entity invalidates the run.
+
+    Args:
+        results: Deletion results mapped by entity IDs.
+
+    Returns:
+        Amount of the deleted messages.
+
+    Raises:
+        RuntimeError: Some of the entities failed.
+    """
+    errors = [result.error for result in results.values() if result.error is not None]
+    if errors:
+        raise RuntimeError(f"{len(errors)} entities failed, the first error: {errors[0]!r}")
+    return sum(result.deleted_count for result in results.values())
+
+
+# Benchmarked strategies by their names, each returns the amount of the processed items.
+STRATEGIES: Final[Dict[str, Callable[[BenchmarkConfig, FakeTelegramClient, List[float]], Awaitable[int]]]] = {
+    "dialogs": _fetch_dialogs,
+    "cold": _delete_all,
+    "warm": _delete_all,
+    "filtered": _delete_filtered,
+}
+
+
+def format_results(results: Sequence[BenchmarkResult]) -> str:
+    """Format the results as a plain text table.
+
+    Args:
+        results: Results of the strategy runs.
+
+    Returns:
+        The table text.
+    """
+    lines = [
+        f"{'strategy':<10}{'items':>9}{'seconds':>10}{'items/s':>11}{'rpcs':>8}{'floods':>8}"
+        f"{'peak MiB':>10}{'p50 ms':>9}{'p99 ms':>9}"
+    ]
+    for result in results:
+        lines.append(
+            f"{result.strategy:<10}{result.items:>9}{result.seconds:>10.3f}{result.items_per_second:>11.1f}"
+            f"{result.rpc_count:>8}{result.flood_wait_count:>8}{result.peak_memory / 2**20:>10.2f}"
+            f"{result.latency_percentile(50) * 1000:>9.2f}{result.latency_percentile(99) * 1000:>9.2f}"
+        )
+    return "\n".join(lines)
+
+
+@dataclass(frozen=True)
+class StartupProfile:
+    """Import times of the startup module and all the modules it imports, in microseconds."""
+
+    module: str
+    cumulative: Dict[str, int]
+
+    @property
+    def total_ms(self) -> float:
+        """Get the import time of the startup module including everything it imports.
+
+        Returns:
+            The import time in milliseconds.
+        """
+        return self.cumulative.get(self.module, 0) / 1000
+
+    @property
+    def deferred_imports(self) -> List[str]:
+        """List the deferred modules which were imported on startup.
+
+        Returns:
+            Names of the modules and packages which have to be loaded lazily, but were imported.
+        """
+        return [name for name in DEFERRED_MODULES if name in self.cumulative]
+
+
+def parse_import_times(output: str) -> Dict[str, int]:
+    """Parse the `-X importtime` output.
+
+    Args:
+        output: Standard error output of the Python interpreter.
+
+    Returns:
+        Cumulative import times of the modules in microseconds, mapped by the module names.
+    """
+    cumulative: Dict[str, int] = {}
+    for line in output.splitlines():
+        match = _IMPORT_TIME_LINE.match(line)
+        if match is not None:
+            cumulative[match.group(4)] = int(match.group(2))
+    return cumulative
+
+
+def measure_startup(module: str = STARTUP_MODULE, runs: int = 1) -> StartupProfile:
+    """Measure the imports of the module in fresh interpreters, the fastest run is kept.
+
+    Args:
+        module: Name of the module to be imported.
+        runs: Amount of the interpreters, the first one also compiles the bytecode of the changed files.
+
+    Returns:
+        Import times of the fastest run.
+    """
+    profiles = []
+    for _ in range(max(1, runs)):
+        process = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        profiles.append(StartupProfile(module, parse_import_times(process.stderr)))
+    return min(profiles, key=lambda profile: profile.total_ms)
+
+
+def format_startup(profile: StartupProfile, top: int = 10) -> str:
+    """Format the startup profile as a plain text table of the slowest imports.
+
+    Args:
+        profile: Startup profile.
+        top: Amount of the listed modules.
+
+    Returns:
+        The table text.
+    """
+    slowest = sorted(profile.cumulative.items(), key=lambda item: item[1], reverse=True)[: top + 1]
+    lines = [f"{'module':<40}{'cumulative ms':>14}"]
+    lines.extend(f"{name:<40}{microseconds / 1000:>14.1f}" for name, microseconds in slowest)
+    lines.append(f"deferred modules imported: {', '.join(profile.deferred_imports) or 'none'}")
+    return "\n".join(lines)
+
+
+def _run_startup(runs: int, budget_ms: float) -> int:
+    """Run the startup benchmark and print the results.
+
+    Args:
+        runs: Amount of the measured interpreters.
+        budget_ms: Maximum import time of the startup module in milliseconds, zero means no limit.
+
+    Returns:
+        Process exit code, non zero if a deferred module is imported or the budget is exceeded.
+    """
+    profile = measure_startup(runs=runs)
+    print(format_startup(profile))
+    if profile.deferred_imports:
+        print(f"Deferred modules are imported on startup: {profile.deferred_imports}", file=sys.stderr)
+        return 1
+    if budget_ms and profile.total_ms > budget_ms:
+        print(f"Startup imports take {profile.total_ms:.1f} ms, the budget is {budget_ms:.1f} ms", file=sys.stderr)
+        return 1
+    return 0
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    """Run the benchmark and print the results.
+
+    Args:
+        argv: Command line arguments without the program name, `sys.argv` is used if not provided.
+
+    Returns:
+        Process exit code.
+    """
+    defaults = BenchmarkConfig()
+    parser = argparse.ArgumentParser(description="Benchmark against the fake Telegram backend.")
+    parser.add_argument("--strategy", choices=list(STRATEGIES), action="append", help="run only the strategy")
+    parser.add_argument("--dialogs", type=int, default=defaults.dialogs, help="amount of the dialogs")
+    parser.add_argument("--messages", type=int, default=defaults.messages, help="own messages per dialog")
+    parser.add_argument("--latency", type=float, default=defaults.latency, help="RPC latency, seconds")
+    parser.add_argument("--flood-probability", type=float, default=defaults.flood_probability)
+    parser.add_argument("--flood-seconds", type=float, default=defaults.flood_seconds)
+    parser.add_argument("--rate", type=float, default=defaults.rate, help="rate limit, requests per second")
+    parser.add_argument("--concurrency", type=int, default=defaults.concurrency, help="parallel dialogs")
+    parser.add_argument("--delete-workers", type=int, default=defaults.delete_workers, help="parallel chunk deletions")
+    parser.add_argument("--seed", type=int, default=defaults.seed, help="seed of the injected flood waits")
+    parser.add_argument("--json", help="also write the results into the JSON file")
+    parser.add_argument("--startup", action="store_true", help="measure the GUI startup imports instead")
+    parser.add_argument("--startup-runs", type=int, default=5, help="interpreters of the startup benchmark")
+    parser.add_argument("--startup-budget", type=float, default=0.0, help="startup imports limit, milliseconds")
+    args = parser.parse_args(argv)
+    if args.startup:
+        return _run_startup(args.startup_runs, args.startup_budget)
+    # The injected flood waits are expected, they shouldn't be logged.
+    logging.basicConfig(level=logging.ERROR)
+
+    config = BenchmarkConfig(
+        dialogs=args.dialogs,
+        messages=args.messages,
+        latency=args.latency,
+        flood_probability=args.flood_probability,
+        flood_seconds=args.flood_seconds,
+        rate=args.rate,
+        concurrency=args.concurrency,
+        delete_workers=args.delete_workers,
+        seed=args.seed,
+    )
+    results = [asyncio.run(run_strategy(strategy, config)) for strategy in args.strategy or STRATEGIES]
+    print(format_results(results))
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as file:
+            json.dump({"config": asdict(config), "results": [result.to_dict() for result in results]}, file, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,110 @@
+# Copyright 2023 resurtm@gmail.com
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the "Software"), to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions
+# of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED
+# TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF
+# CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+#
+# https://opensource.org/licenses/MIT
+
+
+"""Benchmark harness and the fake Telegram backend. Tests."""
+
+from typing import Final
+
+import pytest
+from benchmark import (
+    STRATEGIES,
+    BenchmarkConfig,
+    BenchmarkResult,
+    StartupProfile,
+    format_results,
+    measure_startup,
+    parse_import_times,
+    run_strategy,
+)
+
+# Small workload with frequent flood waits, so the retries are exercised too.
+_CONFIG: Final = BenchmarkConfig(dialogs=3, messages=250, latency=0.0, flood_probability=0.2, flood_seconds=0.0)
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    "strategy, items, pages, batches",
+    [
+        # A single page of dialogs, every page is a batch.
+        ("dialogs", 3, 1, 1),
+        # Three pages of messages, the last one is partial, and three chunks per dialog.
+        ("cold", 750, 3 * 3, 3 * 3),
+        # The cache is complete, so only the empty page above the watermark is fetched.
+        ("warm", 750, 3 * 1, 3 * 3),
+        # A single page and a single chunk of the matching messages per dialog.
+        ("filtered", 75, 3 * 1, 3 * 1),
+    ],
+)
+async def test_run_strategy(strategy: str, items: int, pages: int, batches: int) -> None:
+    """Test every strategy processes all the items and counts the RPCs including the retried ones.
+
+    Args:
+        strategy: Name of the strategy.
+        items: Expected amount of the processed items.
+        pages: Expected amount of the page RPCs without the flood wait retries.
+        batches: Expected amount of the batches.
+    """
+    result = await run_strategy(strategy, _CONFIG)
+
+    assert result.items == items
+    assert len(result.batch_latencies) == batches
+    deletes = 0 if strategy == "dialogs" else batches
+    assert result.rpc_count == pages + deletes + result.flood_wait_count
+    assert result.peak_memory > 0
+
+
+def test_latency_percentile() -> None:
+    """Test the nearest rank percentiles of the batch latencies and the table formatting."""
+    result = BenchmarkResult(
+        "cold", items=10, seconds=2.0, batch_latencies=[float(value) for value in range(100, 0, -1)]
+    )
+
+    assert result.items_per_second == 5.0
+    assert result.latency_percentile(50) == 50.0
+    assert result.latency_percentile(99) == 99.0
+    assert result.latency_percentile(100) == 100.0
+    assert BenchmarkResult("warm").latency_percentile(50) == 0.0
+    assert format_results([result]).splitlines()[1].split()[:4] == ["cold", "10", "2.000", "5.0"]
+    assert set(STRATEGIES) == {"dialogs", "cold", "warm", "filtered"}
+
+
+def test_parse_import_times() -> None:
+    """Test the `-X importtime` output is parsed into the cumulative import times by the module names."""
+    output = (
+        "import time: self [us] | cumulative | imported package\n"
+        "import time:       120 |        120 |   telethon.tl\n"
+        "import time:      2000 |      31000 | main_window\n"
+        "unrelated warning\n"
+    )
+
+    profile = StartupProfile("main_window", parse_import_times(output))
+    assert profile.cumulative == {"telethon.tl": 120, "main_window": 31000}
+    assert profile.total_ms == 31.0
+    assert profile.deferred_imports == []
+
+
+def test_startup_defers_telethon() -> None:
+    """Test the modules the GUI imports before its window is shown don't import Telethon and the dialogs."""
+    profile = measure_startup()
+
+    assert profile.module == "app"
+    assert "main_window" in profile.cumulative
+    assert profile.total_ms > 0
+    assert profile.deferred_imports == []
+    assert not any(name.startswith("telethon") for name in profile.cumulative)
@@ -0,0 +1,249 @@
+# Copyright 2023 resurtm@gmail.com
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the "Software"), to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions
+# of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED
+# TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF
+# CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+#
+# https://opensource.org/licenses/MIT
+
+
+"""Local on-disk cache of the dialogs, their input peers, the user's own message IDs and the retention checkpoints."""
+
+import logging
+import sqlite3
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Final, Iterable, List, Optional
+
+_LOGGER: Final = logging.getLogger(__name__)
+
+_SCHEMA: Final = """
+CREATE TABLE IF NOT EXISTS dialogs (
+    position INTEGER NOT NULL,
+    entity_id INTEGER NOT NULL,
+    title TEXT NOT NULL,
+    entity_type TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS input_peers (
+    entity_id INTEGER PRIMARY KEY,
+    peer_type TEXT NOT NULL,
+    peer_id INTEGER NOT NULL,
+    access_hash INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS own_messages (
+    entity_id INTEGER NOT NULL,
+    message_id INTEGER NOT NULL,
+    PRIMARY KEY (entity_id, message_id)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS watermarks (
+    entity_id INTEGER PRIMARY KEY,
+    max_id INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS retention_checkpoints (
+    entity_id INTEGER PRIMARY KEY,
+    boundary REAL NOT NULL
+);
+"""
+
+
+@dataclass(frozen=True)
+class CachedDialog:
+    """Dialog record which is kept in the cache and shown in the dialogs table."""
+
+    entity_id: int
+    title: str
+    entity_type: str
+
+
+@dataclass(frozen=True)
+class CachedPeer:
+    """Input peer of a dialog which is kept in the cache, so the dialog entity is never resolved again."""
+
+    entity_id: int
+    # Class name of the input peer, e.g. "InputPeerChannel".
+    peer_type: str
+    peer_id: int
+    access_hash: int = 0
+
+
+class Cache:
+    """SQLite cache of the dialogs, their input peers and the user's own message IDs per dialog.
+
+    Own message IDs are synced incrementally: the watermark of a dialog is the highest message ID which was already
+    scanned, so the next scan only asks Telegram for the newer messages. IDs stay in the cache until the messages
+    are deleted. The retention checkpoint of a dialog is the retention boundary of its last successful retention
+    pass, everything older was deleted already.
+    """
+
+    def __init__(self, path: str) -> None:
+        """Construct a new instance of the cache, creating the database file if needed.
+
+        Args:
+            path: Path to the SQLite database file, ":memory:" keeps the cache in memory only.
+        """
+        _LOGGER.debug("Cache, constructor, begin, path: %s", path)
+        self._connection = sqlite3.connect(path)
+        self._connection.executescript(_SCHEMA)
+        _LOGGER.debug("Cache, constructor, end")
+
+    def close(self) -> None:
+        """Close the database connection."""
+        self._connection.close()
+
+    def clear(self) -> None:
+        """Remove all the cached data, so everything is fetched from Telegram again."""
+        _LOGGER.debug("Cache, clear")
+        with self._connection:
+            self._connection.execute("DELETE FROM dialogs")
+            self._connection.execute("DELETE FROM input_peers")
+            self._connection.execute("DELETE FROM own_messages")
+            self._connection.execute("DELETE FROM watermarks")
+            self._connection.execute("DELETE FROM retention_checkpoints")
+
+    def dialogs(self) -> List[CachedDialog]:
+        """Get the cached dialogs.
+
+        Returns:
+            The cached dialogs in the order they were fetched, empty list if nothing is cached.
+        """
+        rows = self._connection.execute("SELECT entity_id, title, entity_type FROM dialogs ORDER BY position")
+        return [CachedDialog(*row) for row in rows]
+
+    def replace_dialogs(self, dialogs: Iterable[CachedDialog]) -> None:
+        """Replace all the cached dialogs with the provided ones.
+
+        Args:
+            dialogs: Dialogs to be cached.
+        """
+        with self._connection:
+            self._connection.execute("DELETE FROM dialogs")
+            self._connection.executemany(
+                "INSERT INTO dialogs (position, entity_id, title, entity_type) VALUES (?, ?, ?, ?)",
+                (
+                    (position, dialog.entity_id, dialog.title, dialog.entity_type)
+                    for position, dialog in enumerate(dialogs)
+                ),
+            )
+
+    def input_peer(self, entity_id: int) -> Optional[CachedPeer]:
+        """Get the cached input peer of the dialog.
+
+        Args:
+            entity_id: Dialog entity ID.
+
+        Returns:
+            The cached input peer, `None` if it's not cached.
+        """
+        row = self._connection.execute(
+            "SELECT entity_id, peer_type, peer_id, access_hash FROM input_peers WHERE entity_id = ?", (entity_id,)
+        ).fetchone()
+        return None if row is None else CachedPeer(*row)
+
+    def replace_input_peers(self, peers: Iterable[CachedPeer]) -> None:
+        """Replace all the cached input peers with the provided ones.
+
+        Args:
+            peers: Input peers to be cached.
+        """
+        with self._connection:
+            self._connection.execute("DELETE FROM input_peers")
+            self._connection.executemany(
+                "INSERT OR REPLACE INTO input_peers (entity_id, peer_type, peer_id, access_hash) VALUES (?, ?, ?, ?)",
+                ((peer.entity_id, peer.peer_type, peer.peer_id, peer.access_hash) for peer in peers),
+            )
+
+    def message_ids(self, entity_id: int) -> List[int]:
+        """Get the cached own message IDs of the dialog.
+
+        Args:
+            entity_id: Dialog entity ID.
+
+        Returns:
+            The cached message IDs, in ascending order.
+        """
+        rows = self._connection.execute(
+            "SELECT message_id FROM own_messages WHERE entity_id = ? ORDER BY message_id", (entity_id,)
+        )
+        return [row[0] for row in rows]
+
+    def watermark(self, entity_id: int) -> int:
+        """Get the highest message ID of the dialog which was already scanned.
+
+        Args:
+            entity_id: Dialog entity ID.
+
+        Returns:
+            The highest scanned message ID, zero if the dialog was never scanned.
+        """
+        row = self._connection.execute("SELECT max_id FROM watermarks WHERE entity_id = ?", (entity_id,)).fetchone()
+        return 0 if row is None else row[0]
+
+    def add_message_ids(self, entity_id: int, message_ids: List[int]) -> None:
+        """Add the scanned own message IDs of the dialog and move its watermark past them.
+
+        Args:
+            entity_id: Dialog entity ID.
+            message_ids: Own message IDs which were scanned.
+        """
+        if not message_ids:
+            return
+        with self._connection:
+            self._connection.executemany(
+                "INSERT OR IGNORE INTO own_messages (entity_id, message_id) VALUES (?, ?)",
+                ((entity_id, message_id) for message_id in message_ids),
+            )
+            self._connection.execute(
+                "INSERT INTO watermarks (entity_id, max_id) VALUES (?, ?) "
+                "ON CONFLICT (entity_id) DO UPDATE SET max_id = MAX(max_id, excluded.max_id)",
+                (entity_id, max(message_ids)),
+            )
+
+    def remove_message_ids(self, entity_id: int, message_ids: List[int]) -> None:
+        """Remove the own message IDs of the dialog, e.g. after the messages were deleted.
+
+        Args:
+            entity_id: Dialog entity ID.
+            message_ids: Own message IDs to be removed.
+        """
+        with self._connection:
+            self._connection.executemany(
+                "DELETE FROM own_messages WHERE entity_id = ? AND message_id = ?",
+                ((entity_id, message_id) for message_id in message_ids),
+            )
+
+    def retention_checkpoint(self, entity_id: int) -> Optional[datetime]:
+        """Get the retention boundary of the last successful retention pass of the dialog.
+
+        Args:
+            entity_id: Dialog entity ID.
+
+        Returns:
+            The timezone aware boundary, none if the dialog never had a retention pass.
+        """
+        row = self._connection.execute(
+            "SELECT boundary FROM retention_checkpoints WHERE entity_id = ?", (entity_id,)
+        ).fetchone()
+        return None if row is None else datetime.fromtimestamp(row[0], timezone.utc)
+
+    def set_retention_checkpoint(self, entity_id: int, boundary: datetime) -> None:
+        """Store the retention boundary of the successful retention pass of the dialog.
+
+        Args:
+            entity_id: Dialog entity ID.
+            boundary: Timezone aware retention boundary, all the user's older messages are deleted.
+        """
+        with self._connection:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO retention_checkpoints (entity_id, boundary) VALUES (?, ?)",
+                (entity_id, boundary.timestamp()),
+            )
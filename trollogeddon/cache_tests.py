@@ -0,0 +1,88 @@
+# Copyright 2023 resurtm@gmail.com
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the "Software"), to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions
+# of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED
+# TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF
+# CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+#
+# https://opensource.org/licenses/MIT
+
+
+"""Local on-disk cache of the dialogs and the user's own message IDs. Tests."""
+
+from datetime import datetime, timezone
+
+from cache import Cache, CachedDialog, CachedPeer
+
+
+def test_dialogs() -> None:
+    """Test the `Cache.replace_dialogs` method replaces the cached dialogs keeping their order."""
+    cache = Cache(":memory:")
+    assert cache.dialogs() == []
+
+    cache.replace_dialogs([CachedDialog(2, "B", "User"), CachedDialog(1, "A", "Channel")])
+    assert cache.dialogs() == [CachedDialog(2, "B", "User"), CachedDialog(1, "A", "Channel")]
+
+    cache.replace_dialogs([CachedDialog(3, "C", "Chat")])
+    assert cache.dialogs() == [CachedDialog(3, "C", "Chat")]
+
+
+def test_input_peers() -> None:
+    """Test the `Cache.replace_input_peers` method replaces the cached input peers and `clear` drops them."""
+    cache = Cache(":memory:")
+    assert cache.input_peer(1) is None
+
+    cache.replace_input_peers([CachedPeer(1, "InputPeerChannel", 1, 42), CachedPeer(2, "InputPeerChat", 2)])
+    assert cache.input_peer(1) == CachedPeer(1, "InputPeerChannel", 1, 42)
+    cache.replace_input_peers([CachedPeer(2, "InputPeerChat", 2)])
+    assert cache.input_peer(1) is None
+    assert cache.input_peer(2) == CachedPeer(2, "InputPeerChat", 2)
+
+    cache.clear()
+    assert cache.input_peer(2) is None
+
+
+def test_message_ids() -> None:
+    """Test the own message IDs are kept per dialog and the watermark only moves forward."""
+    cache = Cache(":memory:")
+    assert cache.watermark(1) == 0
+
+    cache.add_message_ids(1, [10, 30, 20])
+    cache.add_message_ids(1, [5])
+    cache.add_message_ids(2, [7])
+    assert cache.message_ids(1) == [5, 10, 20, 30]
+    assert cache.watermark(1) == 30
+    assert cache.watermark(2) == 7
+
+    cache.remove_message_ids(1, [10, 30])
+    assert cache.message_ids(1) == [5, 20]
+    assert cache.watermark(1) == 30
+
+    cache.clear()
+    assert cache.message_ids(1) == []
+    assert cache.watermark(1) == 0
+
+
+def test_retention_checkpoints() -> None:
+    """Test the retention checkpoints are kept per dialog as timezone aware boundaries."""
+    cache = Cache(":memory:")
+    assert cache.retention_checkpoint(1) is None
+
+    first = datetime(2023, 5, 1, 12, 30, tzinfo=timezone.utc)
+    cache.set_retention_checkpoint(1, first)
+    cache.set_retention_checkpoint(1, first.replace(day=2))
+    cache.set_retention_checkpoint(2, first)
+    assert cache.retention_checkpoint(1) == first.replace(day=2)
+    assert cache.retention_checkpoint(2) == first
+
+    cache.clear()
+    assert cache.retention_checkpoint(1) is None
@@ -0,0 +1,450 @@
+# Copyright 2023 resurtm@gmail.com
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the "Software"), to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions
+# of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED
+# TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF
+# CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+#
+# https://opensource.org/licenses/MIT
+
+
+"""Headless command line interface, it doesn't import Qt so it starts fast and runs without a display."""
+
+import argparse
+import asyncio
+import getpass
+import logging
+import sys
+from datetime import date, timedelta
+from typing import Dict, Final, List, Optional, Sequence
+
+from app_logging import LOG_LEVELS, configure_logging
+from message_filter import MEDIA_FILTERS, MessageFilter
+from retention import (
+    DEFAULT_RETENTION_INTERVAL,
+    RetentionPass,
+    RetentionPolicy,
+    RetentionScheduler,
+)
+from settings import DEFAULT_ACCOUNT, app_settings, parse_api_id, settings_path
+from telegram import (
+    AuthSession,
+    DeletionResult,
+    PasswordRequiredError,
+    count_messages,
+    delete_messages,
+    estimate_deletion_seconds,
+    iter_dialogs_pages,
+    resume_deletion,
+    rpc_metrics,
+    shutdown,
+    unfinished_deletion,
+    use_account,
+)
+
+_LOGGER: Final = logging.getLogger(__name__)
+
+_ENTITY_TYPES: Final = ("User", "Chat", "Channel")
+_STDIN_IDS: Final = "-"
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    """Run the command line interface.
+
+    Args:
+        argv: Command line arguments without the program name, `sys.argv` is used if not provided.
+
+    Returns:
+        Process exit code.
+    """
+    args = _create_parser().parse_args(argv)
+    level = "DEBUG" if args.verbose else args.log_level or app_settings().log_level()
+    log_listener = configure_logging(level)
+    try:
+        return asyncio.run(_run(args))
+    finally:
+        log_listener.stop()
+
+
+async def _run(args: argparse.Namespace) -> int:
+    """Run the selected command and disconnect from Telegram afterwards.
+
+    Nothing is opened if the account has no API credentials yet, except by the command which sets them.
+
+    Args:
+        args: Parsed command line arguments.
+
+    Returns:
+        Process exit code.
+    """
+    if args.command is not _config:
+        settings = app_settings()
+        if settings.api_id(args.account) is None or not settings.api_hash(args.account):
+            print(
+                f"The API ID and hash of the {args.account!r} account aren't set, "
+                f"run: python -m trollogeddon --account {args.account} config",
+                file=sys.stderr,
+            )
+            return 2
+    try:
+        await use_account(args.account)
+        return await args.command(args)
+    finally:
+        await shutdown()
+        for path in args.metrics or []:
+            rpc_metrics().dump(path)
+
+
+def _create_parser() -> argparse.ArgumentParser:
+    """Create the command line arguments parser.
+
+    Returns:
+        New parser instance.
+    """
+    parser = argparse.ArgumentParser(prog="trollogeddon", description="Delete your own Telegram messages in bulk.")
+    parser.add_argument("-v", "--verbose", action="store_true", help="enable debug logging")
+    parser.add_argument("--log-level", choices=LOG_LEVELS, help="log level, the one from the settings by default")
+    parser.add_argument(
+        "--metrics",
+        action="append",
+        metavar="PATH",
+        help='write the RPC metrics on exit, ".prom" files as Prometheus text',
+    )
+    parser.add_argument("-a", "--account", default=DEFAULT_ACCOUNT, help="name of the account from the settings")
+    commands = parser.add_subparsers(dest="command_name", metavar="COMMAND", required=True)
+
+    config = commands.add_parser("config", help="set the API credentials of the account, see my.telegram.org")
+    config.add_argument("--api-id", help="API ID of the Telegram app, asked for if not provided")
+    config.add_argument("--api-hash", help="API hash of the Telegram app, asked for if not provided")
+    config.set_defaults(command=_config)
+
+    login = commands.add_parser("login", help="authorize the session with an OTP code")
+    login.add_argument("phone", help='phone number, e.g. "+49 175 ..."')
+    login.set_defaults(command=_login)
+
+    dialogs = commands.add_parser("list", help="list the dialogs as tab separated ID, type and title")
+    dialogs.add_argument("--resync", action="store_true", help="fetch the dialogs from Telegram, not from the cache")
+    dialogs.add_argument("--type", choices=_ENTITY_TYPES, action="append", help="only list dialogs of the type")
+    dialogs.add_argument("--title", default="", help="only list dialogs which title contains the text")
+    dialogs.set_defaults(command=_list_dialogs)
+
+    delete = commands.add_parser("delete", help="delete your messages from the dialogs")
+    delete.add_argument("ids", nargs="+", help=f'dialog IDs, "{_STDIN_IDS}" reads them from the standard input')
+    _add_concurrency_argument(delete)
+    _add_delete_workers_argument(delete)
+    delete.add_argument("--search", default="", help="only delete messages containing the text")
+    delete.add_argument("--media", choices=list(MEDIA_FILTERS), help="only delete messages of the media type")
+    delete.add_argument("--from", dest="min_date", type=date.fromisoformat, help="first day, YYYY-MM-DD")
+    delete.add_argument("--to", dest="max_date", type=date.fromisoformat, help="last day (inclusive), YYYY-MM-DD")
+    delete.add_argument("--min-id", type=int, default=0, help="only delete messages newer than the ID")
+    delete.add_argument("--max-id", type=int, default=0, help="only delete messages older than the ID")
+    delete.add_argument(
+        "--whole-history",
+        action="store_true",
+        help="if nothing is filtered, delete the whole history of private chats (both sides) and admin channels at once",
+    )
+    delete.add_argument(
+        "--archive",
+        default="",
+        metavar="PATH",
+        help="append the messages to the gzip compressed JSON lines archive before they're deleted",
+    )
+    delete.add_argument(
+        "--dry-run", action="store_true", help="only print the counts of the messages which would be deleted"
+    )
+    delete.set_defaults(command=_delete)
+
+    resume = commands.add_parser("resume", help="resume the interrupted deletion")
+    _add_concurrency_argument(resume)
+    _add_delete_workers_argument(resume)
+    resume.set_defaults(command=_resume)
+
+    retain = commands.add_parser("retain", help="keep deleting your messages older than the retention period")
+    retain.add_argument("ids", nargs="+", help=f'dialog IDs, "{_STDIN_IDS}" reads them from the standard input')
+    retain.add_argument("--days", type=int, required=True, help="age in days of the messages which are kept")
+    retain.add_argument(
+        "--interval",
+        type=float,
+        default=DEFAULT_RETENTION_INTERVAL.total_seconds() / 60,
+        help="minutes between the passes",
+    )
+    retain.add_argument("--once", action="store_true", help="run a single pass and exit")
+    _add_concurrency_argument(retain)
+    retain.set_defaults(command=_retain)
+
+    return parser
+
+
+def _add_concurrency_argument(parser: argparse.ArgumentParser) -> None:
+    """Add the deletion concurrency argument to the command parser.
+
+    Args:
+        parser: Command parser.
+    """
+    parser.add_argument("--concurrency", type=int, help="amount of dialogs processed at the same time")
+
+
+def _add_delete_workers_argument(parser: argparse.ArgumentParser) -> None:
+    """Add the delete stage concurrency argument to the command parser.
+
+    Args:
+        parser: Command parser.
+    """
+    parser.add_argument(
+        "--delete-workers", type=int, help="amount of message chunks deleted at the same time, the concurrency if unset"
+    )
+
+
+async def _config(args: argparse.Namespace) -> int:
+    """Set the API credentials of the account, the missing ones are read interactively.
+
+    Args:
+        args: Parsed command line arguments.
+
+    Returns:
+        Process exit code.
+    """
+    settings = app_settings()
+    try:
+        api_id = parse_api_id(args.api_id if args.api_id is not None else input("API ID: "))
+        api_hash = (args.api_hash if args.api_hash is not None else getpass.getpass("API hash: ")).strip()
+        if not api_hash:
+            raise ValueError("The API hash is empty")
+        if args.account != DEFAULT_ACCOUNT:
+            settings.add_account(args.account)
+    except ValueError as error:
+        print(error, file=sys.stderr)
+        return 2
+    settings.set_api_id(api_id, args.account)
+    settings.set_api_hash(api_hash, args.account)
+    print(f"Saved to {settings_path()}.")
+    return 0
+
+
+async def _login(args: argparse.Namespace) -> int:
+    """Authorize the session, the OTP code and the cloud password, if the account has one, are read interactively.
+
+    Args:
+        args: Parsed command line arguments.
+
+    Returns:
+        Process exit code.
+    """
+    session = AuthSession(args.phone)
+    if not await session.send_code():
+        print("Already authorized.")
+        return 0
+    otp_code = input("OTP code: ").strip()
+    try:
+        await session.sign_in(otp_code)
+    except PasswordRequiredError:
+        await session.sign_in(otp_code, getpass.getpass("Cloud password: "))
+    print("Authorized.")
+    return 0
+
+
+async def _list_dialogs(args: argparse.Namespace) -> int:
+    """Print the dialogs matching the type and title filters.
+
+    Args:
+        args: Parsed command line arguments.
+
+    Returns:
+        Process exit code.
+    """
+    title = args.title.casefold()
+    async for page in iter_dialogs_pages(resync=args.resync):
+        for dialog in page:
+            if args.type and dialog.entity_type not in args.type:
+                continue
+            if title and title not in dialog.title.casefold():
+                continue
+            print(f"{dialog.entity_id}\t{dialog.entity_type}\t{dialog.title}")
+    return 0
+
+
+async def _delete(args: argparse.Namespace) -> int:
+    """Delete the user's messages from the dialogs given on the command line.
+
+    Args:
+        args: Parsed command line arguments.
+
+    Returns:
+        Process exit code.
+    """
+    try:
+        entity_ids = _parse_ids(args.ids)
+    except ValueError as error:
+        print(f"Invalid dialog ID: {error}", file=sys.stderr)
+        return 2
+    if args.dry_run:
+        return await _count(entity_ids, args)
+    results = await delete_messages(
+        entity_ids,
+        concurrency=_concurrency(args),
+        message_filter=_message_filter(args),
+        archive_path=args.archive,
+        delete_workers=_delete_workers(args),
+    )
+    return _print_results(results)
+
+
+async def _count(entity_ids: List[int], args: argparse.Namespace) -> int:
+    """Print the tab separated dialog ID, messages count and the error of each dialog, and the deletion estimate.
+
+    Args:
+        entity_ids: Dialog IDs to count the messages of.
+        args: Parsed command line arguments.
+
+    Returns:
+        Process exit code, non zero if any dialog failed.
+    """
+    results = await count_messages(entity_ids, concurrency=_concurrency(args), message_filter=_message_filter(args))
+    for entity_id, result in results.items():
+        error = "" if result.error is None else repr(result.error)
+        print(f"{entity_id}\t{result.message_count}\t{error}")
+    counts = [result.message_count for result in results.values() if result.error is None]
+    estimate = timedelta(seconds=round(estimate_deletion_seconds(counts)))
+    print(f"Up to {sum(counts)} messages, the deletion would take about {estimate}.", file=sys.stderr)
+    return 1 if len(counts) < len(results) else 0
+
+
+async def _resume(args: argparse.Namespace) -> int:
+    """Resume the interrupted deletion job, if there's one.
+
+    Args:
+        args: Parsed command line arguments.
+
+    Returns:
+        Process exit code.
+    """
+    if unfinished_deletion() is None:
+        print("Nothing to resume.")
+        return 0
+    return _print_results(await resume_deletion(concurrency=_concurrency(args), delete_workers=_delete_workers(args)))
+
+
+async def _retain(args: argparse.Namespace) -> int:
+    """Run the retention passes periodically until interrupted, or a single pass.
+
+    Args:
+        args: Parsed command line arguments.
+
+    Returns:
+        Process exit code, non zero if any dialog of the single pass failed.
+    """
+    try:
+        entity_ids = _parse_ids(args.ids)
+    except ValueError as error:
+        print(f"Invalid dialog ID: {error}", file=sys.stderr)
+        return 2
+    if args.days < 1:
+        print("The retention period must be at least one day.", file=sys.stderr)
+        return 2
+    scheduler = RetentionScheduler(
+        RetentionPolicy(args.account, tuple(entity_ids), args.days),
+        interval=timedelta(minutes=max(1.0, args.interval)),
+        concurrency=_concurrency(args),
+        on_pass=_print_retention_pass,
+    )
+    if args.once:
+        return _print_results((await scheduler.run_pass()).results)
+    await scheduler.run()
+    return 0
+
+
+def _print_retention_pass(retention_pass: RetentionPass) -> None:
+    """Print the summary line of the retention pass.
+
+    Args:
+        retention_pass: Outcome of the pass.
+    """
+    started_at = retention_pass.started_at.astimezone().isoformat(timespec="seconds")
+    print(f"{started_at}\t{retention_pass.deleted_count}\t{retention_pass.failed_count}", flush=True)
+
+
+def _parse_ids(values: List[str]) -> List[int]:
+    """Parse the dialog IDs, reading them from the standard input if requested.
+
+    Args:
+        values: Command line values.
+
+    Returns:
+        Dialog IDs without duplicates, in the given order.
+    """
+    tokens: List[str] = []
+    for value in values:
+        if value == _STDIN_IDS:
+            # The first column is taken, so the output of the list command can be piped as is.
+            tokens.extend(line.split("\t", 1)[0] for line in sys.stdin if line.strip())
+        else:
+            tokens.append(value)
+    return list(dict.fromkeys(int(token) for token in tokens))
+
+
+def _concurrency(args: argparse.Namespace) -> int:
+    """Get the deletion concurrency, the saved setting is used unless it's given on the command line.
+
+    Args:
+        args: Parsed command line arguments.
+
+    Returns:
+        Amount of dialogs processed at the same time.
+    """
+    return max(1, args.concurrency) if args.concurrency else app_settings().delete_concurrency()
+
+
+def _delete_workers(args: argparse.Namespace) -> Optional[int]:
+    """Get the amount of the delete stage workers given on the command line.
+
+    Args:
+        args: Parsed command line arguments.
+
+    Returns:
+        Amount of message chunks deleted at the same time, none to use the concurrency.
+    """
+    return max(1, args.delete_workers) if args.delete_workers else None
+
+
+def _message_filter(args: argparse.Namespace) -> MessageFilter:
+    """Build the message filter from the command line arguments.
+
+    Args:
+        args: Parsed command line arguments.
+
+    Returns:
+        The message filter, empty if nothing is set.
+    """
+    return MessageFilter.from_days(
+        args.min_date,
+        args.max_date,
+        search=args.search.strip(),
+        media=args.media or "",
+        min_id=args.min_id,
+        max_id=args.max_id,
+        whole_history=args.whole_history,
+    )
+
+
+def _print_results(results: Dict[int, DeletionResult]) -> int:
+    """Print the tab separated dialog ID, deleted messages count and the error of each dialog.
+
+    Args:
+        results: Deletion results by the dialog IDs.
+
+    Returns:
+        Process exit code, non zero if any dialog failed.
+    """
+    for entity_id, result in results.items():
+        error = "" if result.error is None else repr(result.error)
+        print(f"{entity_id}\t{result.deleted_count}\t{error}")
+    return 1 if any(result.error is not None for result in results.values()) else 0
@@ -0,0 +1,208 @@
+# Copyright 2023 resurtm@gmail.com
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the "Software"), to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions
+# of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED
+# TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF
+# CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+#
+# https://opensource.org/licenses/MIT
+
+
+"""Headless command line interface tests."""
+
+import io
+import subprocess
+import sys
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import AsyncIterator, List
+
+import pytest
+from cache import CachedDialog
+from cli import main
+from message_filter import MessageFilter
+from pytest_mock import MockerFixture
+from settings import SETTINGS_PATH_ENV, AppSettings, FileSettings
+from telegram import CountResult, DeletionResult
+
+
+@pytest.fixture(autouse=True)
+def _no_shutdown(mocker: MockerFixture) -> None:
+    """Don't touch the real Telegram client, the cache, the journal and the logging configuration."""
+    mocker.patch("cli.shutdown")
+    mocker.patch("cli.use_account")
+    mocker.patch("cli.configure_logging")
+
+
+@pytest.fixture(autouse=True)
+def settings_file(monkeypatch: pytest.MonkeyPatch, mocker: MockerFixture, tmp_path: Path) -> Path:
+    """Use a settings file with the credentials of the default and the "second" accounts.
+
+    Args:
+        monkeypatch: Monkeypatch fixture instance to set the environment variables.
+        mocker: Mocker fixture instance to mock the things.
+        tmp_path: Temporary directory of the unit test.
+
+    Returns:
+        Path of the settings file.
+    """
+    path = tmp_path / "trollogeddon.conf"
+    path.write_text(
+        "[telegram]\napi_id=1\napi_hash=abc\n\n[telegram.second]\napi_id=2\napi_hash=def\n", encoding="utf-8"
+    )
+    monkeypatch.setenv(SETTINGS_PATH_ENV, str(path))
+    # Qt could be imported by the other unit tests, the headless backend is used anyway.
+    mocker.patch("settings._create_backend", side_effect=lambda: FileSettings(path))
+    mocker.patch("settings._instance", None)
+    return path
+
+
+def test_list_dialogs(mocker: MockerFixture, capsys: pytest.CaptureFixture, tmp_path: Path) -> None:
+    """Test the dialogs are listed filtered by the type and the case insensitive title."""
+
+    async def pages(resync: bool) -> AsyncIterator[List[CachedDialog]]:
+        assert resync
+        yield [CachedDialog(1, "Chat One", "User"), CachedDialog(2, "chat two", "Channel")]
+        yield [CachedDialog(3, "Other", "User"), CachedDialog(4, "CHAT four", "User")]
+
+    mocker.patch("cli.iter_dialogs_pages", pages)
+
+    metrics_path = tmp_path / "metrics.prom"
+
+    assert main(["--metrics", str(metrics_path), "list", "--resync", "--type", "User", "--title", "chat"]) == 0
+    assert capsys.readouterr().out == "1\tUser\tChat One\n4\tUser\tCHAT four\n"
+    assert metrics_path.read_text(encoding="utf-8").startswith("# HELP trollogeddon_")
+
+
+def test_delete(mocker: MockerFixture, capsys: pytest.CaptureFixture, monkeypatch: pytest.MonkeyPatch) -> None:
+    """Test the deletion takes the IDs from the arguments and the piped list output, and applies the filters."""
+    delete_mock = mocker.patch(
+        "cli.delete_messages",
+        return_value={1: DeletionResult(5), 2: DeletionResult(0, ValueError("boom")), 3: DeletionResult(1)},
+    )
+    monkeypatch.setattr(sys, "stdin", io.StringIO("2\tUser\tTwo\n\n3\tChannel\tThree\n"))
+
+    exit_code = main(
+        [
+            "delete",
+            "1",
+            "-",
+            "2",
+            "--concurrency",
+            "3",
+            "--delete-workers",
+            "6",
+            "--search",
+            "hi",
+            "--from",
+            "2023-01-02",
+            "--to",
+            "2023-01-05",
+            "--archive",
+            "out.jsonl.gz",
+        ]
+    )
+
+    assert exit_code == 1
+    delete_mock.assert_awaited_once_with(
+        [1, 2, 3],
+        concurrency=3,
+        message_filter=MessageFilter(
+            search="hi",
+            min_date=datetime(2023, 1, 2).astimezone(),
+            max_date=datetime(2023, 1, 6).astimezone(),
+        ),
+        archive_path="out.jsonl.gz",
+        delete_workers=6,
+    )
+    assert capsys.readouterr().out == "1\t5\t\n2\t0\tValueError('boom')\n3\t1\t\n"
+
+
+def test_delete_dry_run(mocker: MockerFixture, capsys: pytest.CaptureFixture) -> None:
+    """Test the dry run only counts the messages and estimates the deletion duration."""
+    count_mock = mocker.patch("cli.count_messages", return_value={1: CountResult(250), 2: CountResult(0)})
+    delete_mock = mocker.patch("cli.delete_messages")
+    mocker.patch("cli.estimate_deletion_seconds", return_value=61.4)
+
+    assert main(["delete", "1", "2", "--dry-run", "--media", "Photos"]) == 0
+    count_mock.assert_awaited_once_with([1, 2], concurrency=mocker.ANY, message_filter=MessageFilter(media="Photos"))
+    delete_mock.assert_not_called()
+    output = capsys.readouterr()
+    assert output.out == "1\t250\t\n2\t0\t\n"
+    assert output.err == "Up to 250 messages, the deletion would take about 0:01:01.\n"
+
+
+def test_resume_nothing(mocker: MockerFixture, capsys: pytest.CaptureFixture) -> None:
+    """Test the resume command doesn't start anything without an interrupted job."""
+    mocker.patch("cli.unfinished_deletion", return_value=None)
+    resume_mock = mocker.patch("cli.resume_deletion")
+    use_account_mock = mocker.patch("cli.use_account")
+
+    assert main(["--account", "second", "resume"]) == 0
+    use_account_mock.assert_awaited_once_with("second")
+    resume_mock.assert_not_called()
+    assert capsys.readouterr().out == "Nothing to resume.\n"
+
+
+def test_retain_once(mocker: MockerFixture, capsys: pytest.CaptureFixture) -> None:
+    """Test the single retention pass deletes the messages older than the retention period of the account."""
+    mocker.patch("retention.current_account", return_value="second")
+    retention_mock = mocker.patch("retention.enforce_retention", return_value={1: DeletionResult(3)})
+
+    assert main(["--account", "second", "retain", "1", "--days", "30", "--once", "--concurrency", "2"]) == 0
+    retention_mock.assert_awaited_once_with(
+        (1,), timedelta(days=30), concurrency=2, now=mocker.ANY, cancel_token=mocker.ANY
+    )
+    assert capsys.readouterr().out == "1\t3\t\n"
+
+
+def test_retain_invalid_days(mocker: MockerFixture, capsys: pytest.CaptureFixture) -> None:
+    """Test the retention period is validated before anything is deleted."""
+    retention_mock = mocker.patch("retention.enforce_retention")
+
+    assert main(["retain", "1", "--days", "0"]) == 2
+    retention_mock.assert_not_called()
+    assert "at least one day" in capsys.readouterr().err
+
+
+def test_config(mocker: MockerFixture, capsys: pytest.CaptureFixture, settings_file: Path) -> None:
+    """Test the credentials of a new account are validated and saved, the missing ones are asked for."""
+    mocker.patch("builtins.input", return_value=" 42 ")
+    mocker.patch("cli.getpass.getpass", return_value="secret")
+
+    assert main(["--account", "third", "config", "--api-id", "x", "--api-hash", "hash"]) == 2
+    assert capsys.readouterr().err == "Invalid API ID: 'x'\n"
+    assert main(["--account", "third", "config"]) == 0
+    assert capsys.readouterr().out == f"Saved to {settings_file}.\n"
+
+    settings = AppSettings(FileSettings(settings_file))
+    assert settings.accounts() == ["trollogeddon", "third"]
+    assert (settings.api_id("third"), settings.api_hash("third")) == (42, "secret")
+
+
+def test_missing_credentials(mocker: MockerFixture, capsys: pytest.CaptureFixture) -> None:
+    """Test the commands fail with a hint before anything is opened if the account has no credentials."""
+    pages_mock = mocker.patch("cli.iter_dialogs_pages")
+    use_account_mock = mocker.patch("cli.use_account")
+
+    assert main(["--account", "third", "list"]) == 2
+    assert capsys.readouterr().err == (
+        "The API ID and hash of the 'third' account aren't set, run: python -m trollogeddon --account third config\n"
+    )
+    pages_mock.assert_not_called()
+    use_account_mock.assert_not_called()
+
+
+def test_qt_is_not_imported() -> None:
+    """Test the headless mode never imports Qt."""
+    code = "import sys, cli; assert not any(name.startswith('PySide6') for name in sys.modules)"
+    subprocess.run([sys.executable, "-c", code], cwd=Path(__file__).parent, check=True)
@@ -0,0 +1,149 @@
+# Copyright 2023 resurtm@gmail.com
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the "Software"), to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions
+# of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED
+# TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF
+# CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+#
+# https://opensource.org/licenses/MIT
+
+"""Aggregation of the deletion progress events for a throttled rendering in the user interface."""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import math
+import time
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Callable, Dict, Final, Hashable, Optional, Tuple
+
+if TYPE_CHECKING:
+    from telegram import DeletionProgress
+
+_LOGGER: Final = logging.getLogger(__name__)
+
+# Minimum interval in seconds between the renderings of the progress.
+DEFAULT_RENDER_INTERVAL: Final = 0.25
+
+
+@dataclass(frozen=True)
+class DeletionSummary:
+    """Progress of the deletion from all the entities."""
+
+    scanned_count: int
+    deleted_count: int
+    # Messages deleted per second by the entities which are still in progress.
+    rate: float
+    done_count: int
+    total_count: int
+
+
+class DeletionMonitor:
+    """Receives the deletion progress events over an async channel and renders their summary with a throttled refresh.
+
+    Reporting an event only puts it into the channel, so the deletion is never slowed down by the rendering. A
+    background task drains the channel and renders the summary at most once per interval, and once more on exit. It
+    has to be used as an async context manager around the deletion.
+    """
+
+    def __init__(
+        self,
+        total_count: int,
+        render: Callable[[DeletionSummary], None],
+        interval: float = DEFAULT_RENDER_INTERVAL,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        """Construct a new instance of the deletion monitor.
+
+        Args:
+            total_count: Amount of the entities which messages are going to be deleted.
+            render: Called with the summary of the progress.
+            interval: Minimum interval in seconds between the renderings.
+            clock: Source of the current time in seconds.
+        """
+        self._total_count = total_count
+        self._render = render
+        self._interval = interval
+        self._clock = clock
+        self._channel: "asyncio.Queue[Optional[Tuple[Hashable, DeletionProgress]]]" = asyncio.Queue()
+        self._latest: Dict[Hashable, DeletionProgress] = {}
+        self._rendered_at = -math.inf
+        self._task: Optional[asyncio.Task] = None
+
+    async def __aenter__(self) -> "DeletionMonitor":
+        """Start rendering the progress.
+
+        Returns:
+            The monitor itself.
+        """
+        self._task = asyncio.ensure_future(self._render_loop())
+        return self
+
+    async def __aexit__(self, *_) -> None:
+        """Render the remaining progress and stop."""
+        self._channel.put_nowait(None)
+        if self._task is not None:
+            await self._task
+
+    def report(self, key: Hashable, progress: DeletionProgress) -> None:
+        """Send the progress event of a single entity to the channel, without waiting for the rendering.
+
+        Args:
+            key: Key of the entity, e.g. the entity ID or the account name & the entity ID.
+            progress: Progress of the entity.
+        """
+        self._channel.put_nowait((key, progress))
+
+    def summary(self) -> DeletionSummary:
+        """Summarize the latest progress of all the entities.
+
+        Returns:
+            Summary of the progress.
+        """
+        return DeletionSummary(
+            scanned_count=sum(progress.scanned_count for progress in self._latest.values()),
+            deleted_count=sum(progress.deleted_count for progress in self._latest.values()),
+            rate=sum(progress.rate for progress in self._latest.values() if not progress.done),
+            done_count=sum(1 for progress in self._latest.values() if progress.done),
+            total_count=self._total_count,
+        )
+
+    async def _render_loop(self) -> None:
+        """Drain the channel and render the summary once the interval has passed since the previous rendering."""
+        _LOGGER.debug("DeletionMonitor, render loop, begin")
+
+        dirty = False
+        while True:
+            timeout = max(0.0, self._rendered_at + self._interval - self._clock()) if dirty else None
+            try:
+                item = await asyncio.wait_for(self._channel.get(), timeout)
+            except asyncio.TimeoutError:
+                self._render_now()
+                dirty = False
+                continue
+            if item is None:
+                break
+            key, progress = item
+            self._latest[key] = progress
+            dirty = True
+            if self._clock() - self._rendered_at >= self._interval:
+                self._render_now()
+                dirty = False
+        self._render_now()
+
+        _LOGGER.debug("DeletionMonitor, render loop, end")
+
+    def _render_now(self) -> None:
+        """Render the summary and remember the time of the rendering."""
+        self._rendered_at = self._clock()
+        self._render(self.summary())
@@ -0,0 +1,58 @@
+# Copyright 2023 resurtm@gmail.com
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the "Software"), to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions
+# of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED
+# TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF
+# CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+#
+# https://opensource.org/licenses/MIT
+
+"""Aggregation of the deletion progress events. Tests."""
+
+import asyncio
+from typing import List
+from unittest.mock import MagicMock, call
+
+import pytest
+from deletion_monitor import DeletionMonitor, DeletionSummary
+from telegram import DeletionProgress
+
+
+@pytest.mark.asyncio
+async def test_deletion_monitor_throttled() -> None:
+    """Test the monitor renders the first event at once and the rest once the channel is closed."""
+    render = MagicMock()
+    now = 100.0
+
+    async with DeletionMonitor(3, render, interval=60.0, clock=lambda: now) as monitor:
+        monitor.report(1, DeletionProgress(1, 100, 100, 10.0))
+        monitor.report(1, DeletionProgress(1, 150, 150, 0.0, done=True))
+        monitor.report(2, DeletionProgress(2, 300, 200, 20.0))
+
+    assert render.call_args_list == [
+        call(DeletionSummary(scanned_count=100, deleted_count=100, rate=10.0, done_count=0, total_count=3)),
+        call(DeletionSummary(scanned_count=450, deleted_count=350, rate=20.0, done_count=1, total_count=3)),
+    ]
+
+
+@pytest.mark.asyncio
+async def test_deletion_monitor_interval() -> None:
+    """Test the monitor renders the pending events once the interval passes, even if no more events arrive."""
+    renders: List[DeletionSummary] = []
+
+    async with DeletionMonitor(1, renders.append, interval=0.01) as monitor:
+        monitor.report(1, DeletionProgress(1, 10, 10, 1.0))
+        monitor.report(1, DeletionProgress(1, 20, 20, 2.0))
+        while len(renders) < 2:
+            await asyncio.sleep(0.01)
+
+    assert [summary.deleted_count for summary in renders] == [10, 20, 20]
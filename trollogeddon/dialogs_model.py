@@ -0,0 +1,616 @@
+# Copyright 2023 resurtm@gmail.com
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the "Software"), to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions
+# of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED
+# TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF
+# CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+#
+# https://opensource.org/licenses/MIT
+
+
+"""Contains the dialogs table model, its compact records storage and the search filter model."""
+
+import logging
+import sys
+from array import array
+from itertools import chain
+from typing import (
+    Any,
+    Collection,
+    Dict,
+    Final,
+    Iterable,
+    List,
+    Optional,
+    Set,
+    Tuple,
+    Union,
+)
+
+from cache import CachedDialog
+from PySide6.QtCore import (
+    QAbstractProxyModel,
+    QAbstractTableModel,
+    QModelIndex,
+    QPersistentModelIndex,
+    Qt,
+    Slot,
+)
+
+_LOGGER: Final = logging.getLogger(__name__)
+
+# Column indexes of the dialogs table model.
+TITLE_COLUMN: Final = 0
+TYPE_COLUMN: Final = 1
+ID_COLUMN: Final = 2
+MESSAGES_COLUMN: Final = 3
+
+_HEADERS: Final = ("Dialog Title", "Entity Type", "Entity ID", "My Messages")
+
+# Telegram ignores the sender while counting the messages of the private chats, so their counts are upper bounds.
+_UPPER_BOUND_TYPES: Final = frozenset({"User"})
+
+# Separates the fields of the search keys, so a query never matches across two fields.
+_KEY_SEPARATOR: Final = "\x00"
+
+_ModelIndex = Union[QModelIndex, QPersistentModelIndex]
+
+
+class DialogRecords:
+    """Compact column-wise storage of the dialog records.
+
+    Each record is a title, an entity type name, an entity ID, a checked flag and an optional count of the user's
+    messages. Entity IDs are kept in a typed array, type names are interned, and checked records are tracked as a set
+    of row indexes, so the checked records are listed without scanning the rows. The counts are only known for the
+    counted records, so they are kept in a dictionary by the row indexes.
+
+    The search index is a case-folded key of every record, precomputed once the record is appended. The rows matching
+    the last query are kept, so a query which extends the last one, i.e. the next keystroke, only rescans those rows
+    and the records appended since then.
+    """
+
+    __slots__ = ("titles", "types", "ids", "checked", "message_counts", "rows", "keys", "_last_search")
+
+    def __init__(self) -> None:
+        """Construct a new empty instance of the dialog records."""
+        self.titles: List[str] = []
+        self.types: List[str] = []
+        self.ids: array = array("q")
+        self.checked: Set[int] = set()
+        self.message_counts: Dict[int, int] = {}
+        self.rows: Dict[int, int] = {}
+        self.keys: List[str] = []
+        # Last query, its matching rows and the amount of the records which were searched.
+        self._last_search: Tuple[str, List[int], int] = ("", [], 0)
+
+    def __len__(self) -> int:
+        """Get the amount of the records.
+
+        Returns:
+            The amount of the records.
+        """
+        return len(self.ids)
+
+    def append(self, title: str, entity_type: str, entity_id: int) -> None:
+        """Append a new unchecked record.
+
+        Args:
+            title: Dialog title.
+            entity_type: Class name of the dialog entity.
+            entity_id: Dialog entity ID.
+        """
+        self.rows.setdefault(entity_id, len(self.ids))
+        self.titles.append(title)
+        self.types.append(sys.intern(entity_type))
+        self.ids.append(entity_id)
+        self.keys.append(_KEY_SEPARATOR.join((title, entity_type, str(entity_id))).casefold())
+
+    def clear(self) -> None:
+        """Remove all the records."""
+        self.titles.clear()
+        self.types.clear()
+        self.ids = array("q")
+        self.checked.clear()
+        self.message_counts.clear()
+        self.rows.clear()
+        self.keys.clear()
+        self._last_search = ("", [], 0)
+
+    def checked_ids(self) -> List[int]:
+        """List the entity IDs of the checked records.
+
+        Returns:
+            Entity IDs of the checked records, in the row order.
+        """
+        return [self.ids[row] for row in sorted(self.checked)]
+
+    def check_ids(self, entity_ids: Collection[int]) -> List[int]:
+        """Check the records with the provided entity IDs.
+
+        Args:
+            entity_ids: Entity IDs of the records to be checked.
+
+        Returns:
+            Rows of the newly checked records.
+        """
+        wanted = set(entity_ids)
+        rows = [row for row, entity_id in enumerate(self.ids) if entity_id in wanted and row not in self.checked]
+        self.checked.update(rows)
+        return rows
+
+    def search(self, query: str) -> List[int]:
+        """Find the records which title, type name or entity ID contains the query, ignoring the case.
+
+        Args:
+            query: Case-folded text to search for, an empty one matches all the records.
+
+        Returns:
+            Rows of the matching records, in the row order.
+        """
+        if not query:
+            return list(range(len(self)))
+        last_query, last_rows, last_count = self._last_search
+        if last_query and last_query in query:
+            candidates: Iterable[int] = chain(last_rows, range(last_count, len(self)))
+        else:
+            candidates = range(len(self))
+        keys = self.keys
+        rows = [row for row in candidates if query in keys[row]]
+        self._last_search = (query, rows, len(self))
+        return rows
+
+    def set_message_count(self, entity_id: int, count: int) -> int:
+        """Set the count of the user's messages of the record with the provided entity ID.
+
+        Args:
+            entity_id: Entity ID of the record.
+            count: Count of the user's messages.
+
+        Returns:
+            Row of the record, -1 if there's no such record.
+        """
+        row = self.rows.get(entity_id, -1)
+        if row >= 0:
+            self.message_counts[row] = count
+        return row
+
+
+class DialogsTableModel(QAbstractTableModel):
+    """Table model of the user's dialogs with a checkable title column."""
+
+    def __init__(self, parent=None) -> None:
+        """Construct a new instance of the dialogs table model.
+
+        Args:
+            parent: Parent object instance.
+        """
+        super().__init__(parent)
+        self._records = DialogRecords()
+
+    def rowCount(self, parent: _ModelIndex = QModelIndex()) -> int:
+        """Get the amount of the rows.
+
+        Args:
+            parent: Parent index, the model is flat so only the root index has rows.
+
+        Returns:
+            The amount of the rows.
+        """
+        return 0 if parent.isValid() else len(self._records)
+
+    def columnCount(self, parent: _ModelIndex = QModelIndex()) -> int:
+        """Get the amount of the columns.
+
+        Args:
+            parent: Parent index, the model is flat so only the root index has columns.
+
+        Returns:
+            The amount of the columns.
+        """
+        return 0 if parent.isValid() else len(_HEADERS)
+
+    def headerData(self, section: int, orientation: Qt.Orientation, role: int = Qt.ItemDataRole.DisplayRole) -> Any:
+        """Get the header data of the section.
+
+        Args:
+            section: Column or row number.
+            orientation: Header orientation.
+            role: Data role.
+
+        Returns:
+            The header data or `None` if there's nothing to show.
+        """
+        if role != Qt.ItemDataRole.DisplayRole:
+            return None
+        if orientation == Qt.Orientation.Horizontal:
+            return _HEADERS[section]
+        return section + 1
+
+    def data(self, index: _ModelIndex, role: int = Qt.ItemDataRole.DisplayRole) -> Any:
+        """Get the data of the cell.
+
+        Args:
+            index: Cell index.
+            role: Data role.
+
+        Returns:
+            The cell data or `None` if there's nothing to show.
+        """
+        if not index.isValid():
+            return None
+        row, column = index.row(), index.column()
+        if role == Qt.ItemDataRole.DisplayRole:
+            if column == TITLE_COLUMN:
+                return self._records.titles[row]
+            if column == TYPE_COLUMN:
+                return self._records.types[row]
+            if column == ID_COLUMN:
+                return str(self._records.ids[row])
+            if column == MESSAGES_COLUMN:
+                return self._message_count_text(row)
+        if role == Qt.ItemDataRole.CheckStateRole and column == TITLE_COLUMN:
+            return Qt.CheckState.Checked if row in self._records.checked else Qt.CheckState.Unchecked
+        return None
+
+    def setData(self, index: _ModelIndex, value: Any, role: int = Qt.ItemDataRole.EditRole) -> bool:
+        """Set the data of the cell, only the check state of the title column can be changed.
+
+        Args:
+            index: Cell index.
+            value: New check state.
+            role: Data role.
+
+        Returns:
+            True if the data was changed.
+        """
+        if not index.isValid() or index.column() != TITLE_COLUMN or role != Qt.ItemDataRole.CheckStateRole:
+            return False
+        if Qt.CheckState(value) == Qt.CheckState.Checked:
+            self._records.checked.add(index.row())
+        else:
+            self._records.checked.discard(index.row())
+        self.dataChanged.emit(index, index, [Qt.ItemDataRole.CheckStateRole])
+        return True
+
+    def flags(self, index: _ModelIndex) -> Qt.ItemFlag:
+        """Get the flags of the cell.
+
+        Args:
+            index: Cell index.
+
+        Returns:
+            The cell flags.
+        """
+        if not index.isValid():
+            return Qt.ItemFlag.NoItemFlags
+        if index.column() == TITLE_COLUMN:
+            return Qt.ItemFlag.ItemIsEnabled | Qt.ItemFlag.ItemIsUserCheckable
+        return Qt.ItemFlag.ItemIsEnabled
+
+    def append_dialogs(self, dialogs: Iterable[CachedDialog]) -> None:
+        """Append the rows of the provided dialogs with a single rows insertion.
+
+        Args:
+            dialogs: Dialogs to be appended.
+        """
+        dialogs = list(dialogs)
+        if not dialogs:
+            return
+        first_row = len(self._records)
+        self.beginInsertRows(QModelIndex(), first_row, first_row + len(dialogs) - 1)
+        for dialog in dialogs:
+            self._records.append(dialog.title, dialog.entity_type, dialog.entity_id)
+        self.endInsertRows()
+        _LOGGER.debug("DialogsTableModel, appended %d rows", len(dialogs))
+
+    def clear(self) -> None:
+        """Remove all the rows."""
+        self.beginResetModel()
+        self._records.clear()
+        self.endResetModel()
+
+    def checked_ids(self) -> List[int]:
+        """List the entity IDs of the checked rows.
+
+        Returns:
+            Entity IDs of the checked rows, in the row order.
+        """
+        return self._records.checked_ids()
+
+    def set_message_count(self, entity_id: int, count: int) -> None:
+        """Show the count of the user's messages in the row with the provided entity ID.
+
+        Args:
+            entity_id: Entity ID of the row.
+            count: Count of the user's messages.
+        """
+        row = self._records.set_message_count(entity_id, count)
+        if row >= 0:
+            index = self.index(row, MESSAGES_COLUMN)
+            self.dataChanged.emit(index, index, [Qt.ItemDataRole.DisplayRole])
+
+    def _message_count_text(self, row: int) -> str:
+        """Format the count of the user's messages of the row.
+
+        Args:
+            row: Row index.
+
+        Returns:
+            The count, prefixed by "≤" if it's an upper bound, or an empty string if the row isn't counted.
+        """
+        count = self._records.message_counts.get(row)
+        if count is None:
+            return ""
+        return f"≤ {count}" if self._records.types[row] in _UPPER_BOUND_TYPES else str(count)
+
+    def check_ids(self, entity_ids: Collection[int]) -> None:
+        """Check the rows with the provided entity IDs, the other rows are left as they are.
+
+        Args:
+            entity_ids: Entity IDs of the rows to be checked.
+        """
+        for row in self._records.check_ids(entity_ids):
+            index = self.index(row, TITLE_COLUMN)
+            self.dataChanged.emit(index, index, [Qt.ItemDataRole.CheckStateRole])
+
+    def search(self, query: str) -> List[int]:
+        """Find the rows which title, type name or entity ID contains the query, ignoring the case.
+
+        Args:
+            query: Text to search for, an empty one matches all the rows.
+
+        Returns:
+            The matching rows, in the row order.
+        """
+        return self._records.search(query.strip().casefold())
+
+    def row_matches(self, row: int, query: str) -> bool:
+        """Check whether the row matches the query without using the search index, e.g. for a row appended later.
+
+        Args:
+            row: Row index.
+            query: Case-folded text to search for.
+
+        Returns:
+            True if the title, the type name or the entity ID of the row contains the query.
+        """
+        return query in self._records.keys[row]
+
+    def check_rows(self, rows: Collection[int]) -> None:
+        """Check the rows, the check states of the whole column are refreshed with a single signal.
+
+        Args:
+            rows: Rows to be checked.
+        """
+        self._records.checked.update(rows)
+        self._emit_check_states_changed()
+
+    def invert_rows(self, rows: Collection[int]) -> None:
+        """Invert the check states of the rows, the check states of the whole column are refreshed with a single signal.
+
+        Args:
+            rows: Rows which check states are inverted.
+        """
+        self._records.checked.symmetric_difference_update(rows)
+        self._emit_check_states_changed()
+
+    def _emit_check_states_changed(self) -> None:
+        """Notify the views the check states of the title column could be changed."""
+        if len(self._records):
+            self.dataChanged.emit(
+                self.index(0, TITLE_COLUMN),
+                self.index(len(self._records) - 1, TITLE_COLUMN),
+                [Qt.ItemDataRole.CheckStateRole],
+            )
+
+
+class DialogsFilterModel(QAbstractProxyModel):
+    """Proxy of the dialogs table model which shows the rows matching the search query only.
+
+    The matching rows are found by the search index of the source model once per query and kept as a list of the
+    source rows, so changing the query costs a single model reset instead of a filter callback per row. Rows appended
+    to the source after the query was set are matched as they come.
+    """
+
+    def __init__(self, source: DialogsTableModel, parent=None) -> None:
+        """Construct a new instance of the dialogs filter model.
+
+        Args:
+            source: Dialogs table model which rows are filtered.
+            parent: Parent object instance.
+        """
+        super().__init__(parent)
+        self._source = source
+        self._query = ""
+        # Visible source rows and their proxy rows by the source rows, none if all the rows are visible.
+        self._rows: Optional[List[int]] = None
+        self._proxy_rows: Dict[int, int] = {}
+        self.setSourceModel(source)
+        source.rowsAboutToBeInserted.connect(self._source_rows_about_to_be_inserted)  # type: ignore
+        source.rowsInserted.connect(self._source_rows_inserted)  # type: ignore
+        source.modelAboutToBeReset.connect(self.beginResetModel)  # type: ignore
+        source.modelReset.connect(self._source_reset)  # type: ignore
+        source.dataChanged.connect(self._source_data_changed)  # type: ignore
+
+    def set_query(self, query: str) -> None:
+        """Show the rows which title, type name or entity ID contains the query, ignoring the case.
+
+        Args:
+            query: Text to search for, an empty one shows all the rows.
+        """
+        query = query.strip().casefold()
+        if query == self._query:
+            return
+        self.beginResetModel()
+        self._query = query
+        self._set_rows(self._source.search(query) if query else None)
+        self.endResetModel()
+
+    def visible_rows(self) -> List[int]:
+        """List the source rows which match the query.
+
+        Returns:
+            The matching rows of the source model, in the row order.
+        """
+        return list(range(self._source.rowCount())) if self._rows is None else list(self._rows)
+
+    def check_all_visible(self) -> None:
+        """Check all the rows which match the query."""
+        self._source.check_rows(self.visible_rows())
+
+    def invert_visible(self) -> None:
+        """Invert the check states of the rows which match the query."""
+        self._source.invert_rows(self.visible_rows())
+
+    def rowCount(self, parent: _ModelIndex = QModelIndex()) -> int:
+        """Get the amount of the visible rows.
+
+        Args:
+            parent: Parent index, the model is flat so only the root index has rows.
+
+        Returns:
+            The amount of the visible rows.
+        """
+        if parent.isValid():
+            return 0
+        return self._source.rowCount() if self._rows is None else len(self._rows)
+
+    def columnCount(self, parent: _ModelIndex = QModelIndex()) -> int:
+        """Get the amount of the columns.
+
+        Args:
+            parent: Parent index, the model is flat so only the root index has columns.
+
+        Returns:
+            The amount of the columns.
+        """
+        return self._source.columnCount(parent)
+
+    def index(self, row: int, column: int, parent: _ModelIndex = QModelIndex()) -> QModelIndex:
+        """Get the index of the cell.
+
+        Args:
+            row: Visible row number.
+            column: Column number.
+            parent: Parent index, the model is flat.
+
+        Returns:
+            The cell index, invalid if there's no such cell.
+        """
+        if parent.isValid() or not self.hasIndex(row, column, parent):
+            return QModelIndex()
+        return self.createIndex(row, column)
+
+    def parent(self, index: _ModelIndex = QModelIndex()) -> QModelIndex:  # type: ignore
+        """Get the parent of the cell.
+
+        Args:
+            index: Cell index.
+
+        Returns:
+            The invalid index, the model is flat.
+        """
+        return QModelIndex()
+
+    def mapToSource(self, proxy_index: _ModelIndex) -> QModelIndex:
+        """Map the visible cell to the cell of the source model.
+
+        Args:
+            proxy_index: Visible cell index.
+
+        Returns:
+            The source cell index.
+        """
+        if not proxy_index.isValid():
+            return QModelIndex()
+        row = proxy_index.row() if self._rows is None else self._rows[proxy_index.row()]
+        return self._source.index(row, proxy_index.column())
+
+    def mapFromSource(self, source_index: _ModelIndex) -> QModelIndex:
+        """Map the cell of the source model to the visible cell.
+
+        Args:
+            source_index: Source cell index.
+
+        Returns:
+            The visible cell index, invalid if the row is filtered out.
+        """
+        if not source_index.isValid():
+            return QModelIndex()
+        row = source_index.row() if self._rows is None else self._proxy_rows.get(source_index.row(), -1)
+        return self.createIndex(row, source_index.column()) if row >= 0 else QModelIndex()
+
+    def _set_rows(self, rows: Optional[List[int]]) -> None:
+        """Set the visible source rows.
+
+        Args:
+            rows: Visible source rows in the row order, none if all the rows are visible.
+        """
+        self._rows = rows
+        self._proxy_rows = {} if rows is None else {row: proxy_row for proxy_row, row in enumerate(rows)}
+
+    @Slot(QModelIndex, int, int)
+    def _source_rows_about_to_be_inserted(self, parent: QModelIndex, first: int, last: int) -> None:
+        """Slot which starts the rows insertion if all the rows are visible, the matching is done after it otherwise.
+
+        Args:
+            parent: Parent index, the model is flat.
+            first: First inserted source row.
+            last: Last inserted source row.
+        """
+        if self._rows is None:
+            self.beginInsertRows(QModelIndex(), first, last)
+
+    @Slot(QModelIndex, int, int)
+    def _source_rows_inserted(self, parent: QModelIndex, first: int, last: int) -> None:
+        """Slot which shows the appended source rows which match the query.
+
+        Args:
+            parent: Parent index, the model is flat.
+            first: First inserted source row.
+            last: Last inserted source row.
+        """
+        if self._rows is None:
+            self.endInsertRows()
+            return
+        matches = [row for row in range(first, last + 1) if self._source.row_matches(row, self._query)]
+        if not matches:
+            return
+        self.beginInsertRows(QModelIndex(), len(self._rows), len(self._rows) + len(matches) - 1)
+        for row in matches:
+            self._proxy_rows[row] = len(self._rows)
+            self._rows.append(row)
+        self.endInsertRows()
+
+    @Slot()
+    def _source_reset(self) -> None:
+        """Slot which finishes the reset of the source model, the query is kept for the rows appended later."""
+        self._set_rows([] if self._query else None)
+        self.endResetModel()
+
+    @Slot(QModelIndex, QModelIndex, list)
+    def _source_data_changed(self, top_left: QModelIndex, bottom_right: QModelIndex, roles: List[int]) -> None:
+        """Slot which forwards the source data changes, the multirow changes refresh all the visible rows.
+
+        Args:
+            top_left: Top left changed source cell.
+            bottom_right: Bottom right changed source cell.
+            roles: Changed data roles.
+        """
+        if top_left.row() == bottom_right.row():
+            first = self.mapFromSource(top_left)
+            if first.isValid():
+                self.dataChanged.emit(first, self.mapFromSource(bottom_right), roles)
+        elif self.rowCount():
+            self.dataChanged.emit(
+                self.index(0, top_left.column()), self.index(self.rowCount() - 1, bottom_right.column()), roles
+            )
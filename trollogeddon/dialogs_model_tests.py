@@ -0,0 +1,205 @@
+# Copyright 2023 resurtm@gmail.com
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the "Software"), to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions
+# of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED
+# TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF
+# CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+#
+# https://opensource.org/licenses/MIT
+
+
+"""Dialogs table model and its compact records storage. Tests."""
+
+from typing import Final
+
+from cache import CachedDialog
+from dialogs_model import (
+    ID_COLUMN,
+    MESSAGES_COLUMN,
+    TITLE_COLUMN,
+    TYPE_COLUMN,
+    DialogRecords,
+    DialogsFilterModel,
+    DialogsTableModel,
+)
+from PySide6.QtCore import QModelIndex, Qt
+from pytest_mock.plugin import MockerFixture
+
+# Dialog records for testing purposes.
+_DIALOG1: Final = CachedDialog(111, "Chat 111", "User")
+_DIALOG2: Final = CachedDialog(222, "Chat 222", "Channel")
+_DIALOG3: Final = CachedDialog(333, "Straße News", "Channel")
+
+
+def test_append_dialogs(mocker: MockerFixture) -> None:
+    """Test the `DialogsTableModel.append_dialogs` method inserts all the rows at once.
+
+    Args:
+        mocker: Mocker fixture instance to mock the things.
+    """
+    model = DialogsTableModel()
+    inserted_mock = mocker.Mock()
+    model.rowsInserted.connect(inserted_mock)
+
+    model.append_dialogs([_DIALOG1, _DIALOG2])
+    model.append_dialogs([_DIALOG1])
+
+    assert model.rowCount() == 3
+    assert model.columnCount() == 4
+    assert inserted_mock.call_count == 2
+    assert model.data(model.index(0, TITLE_COLUMN)) == "Chat 111"
+    assert model.data(model.index(0, TYPE_COLUMN)) == "User"
+    assert model.data(model.index(1, TYPE_COLUMN)) == "Channel"
+    assert model.data(model.index(1, ID_COLUMN)) == "222"
+    assert model.rowCount(model.index(0, TITLE_COLUMN)) == 0
+
+
+def test_checked_ids() -> None:
+    """Test the `DialogsTableModel.checked_ids` method lists the checked rows only, in the row order."""
+    model = DialogsTableModel()
+    model.append_dialogs([_DIALOG1, _DIALOG2])
+    title1 = model.index(0, TITLE_COLUMN)
+    title2 = model.index(1, TITLE_COLUMN)
+
+    assert model.checked_ids() == []
+    assert model.setData(title2, Qt.CheckState.Checked.value, Qt.ItemDataRole.CheckStateRole)
+    assert model.setData(title1, Qt.CheckState.Checked.value, Qt.ItemDataRole.CheckStateRole)
+    assert not model.setData(model.index(0, ID_COLUMN), Qt.CheckState.Checked.value, Qt.ItemDataRole.CheckStateRole)
+    assert model.checked_ids() == [111, 222]
+    assert model.data(title1, Qt.ItemDataRole.CheckStateRole) == Qt.CheckState.Checked
+
+    assert model.setData(title1, Qt.CheckState.Unchecked.value, Qt.ItemDataRole.CheckStateRole)
+    assert model.checked_ids() == [222]
+
+    model.clear()
+    assert model.rowCount(QModelIndex()) == 0
+    assert model.checked_ids() == []
+
+
+def test_check_ids(mocker: MockerFixture) -> None:
+    """Test the `DialogsTableModel.check_ids` method checks the rows by their entity IDs.
+
+    Args:
+        mocker: Mocker fixture instance to mock the things.
+    """
+    model = DialogsTableModel()
+    model.append_dialogs([_DIALOG1, _DIALOG2])
+    changed_mock = mocker.Mock()
+    model.dataChanged.connect(changed_mock)
+
+    model.check_ids([222, 333])
+    model.check_ids([222])
+
+    assert model.checked_ids() == [222]
+    assert changed_mock.call_count == 1
+
+
+def test_set_message_count(mocker: MockerFixture) -> None:
+    """Test the `DialogsTableModel.set_message_count` method fills the messages column of the counted rows only.
+
+    Args:
+        mocker: Mocker fixture instance to mock the things.
+    """
+    model = DialogsTableModel()
+    model.append_dialogs([_DIALOG1, _DIALOG2])
+    changed_mock = mocker.Mock()
+    model.dataChanged.connect(changed_mock)
+
+    model.set_message_count(222, 42)
+    model.set_message_count(333, 1)
+
+    assert changed_mock.call_count == 1
+    assert model.data(model.index(0, MESSAGES_COLUMN)) == ""
+    assert model.data(model.index(1, MESSAGES_COLUMN)) == "42"
+    model.set_message_count(111, 7)
+    assert model.data(model.index(0, MESSAGES_COLUMN)) == "≤ 7"
+
+    model.clear()
+    model.append_dialogs([_DIALOG2])
+    assert model.data(model.index(0, MESSAGES_COLUMN)) == ""
+
+
+def test_search() -> None:
+    """Test the `DialogRecords.search` method matches the case-folded titles, types and IDs, narrowing the last query."""
+    records = DialogRecords()
+    for dialog in (_DIALOG1, _DIALOG2, _DIALOG3):
+        records.append(dialog.title, dialog.entity_type, dialog.entity_id)
+
+    assert records.search("") == [0, 1, 2]
+    assert records.search("strasse") == [2]
+    assert records.search("chan") == [1, 2]
+    assert records.search("channel") == [1, 2]
+    records.append("Channel Four", "Chat", 444)
+    assert records.search("channel") == [1, 2, 3]
+    assert records.search("22") == [1]
+    assert records.search("chat 1") == [0]
+    # Fields are matched separately, the query never spans the title and the type.
+    assert records.search("111user") == []
+
+
+def test_filter_model(mocker: MockerFixture) -> None:
+    """Test the `DialogsFilterModel` shows the matching rows only and maps them to the source rows.
+
+    Args:
+        mocker: Mocker fixture instance to mock the things.
+    """
+    model = DialogsTableModel()
+    model.append_dialogs([_DIALOG1, _DIALOG2, _DIALOG3])
+    proxy = DialogsFilterModel(model)
+    reset_mock = mocker.Mock()
+    proxy.modelReset.connect(reset_mock)
+
+    proxy.set_query("  CHANNEL ")
+    proxy.set_query("channel")
+    assert reset_mock.call_count == 1
+    assert proxy.rowCount() == 2
+    assert proxy.data(proxy.index(1, TITLE_COLUMN)) == "Straße News"
+    assert proxy.mapFromSource(model.index(0, TITLE_COLUMN)).isValid() is False
+    assert proxy.setData(proxy.index(0, TITLE_COLUMN), Qt.CheckState.Checked.value, Qt.ItemDataRole.CheckStateRole)
+    assert model.checked_ids() == [222]
+
+    model.append_dialogs([CachedDialog(444, "Chat 444", "User"), CachedDialog(555, "Channel 555", "Chat")])
+    assert proxy.rowCount() == 3
+    assert proxy.data(proxy.index(2, ID_COLUMN)) == "555"
+
+    proxy.set_query("")
+    assert proxy.rowCount() == 5
+    model.clear()
+    proxy.set_query("chat")
+    model.append_dialogs([_DIALOG1, _DIALOG2])
+    assert [proxy.data(proxy.index(row, ID_COLUMN)) for row in range(proxy.rowCount())] == ["111", "222"]
+
+
+def test_check_visible(mocker: MockerFixture) -> None:
+    """Test the check all visible and invert operations change the matching rows only, with a single signal each.
+
+    Args:
+        mocker: Mocker fixture instance to mock the things.
+    """
+    model = DialogsTableModel()
+    model.append_dialogs([_DIALOG1, _DIALOG2, _DIALOG3])
+    proxy = DialogsFilterModel(model)
+    changed_mock = mocker.Mock()
+    proxy.dataChanged.connect(changed_mock)
+    model.check_ids([111])
+
+    proxy.set_query("channel")
+    proxy.check_all_visible()
+    assert model.checked_ids() == [111, 222, 333]
+    model.check_ids([])
+    proxy.set_query("22")
+    proxy.invert_visible()
+    assert model.checked_ids() == [111, 333]
+    proxy.set_query("")
+    proxy.invert_visible()
+    assert model.checked_ids() == [222]
+    assert changed_mock.call_count == 4
@@ -23,7 +23,7 @@ from typing import Final, Optional
 
 from PySide6.QtWidgets import QDialog, QGridLayout, QLabel, QLineEdit, QPushButton
 from qasync import asyncSlot  # type: ignore
-from telegram import send_otp_code, verify_otp_code
+from telegram import AuthSession, PasswordRequiredError
 
 _LOGGER: Final = logging.getLogger(__name__)
 
@@ -43,7 +43,7 @@ class EnsureSessionDialog(QDialog):
     _send_otp_button: QPushButton
     _sign_in_button: QPushButton
 
-    _phone_hash: Optional[str]
+    _session: Optional[AuthSession]
 
     def __init__(self, parent=None) -> None:
         """Construct a new instance of the user session ensure dialog class.
@@ -54,6 +54,7 @@ class EnsureSessionDialog(QDialog):
         _LOGGER.debug("EnsureSessionDialog, constructor, begin")
         super().__init__(parent)
 
+        self._session = None
         self._create_phone_controls()
         self._create_otp_controls()
         self._create_password_controls()
@@ -129,7 +130,9 @@ class EnsureSessionDialog(QDialog):
     async def _send_otp_clicked(self) -> None:
         """Qt slot handles the OTP code send button click signal."""
         _LOGGER.debug("EnsureSessionDialog, send OTP button click, begin")
-        self._phone_hash = await send_otp_code(phone=self._phone_input.text())
+        self._session = AuthSession(self._phone_input.text())
+        if not await self._session.send_code():
+            _LOGGER.debug("EnsureSessionDialog, already authorized")
         _LOGGER.debug("EnsureSessionDialog, send OTP button click, end")
 
     @asyncSlot()
@@ -137,14 +140,14 @@ class EnsureSessionDialog(QDialog):
         """Qt slot handles the sign-in button click signal."""
         _LOGGER.debug("EnsureSessionDialog, sign in button click, begin")
 
-        if self._phone_hash is None:
-            _LOGGER.debug("EnsureSessionDialog, phone hash is empty, do nothing")
+        if self._session is None:
+            _LOGGER.debug("EnsureSessionDialog, OTP code wasn't requested, do nothing")
         else:
-            await verify_otp_code(
-                phone=self._phone_input.text(),
-                otp_code=self._otp_input.text(),
-                phone_hash=self._phone_hash,
-                password=self._password_input.text(),
-            )
+            try:
+                await self._session.sign_in(self._otp_input.text(), self._password_input.text() or None)
+            except PasswordRequiredError:
+                _LOGGER.debug("EnsureSessionDialog, cloud password is required")
+                self._password_input.setPlaceholderText("Required")
+                self._password_input.setFocus()
 
         _LOGGER.debug("EnsureSessionDialog, sign in button click, end")
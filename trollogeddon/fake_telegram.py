@@ -0,0 +1,286 @@
+# Copyright 2023 resurtm@gmail.com
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the "Software"), to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions
+# of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED
+# TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF
+# CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+#
+# https://opensource.org/licenses/MIT
+
+
+"""Fake in-process Telegram backend for benchmarking, it mimics the `TelegramClient` methods used by the app."""
+
+import asyncio
+import random
+from bisect import bisect_left, bisect_right
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+from typing import Any, AsyncIterator, Dict, Final, Iterable, List, Optional
+
+from telethon.errors.rpcerrorlist import FloodWaitError  # type: ignore
+from telethon.tl.types import InputPeerUser, User  # type: ignore
+
+# Amount of items Telegram returns in a single page of the dialogs or messages.
+_PAGE_SIZE: Final = 100
+# Every message with an ID divisible by this value contains the `SEARCH_TERM`.
+_SEARCH_TERM_EVERY: Final = 10
+# Date of the message with ID 0, every next message is one minute newer.
+_FIRST_MESSAGE_DATE: Final = datetime(2020, 1, 1, tzinfo=timezone.utc)
+
+# Text which is contained by every tenth message.
+SEARCH_TERM: Final = "needle"
+
+
+@dataclass(frozen=True)
+class FakeMessage:
+    """Fake Telegram message, only the fields which are used by the app."""
+
+    id: int
+    date: datetime
+    text: str
+
+
+class FakeTelegramClient:
+    """Fake Telegram client serving synthetic dialogs and own messages from memory.
+
+    Every page of the dialogs or messages and every delete request counts as one RPC. An RPC sleeps for the simulated
+    latency and raises a flood wait with the configured probability, the random generator is seeded, so the runs are
+    repeatable. Only the own messages are served, so `from_user` is ignored.
+    """
+
+    def __init__(
+        self,
+        dialog_count: int,
+        messages_per_dialog: int,
+        latency: float = 0.0,
+        flood_probability: float = 0.0,
+        flood_seconds: float = 0.0,
+        seed: int = 0,
+    ) -> None:
+        """Construct a new instance of the fake Telegram client.
+
+        Args:
+            dialog_count: Amount of the synthetic dialogs, their entity IDs start with 1.
+            messages_per_dialog: Amount of the own messages in every dialog, their IDs start with 1.
+            latency: Duration of every RPC, seconds.
+            flood_probability: Probability of every RPC to fail with a flood wait.
+            flood_seconds: Duration of the injected flood waits, seconds.
+            seed: Seed of the random generator which injects the flood waits.
+        """
+        self._messages: Dict[int, List[int]] = {
+            entity_id: list(range(1, messages_per_dialog + 1)) for entity_id in range(1, dialog_count + 1)
+        }
+        self._latency = latency
+        self._flood_probability = flood_probability
+        self._flood_seconds = flood_seconds
+        self._random = random.Random(seed)
+        self._connected = False
+        self.rpc_count = 0
+        self.flood_wait_count = 0
+
+    @property
+    def entity_ids(self) -> List[int]:
+        """Get the entity IDs of the synthetic dialogs.
+
+        Returns:
+            The entity IDs.
+        """
+        return list(self._messages)
+
+    def message_ids(self, entity_id: int) -> List[int]:
+        """Get the IDs of the messages which are not deleted yet.
+
+        Args:
+            entity_id: Entity ID of the dialog.
+
+        Returns:
+            The message IDs in the ascending order.
+        """
+        return list(self._messages[entity_id])
+
+    def is_connected(self) -> bool:
+        """Check whether the client is connected.
+
+        Returns:
+            True if connected.
+        """
+        return self._connected
+
+    async def connect(self) -> None:
+        """Connect the client."""
+        self._connected = True
+
+    async def disconnect(self) -> None:
+        """Disconnect the client."""
+        self._connected = False
+
+    async def iter_dialogs(self, limit: Optional[int] = None, offset_peer: Any = None, **_: Any) -> AsyncIterator[Any]:
+        """Iterate over the synthetic dialogs, one RPC per page.
+
+        Args:
+            limit: Maximum amount of the dialogs, all of them if not provided.
+            offset_peer: Start after the dialog of this input peer.
+
+        Yields:
+            Dialogs with the name, the user entity, its input peer and the last message.
+        """
+        entity_ids = self.entity_ids
+        if offset_peer is not None:
+            entity_ids = entity_ids[entity_ids.index(offset_peer.user_id) + 1 :]
+        entity_ids = entity_ids[:limit]
+        for start in range(0, len(entity_ids), _PAGE_SIZE):
+            await self._rpc()
+            for entity_id in entity_ids[start : start + _PAGE_SIZE]:
+                yield SimpleNamespace(
+                    name=f"Dialog {entity_id}",
+                    entity=User(id=entity_id),
+                    input_entity=InputPeerUser(entity_id, entity_id),
+                    date=None,
+                    message=None,
+                )
+
+    async def iter_messages(
+        self,
+        entity: Any,
+        from_user: Any = None,
+        min_id: int = 0,
+        max_id: int = 0,
+        offset_id: int = 0,
+        reverse: bool = False,
+        search: Optional[str] = None,
+        offset_date: Optional[datetime] = None,
+        **_: Any,
+    ) -> AsyncIterator[FakeMessage]:
+        """Iterate over the own messages of the dialog, one RPC per page.
+
+        Args:
+            entity: Entity ID or input peer of the dialog.
+            from_user: Ignored, all the messages are own ones.
+            min_id: Only the messages newer than this ID.
+            max_id: Only the messages older than this ID.
+            offset_id: Start after this ID, in the iteration order.
+            reverse: Iterate from the oldest messages, the newest go first otherwise.
+            search: Only the messages containing the text.
+            offset_date: Only the messages older than the date.
+
+        Yields:
+            The matching messages.
+        """
+        low, high = max(min_id, offset_id if reverse else 0), max_id or None
+        if not reverse and offset_id:
+            high = min(high or offset_id, offset_id)
+        while True:
+            await self._rpc()
+            page = self._page(self._messages[_entity_id(entity)], low, high, reverse, search, offset_date)
+            for message in page:
+                yield message
+            if len(page) < _PAGE_SIZE:
+                return
+            if reverse:
+                low = page[-1].id
+            else:
+                high = page[-1].id
+
+    async def delete_messages(self, entity: Any, message_ids: Iterable[int]) -> None:
+        """Delete the messages with a single RPC.
+
+        Args:
+            entity: Entity ID or input peer of the dialog.
+            message_ids: IDs of the messages to be deleted.
+        """
+        await self._rpc()
+        deleted = set(message_ids)
+        entity_id = _entity_id(entity)
+        self._messages[entity_id] = [
+            message_id for message_id in self._messages[entity_id] if message_id not in deleted
+        ]
+
+    async def _rpc(self) -> None:
+        """Simulate a single RPC: wait for the latency and inject a flood wait randomly.
+
+        Raises:
+            FloodWaitError: The flood wait is injected.
+        """
+        self.rpc_count += 1
+        if self._latency:
+            await asyncio.sleep(self._latency)
+        if self._flood_probability and self._random.random() < self._flood_probability:
+            self.flood_wait_count += 1
+            error = FloodWaitError(request=None, capture=0)
+            # Real flood waits are whole seconds, fractions keep the benchmark runs short.
+            error.seconds = self._flood_seconds
+            raise error
+
+    @staticmethod
+    def _page(
+        ids: List[int],
+        low: int,
+        high: Optional[int],
+        reverse: bool,
+        search: Optional[str],
+        offset_date: Optional[datetime],
+    ) -> List[FakeMessage]:
+        """Select the next page of the messages.
+
+        Args:
+            ids: Message IDs of the dialog in the ascending order.
+            low: Exclusive lower ID bound.
+            high: Exclusive upper ID bound, `None` if there's none.
+            reverse: Select the oldest messages, the newest otherwise.
+            search: Only the messages containing the text.
+            offset_date: Only the messages older than the date.
+
+        Returns:
+            Up to a page of the matching messages, in the iteration order.
+        """
+        start = bisect_right(ids, low)
+        end = len(ids) if high is None else bisect_left(ids, high)
+        candidates = ids[start:end] if reverse else reversed(ids[start:end])
+        page: List[FakeMessage] = []
+        for message_id in candidates:
+            message = _fake_message(message_id)
+            if search and search not in message.text:
+                continue
+            if offset_date is not None and message.date >= offset_date:
+                continue
+            page.append(message)
+            if len(page) == _PAGE_SIZE:
+                break
+        return page
+
+
+def _entity_id(entity: Any) -> int:
+    """Get the entity ID of the dialog, the input peers are sent once the dialogs were fetched.
+
+    Args:
+        entity: Entity ID or input peer of the dialog.
+
+    Returns:
+        The entity ID.
+    """
+    return entity.user_id if isinstance(entity, InputPeerUser) else entity
+
+
+def _fake_message(message_id: int) -> FakeMessage:
+    """Create the synthetic message with the ID.
+
+    Args:
+        message_id: ID of the message.
+
+    Returns:
+        The message, its date and text depend on the ID only.
+    """
+    text = f"message {message_id}"
+    if message_id % _SEARCH_TERM_EVERY == 0:
+        text = f"{text} {SEARCH_TERM}"
+    return FakeMessage(message_id, _FIRST_MESSAGE_DATE + timedelta(minutes=message_id), text)
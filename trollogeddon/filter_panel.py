@@ -0,0 +1,207 @@
+# Copyright 2023 resurtm@gmail.com
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the "Software"), to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions
+# of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED
+# TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF
+# CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+#
+# https://opensource.org/licenses/MIT
+
+
+"""Contains the deletion filters panel class."""
+
+import logging
+import os
+from datetime import date
+from typing import Final, Optional
+
+from archive import DEFAULT_ARCHIVE_NAME
+from message_filter import MEDIA_FILTERS, MessageFilter
+from PySide6.QtCore import QDate
+from PySide6.QtWidgets import (
+    QCheckBox,
+    QComboBox,
+    QDateEdit,
+    QGridLayout,
+    QGroupBox,
+    QLabel,
+    QLineEdit,
+    QSpinBox,
+)
+
+_LOGGER: Final = logging.getLogger(__name__)
+
+_ALL_MEDIA: Final = "All Messages"
+# Message IDs are 32-bit signed integers, same as the spin box values.
+_MAX_MESSAGE_ID: Final = 2**31 - 1
+
+
+class FilterPanel(QGroupBox):
+    """Panel with the controls of the message filters applied to the next deletion job."""
+
+    _search_input: QLineEdit
+    _media_input: QComboBox
+
+    _min_date_check: QCheckBox
+    _min_date_input: QDateEdit
+    _max_date_check: QCheckBox
+    _max_date_input: QDateEdit
+
+    _min_id_input: QSpinBox
+    _max_id_input: QSpinBox
+
+    _whole_history_check: QCheckBox
+
+    _archive_check: QCheckBox
+    _archive_input: QLineEdit
+
+    def __init__(self, parent=None) -> None:
+        """Construct a new instance of the deletion filters panel class.
+
+        Args:
+            parent: parent object.
+        """
+        _LOGGER.debug("FilterPanel, constructor, begin")
+        super().__init__("Deletion Filters", parent)
+
+        self._create_search_controls()
+        self._create_date_controls()
+        self._create_id_controls()
+        self._create_whole_history_control()
+        self._create_archive_controls()
+        self._create_layout()
+
+        _LOGGER.debug("FilterPanel, constructor, end")
+
+    def _create_search_controls(self) -> None:
+        """Create the text search and media type controls."""
+        _LOGGER.debug("FilterPanel, create search controls, begin")
+
+        self._search_input = QLineEdit(self)
+        self._search_input.setPlaceholderText("Text to search for")
+        self._media_input = QComboBox(self)
+        self._media_input.addItems([_ALL_MEDIA, *MEDIA_FILTERS])
+
+        _LOGGER.debug("FilterPanel, create search controls, end")
+
+    def _create_date_controls(self) -> None:
+        """Create the date range controls, each bound is applied only if it's checked."""
+        _LOGGER.debug("FilterPanel, create date controls, begin")
+
+        today = QDate.currentDate()
+        self._min_date_check = QCheckBox("From:", self)
+        self._min_date_input = QDateEdit(today.addMonths(-1), self)
+        self._min_date_input.setCalendarPopup(True)
+        self._max_date_check = QCheckBox("To:", self)
+        self._max_date_input = QDateEdit(today, self)
+        self._max_date_input.setCalendarPopup(True)
+
+        _LOGGER.debug("FilterPanel, create date controls, end")
+
+    def _create_id_controls(self) -> None:
+        """Create the message ID range controls, zero means no bound."""
+        _LOGGER.debug("FilterPanel, create ID controls, begin")
+
+        self._min_id_input = QSpinBox(self)
+        self._min_id_input.setRange(0, _MAX_MESSAGE_ID)
+        self._min_id_input.setSpecialValueText("Any")
+        self._max_id_input = QSpinBox(self)
+        self._max_id_input.setRange(0, _MAX_MESSAGE_ID)
+        self._max_id_input.setSpecialValueText("Any")
+
+        _LOGGER.debug("FilterPanel, create ID controls, end")
+
+    def _create_whole_history_control(self) -> None:
+        """Create the whole history deletion mode control, it's only used if nothing is filtered."""
+        _LOGGER.debug("FilterPanel, create whole history control, begin")
+
+        self._whole_history_check = QCheckBox("Delete whole history where possible (both sides of private chats)", self)
+        self._whole_history_check.setToolTip(
+            "Private chats are cleared for both sides with a single request, channels & supergroups where you're an"
+            " admin have all your messages deleted at once, other dialogs are deleted message by message."
+        )
+
+        _LOGGER.debug("FilterPanel, create whole history control, end")
+
+    def _create_archive_controls(self) -> None:
+        """Create the archive controls, the messages are archived only if it's checked."""
+        _LOGGER.debug("FilterPanel, create archive controls, begin")
+
+        self._archive_check = QCheckBox("Archive to:", self)
+        self._archive_check.setToolTip(
+            "Your messages are written to a compressed JSON lines file before they're deleted, the whole history"
+            " deletion is replaced by the message by message deletion then."
+        )
+        self._archive_input = QLineEdit(os.path.join(os.path.expanduser("~"), DEFAULT_ARCHIVE_NAME), self)
+
+        _LOGGER.debug("FilterPanel, create archive controls, end")
+
+    def _create_layout(self) -> None:
+        """Create a layout of the deletion filters panel."""
+        _LOGGER.debug("FilterPanel, create layout, begin")
+
+        layout = QGridLayout(self)
+        layout.addWidget(QLabel("Search:"), 0, 0)
+        layout.addWidget(self._search_input, 0, 1)
+        layout.addWidget(QLabel("Media:"), 0, 2)
+        layout.addWidget(self._media_input, 0, 3)
+        layout.addWidget(self._min_date_check, 1, 0)
+        layout.addWidget(self._min_date_input, 1, 1)
+        layout.addWidget(self._max_date_check, 1, 2)
+        layout.addWidget(self._max_date_input, 1, 3)
+        layout.addWidget(QLabel("Min ID:"), 2, 0)
+        layout.addWidget(self._min_id_input, 2, 1)
+        layout.addWidget(QLabel("Max ID:"), 2, 2)
+        layout.addWidget(self._max_id_input, 2, 3)
+        layout.addWidget(self._whole_history_check, 3, 0, 1, 4)
+        layout.addWidget(self._archive_check, 4, 0)
+        layout.addWidget(self._archive_input, 4, 1, 1, 3)
+        self.setLayout(layout)
+
+        _LOGGER.debug("FilterPanel, create layout, end")
+
+    def message_filter(self) -> MessageFilter:
+        """Build the message filter from the current state of the controls.
+
+        Returns:
+            The message filter, empty if nothing is set.
+        """
+        media = self._media_input.currentText()
+        return MessageFilter.from_days(
+            _to_date(self._min_date_input.date()) if self._min_date_check.isChecked() else None,
+            _to_date(self._max_date_input.date()) if self._max_date_check.isChecked() else None,
+            search=self._search_input.text().strip(),
+            media="" if media == _ALL_MEDIA else media,
+            min_id=self._min_id_input.value(),
+            max_id=self._max_id_input.value(),
+            whole_history=self._whole_history_check.isChecked(),
+        )
+
+    def archive_path(self) -> str:
+        """Get the path to the archive the messages are written to before the deletion.
+
+        Returns:
+            The path, empty if the messages are not archived.
+        """
+        return self._archive_input.text().strip() if self._archive_check.isChecked() else ""
+
+
+def _to_date(value: QDate) -> date:
+    """Convert the Qt date into the Python one.
+
+    Args:
+        value: Date to be converted.
+
+    Returns:
+        The same date.
+    """
+    return date(value.year(), value.month(), value.day())
@@ -0,0 +1,213 @@
+# Copyright 2023 resurtm@gmail.com
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the "Software"), to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions
+# of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED
+# TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF
+# CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+#
+# https://opensource.org/licenses/MIT
+
+
+"""On-disk journal of the deletion jobs which allows to resume them."""
+
+import json
+import logging
+import sqlite3
+from dataclasses import dataclass, field
+from typing import Any, Dict, Final, Iterable, List, Optional
+
+_LOGGER: Final = logging.getLogger(__name__)
+
+# Kind of the jobs started by the user, the unfinished ones are resumed.
+DELETION_JOB: Final = "deletion"
+# Kind of the jobs of the retention passes, they're never resumed since the next pass rescans their messages anyway.
+RETENTION_JOB: Final = "retention"
+
+_SCHEMA: Final = """
+CREATE TABLE IF NOT EXISTS jobs (
+    job_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    finished INTEGER NOT NULL DEFAULT 0,
+    filters TEXT NOT NULL DEFAULT '{}',
+    archive_path TEXT NOT NULL DEFAULT '',
+    kind TEXT NOT NULL DEFAULT 'deletion'
+);
+CREATE TABLE IF NOT EXISTS job_entities (
+    job_id INTEGER NOT NULL,
+    position INTEGER NOT NULL,
+    entity_id INTEGER NOT NULL,
+    deleted_count INTEGER NOT NULL DEFAULT 0,
+    done INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (job_id, entity_id)
+);
+"""
+
+
+@dataclass
+class EntityProgress:
+    """Checkpointed progress of a deletion job in a single entity."""
+
+    entity_id: int
+    deleted_count: int = 0
+    done: bool = False
+
+
+@dataclass
+class DeletionJob:
+    """Deletion job with the checkpointed progress of its entities."""
+
+    job_id: int
+    entities: Dict[int, EntityProgress]
+    filters: Dict[str, Any] = field(default_factory=dict)
+    # Path of the archive the messages are written to before they are deleted, empty if they aren't archived.
+    archive_path: str = ""
+
+    @property
+    def pending_ids(self) -> List[int]:
+        """List the entity IDs which are not done yet.
+
+        Returns:
+            Entity IDs which are not done yet, in the job order.
+        """
+        return [entity_id for entity_id, progress in self.entities.items() if not progress.done]
+
+
+class DeletionJournal:
+    """SQLite journal of the deletion jobs.
+
+    Every job lists its entities with the checkpointed progress: whether the entity is done and the amount of the
+    deleted messages. The progress is written after every deleted chunk, so an interrupted job is resumed where it
+    stopped, together with the message IDs cache which remembers the scanned and not yet deleted messages. Only the
+    jobs of the `DELETION_JOB` kind are resumed, the retention passes run as jobs of their own kind.
+    """
+
+    def __init__(self, path: str) -> None:
+        """Construct a new instance of the journal, creating the database file if needed.
+
+        Args:
+            path: Path to the SQLite database file, ":memory:" keeps the journal in memory only.
+        """
+        _LOGGER.debug("DeletionJournal, constructor, begin, path: %s", path)
+        self._connection = sqlite3.connect(path)
+        self._connection.executescript(_SCHEMA)
+        self._migrate()
+        _LOGGER.debug("DeletionJournal, constructor, end")
+
+    def _migrate(self) -> None:
+        """Add the columns which are missing in the journals created by the older versions."""
+        columns = {row[1] for row in self._connection.execute("PRAGMA table_info(jobs)")}
+        if "filters" not in columns:
+            with self._connection:
+                self._connection.execute("ALTER TABLE jobs ADD COLUMN filters TEXT NOT NULL DEFAULT '{}'")
+        if "archive_path" not in columns:
+            with self._connection:
+                self._connection.execute("ALTER TABLE jobs ADD COLUMN archive_path TEXT NOT NULL DEFAULT ''")
+        if "kind" not in columns:
+            with self._connection:
+                self._connection.execute("ALTER TABLE jobs ADD COLUMN kind TEXT NOT NULL DEFAULT 'deletion'")
+
+    def close(self) -> None:
+        """Close the database connection."""
+        self._connection.close()
+
+    def start_job(
+        self,
+        entity_ids: Iterable[int],
+        filters: Optional[Dict[str, Any]] = None,
+        archive_path: str = "",
+        kind: str = DELETION_JOB,
+    ) -> DeletionJob:
+        """Start a new job, the unfinished jobs of the same kind started before are abandoned.
+
+        Args:
+            entity_ids: Entity IDs to delete the messages from.
+            filters: JSON serializable message filters of the job, applied again when the job is resumed.
+            archive_path: Path of the archive the messages are written to before they are deleted, empty if none.
+            kind: Kind of the job, either `DELETION_JOB` or `RETENTION_JOB`.
+
+        Returns:
+            The new job.
+        """
+        entity_ids = list(dict.fromkeys(entity_ids))
+        filters = filters or {}
+        with self._connection:
+            self._connection.execute("UPDATE jobs SET finished = 1 WHERE finished = 0 AND kind = ?", (kind,))
+            cursor = self._connection.execute(
+                "INSERT INTO jobs (filters, archive_path, kind) VALUES (?, ?, ?)",
+                (json.dumps(filters), archive_path, kind),
+            )
+            job_id = int(cursor.lastrowid or 0)
+            self._connection.executemany(
+                "INSERT INTO job_entities (job_id, position, entity_id) VALUES (?, ?, ?)",
+                ((job_id, position, entity_id) for position, entity_id in enumerate(entity_ids)),
+            )
+        _LOGGER.debug("DeletionJournal, started job %d, entities: %d", job_id, len(entity_ids))
+        entities = {entity_id: EntityProgress(entity_id) for entity_id in entity_ids}
+        return DeletionJob(job_id, entities, filters, archive_path)
+
+    def unfinished_job(self) -> Optional[DeletionJob]:
+        """Get the latest deletion job which was not finished, the retention passes are not resumed.
+
+        Returns:
+            The latest unfinished job or `None` if there's none.
+        """
+        row = self._connection.execute(
+            "SELECT job_id, filters, archive_path FROM jobs WHERE finished = 0 AND kind = ? "
+            "ORDER BY job_id DESC LIMIT 1",
+            (DELETION_JOB,),
+        ).fetchone()
+        if row is None:
+            return None
+        job_id, filters, archive_path = row
+        rows = self._connection.execute(
+            "SELECT entity_id, deleted_count, done FROM job_entities WHERE job_id = ? ORDER BY position",
+            (job_id,),
+        )
+        entities = {entity_id: EntityProgress(entity_id, *rest) for entity_id, *rest in rows}
+        return DeletionJob(job_id, entities, json.loads(filters), archive_path)
+
+    def record_chunk(self, job_id: int, entity_id: int, message_ids: List[int]) -> None:
+        """Checkpoint a deleted chunk of messages, only the amount is kept since the resumed entities are rescanned.
+
+        Args:
+            job_id: Job ID.
+            entity_id: Entity ID the messages were deleted from.
+            message_ids: IDs of the deleted messages.
+        """
+        if not message_ids:
+            return
+        with self._connection:
+            self._connection.execute(
+                "UPDATE job_entities SET deleted_count = deleted_count + ? WHERE job_id = ? AND entity_id = ?",
+                (len(message_ids), job_id, entity_id),
+            )
+
+    def finish_entity(self, job_id: int, entity_id: int) -> None:
+        """Mark all the messages of the entity as deleted.
+
+        Args:
+            job_id: Job ID.
+            entity_id: Entity ID.
+        """
+        with self._connection:
+            self._connection.execute(
+                "UPDATE job_entities SET done = 1 WHERE job_id = ? AND entity_id = ?", (job_id, entity_id)
+            )
+
+    def finish_job(self, job_id: int) -> None:
+        """Mark the job as finished, so it's not resumed anymore.
+
+        Args:
+            job_id: Job ID.
+        """
+        with self._connection:
+            self._connection.execute("UPDATE jobs SET finished = 1 WHERE job_id = ?", (job_id,))
+        _LOGGER.debug("DeletionJournal, finished job %d", job_id)
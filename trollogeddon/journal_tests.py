@@ -0,0 +1,87 @@
+# Copyright 2023 resurtm@gmail.com
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the "Software"), to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions
+# of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED
+# TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF
+# CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+#
+# https://opensource.org/licenses/MIT
+
+
+"""On-disk journal of the deletion jobs which allows to resume them. Tests."""
+
+from journal import RETENTION_JOB, DeletionJournal, EntityProgress
+
+
+def test_job_progress() -> None:
+    """Test the job progress is checkpointed per chunk and the finished jobs are not resumed."""
+    journal = DeletionJournal(":memory:")
+    assert journal.unfinished_job() is None
+
+    job = journal.start_job([3, 1, 3, 2])
+    assert list(job.entities) == [3, 1, 2]
+
+    journal.record_chunk(job.job_id, 1, [10, 12, 11])
+    journal.record_chunk(job.job_id, 1, [5])
+    journal.finish_entity(job.job_id, 3)
+
+    unfinished = journal.unfinished_job()
+    assert unfinished is not None
+    assert unfinished.job_id == job.job_id
+    assert unfinished.entities == {
+        3: EntityProgress(3, done=True),
+        1: EntityProgress(1, deleted_count=4),
+        2: EntityProgress(2),
+    }
+    assert unfinished.pending_ids == [1, 2]
+
+    journal.finish_job(job.job_id)
+    assert journal.unfinished_job() is None
+
+
+def test_start_job_abandons_unfinished() -> None:
+    """Test the `DeletionJournal.start_job` method abandons the unfinished jobs started before."""
+    journal = DeletionJournal(":memory:")
+    journal.start_job([1])
+    job = journal.start_job([2])
+
+    unfinished = journal.unfinished_job()
+    assert unfinished is not None
+    assert unfinished.job_id == job.job_id
+    assert unfinished.pending_ids == [2]
+
+
+def test_retention_jobs() -> None:
+    """Test the retention jobs neither abandon the unfinished deletion job nor are resumed themselves."""
+    journal = DeletionJournal(":memory:")
+    job = journal.start_job([1, 2])
+    journal.start_job([3], kind=RETENTION_JOB)
+    journal.start_job([4], kind=RETENTION_JOB)
+
+    unfinished = journal.unfinished_job()
+    assert unfinished is not None
+    assert unfinished.job_id == job.job_id
+    assert unfinished.pending_ids == [1, 2]
+
+    journal.finish_job(job.job_id)
+    assert journal.unfinished_job() is None
+
+
+def test_archive_path() -> None:
+    """Test the archive path of the job is kept, so the resumed job archives the messages too."""
+    journal = DeletionJournal(":memory:")
+    job = journal.start_job([1], {"search": "x"}, archive_path="backup.jsonl.gz")
+
+    unfinished = journal.unfinished_job()
+    assert unfinished is not None
+    assert (unfinished.filters, unfinished.archive_path) == ({"search": "x"}, "backup.jsonl.gz")
+    assert job.archive_path == "backup.jsonl.gz"
@@ -16,30 +16,81 @@
 #
 # https://opensource.org/licenses/MIT
 
-"""Contains main window class of the application."""
+"""Contains main window class of the application.
 
+The window is shown before Telethon is loaded: the Telegram modules and the dialogs are imported lazily, on their
+first use, so the modules imported here have to stay free of the Telethon imports.
+"""
+
+from __future__ import annotations
+
+import asyncio
 import logging
-from typing import Final, List
+from datetime import timedelta
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Awaitable,
+    Callable,
+    Dict,
+    Final,
+    List,
+    Mapping,
+    Optional,
+)
 
-from ensure_dialog import EnsureSessionDialog
+from deletion_monitor import DeletionMonitor, DeletionSummary
+from dialogs_model import (
+    ID_COLUMN,
+    MESSAGES_COLUMN,
+    TITLE_COLUMN,
+    TYPE_COLUMN,
+    DialogsFilterModel,
+    DialogsTableModel,
+)
+from filter_panel import FilterPanel
+from lazy_modules import lazy_module
+from message_filter import MessageFilter
 from PySide6.QtCore import QSize, Qt, Slot
-from PySide6.QtGui import QAction
+from PySide6.QtGui import QAction, QCloseEvent
 from PySide6.QtWidgets import (
     QApplication,
+    QComboBox,
+    QDockWidget,
     QGridLayout,
+    QInputDialog,
+    QLineEdit,
     QMainWindow,
+    QProgressBar,
     QPushButton,
-    QTableWidget,
-    QTableWidgetItem,
+    QSystemTrayIcon,
+    QTableView,
     QToolBar,
     QWidget,
 )
 from qasync import asyncSlot  # type: ignore
-from settings_dialog import SettingsDialog
-from telegram import delete_messages, fetch_all_dialogs
+from retention_tray import RetentionTray
+from settings import app_settings
+from stats_panel import StatsPanel
+
+if TYPE_CHECKING:
+    import account_workers
+    import ensure_dialog
+    import retention
+    import settings_dialog
+    import telegram
+else:
+    account_workers = lazy_module("account_workers")
+    ensure_dialog = lazy_module("ensure_dialog")
+    retention = lazy_module("retention")
+    settings_dialog = lazy_module("settings_dialog")
+    telegram = lazy_module("telegram")
 
 _LOGGER: Final = logging.getLogger(__name__)
 
+# Retention period which is offered when the retention cleanup is set up for the first time.
+_DEFAULT_RETENTION_DAYS: Final = 30
+
 
 class MainWindow(QMainWindow):
     """Main window class of the application."""
@@ -53,19 +104,42 @@ class MainWindow(QMainWindow):
         _LOGGER.debug("MainWindow, constructor, begin")
         super().__init__(parent)
 
+        self._fetch_task: Optional[asyncio.Task] = None
+        self._cancel_token: Optional[telegram.CancelToken] = None
+        self._exiting = False
+        # Checked entity IDs of the accounts other than the current one, they are deleted together with the current.
+        self._selections: Dict[str, List[int]] = {}
+
         self._main_setup()
 
         self._create_actions()
+        self._create_retention_tray()
+        self._create_stats_dock()
+        self._create_account_selector()
         self._create_start_menu()
         self._create_toolbar()
 
         self._create_dialogs_table()
+        self._create_dialogs_search_controls()
+        self._create_filter_panel()
         self._create_dialogs_fetch_button()
+        self._create_dialogs_cancel_button()
         self._create_dialogs_delete_button()
+        self._create_progress_bar()
         self._create_layout()
 
         _LOGGER.debug("MainWindow, constructor, end")
 
+    def finish_startup(self) -> None:
+        """Finish the startup once the window is shown, the Telegram modules are loaded here on their first use."""
+        _LOGGER.debug("MainWindow, finish startup, begin")
+
+        self._reload_accounts()
+        self._resume_action.setEnabled(telegram.unfinished_deletion() is not None)
+        self._start_saved_retention()
+
+        _LOGGER.debug("MainWindow, finish startup, end")
+
     def _main_setup(self) -> None:
         """Perform the main setup of the application main window."""
         _LOGGER.debug("MainWindow, main setup, begin")
@@ -83,11 +157,66 @@ class MainWindow(QMainWindow):
         self._ensure_action = QAction("&Ensure Session", self)
         self._ensure_action.triggered.connect(self._ensure_action_triggered)  # type: ignore
 
+        self._resume_action = QAction("Resume &Deletion", self)
+        # It's enabled once the journal is checked by `finish_startup`.
+        self._resume_action.setEnabled(False)
+        self._resume_action.triggered.connect(self._resume_action_triggered)  # type: ignore
+
+        self._count_action = QAction("&Count Messages (Dry Run)", self)
+        self._count_action.triggered.connect(self._count_action_triggered)  # type: ignore
+
+        self._retention_action = QAction("Retention Clea&nup...", self)
+        self._retention_action.triggered.connect(self._retention_action_triggered)  # type: ignore
+
+        self._resync_action = QAction("&Resync Cache", self)
+        self._resync_action.triggered.connect(self._resync_action_triggered)  # type: ignore
+
         self._exit_action = QAction("E&xit", self)
         self._exit_action.triggered.connect(self._exit_action_triggered)  # type: ignore
 
         _LOGGER.debug("MainWindow, create actions, end")
 
+    def _create_retention_tray(self) -> None:
+        """Create the system tray icon of the recurring retention cleanup."""
+        _LOGGER.debug("MainWindow, create retention tray, begin")
+        self._retention_tray = RetentionTray(self, self._exit_action)
+        _LOGGER.debug("MainWindow, create retention tray, end")
+
+    def _start_saved_retention(self) -> None:
+        """Start the retention cleanup of the current account if it's turned on in the settings."""
+        settings = app_settings()
+        policy = retention.RetentionPolicy(
+            telegram.current_account(),
+            tuple(settings.retention_ids(telegram.current_account())),
+            settings.retention_days(telegram.current_account()),
+        )
+        if policy.days and policy.entity_ids:
+            _LOGGER.debug("MainWindow, start saved retention: %s", policy)
+            asyncio.ensure_future(self._retention_tray.start(policy, settings.delete_concurrency()))
+
+    def _create_stats_dock(self) -> None:
+        """Create the dock with the live RPC statistics, it's hidden until toggled from the menu."""
+        _LOGGER.debug("MainWindow, create stats dock, begin")
+
+        self._stats_dock = QDockWidget("RPC Statistics", self)
+        self._stats_dock.setWidget(StatsPanel(self._stats_dock))
+        self.addDockWidget(Qt.DockWidgetArea.BottomDockWidgetArea, self._stats_dock)
+        self._stats_dock.hide()
+        self._stats_action = self._stats_dock.toggleViewAction()
+        self._stats_action.setText("RPC S&tatistics")
+
+        _LOGGER.debug("MainWindow, create stats dock, end")
+
+    def _create_account_selector(self) -> None:
+        """Create the selector of the account which dialogs are shown."""
+        _LOGGER.debug("MainWindow, create account selector, begin")
+
+        self._account_selector = QComboBox(self)
+        self._account_selector.addItems(app_settings().accounts())
+        self._account_selector.currentTextChanged.connect(self._account_selector_changed)  # type: ignore
+
+        _LOGGER.debug("MainWindow, create account selector, end")
+
     def _create_start_menu(self) -> None:
         """Create start menu item of the menu bar."""
         _LOGGER.debug("MainWindow, create start menu, begin")
@@ -95,6 +224,11 @@ class MainWindow(QMainWindow):
         start_menu = self.menuBar().addMenu("&Start")
         start_menu.addAction(self._settings_action)
         start_menu.addAction(self._ensure_action)
+        start_menu.addAction(self._resync_action)
+        start_menu.addAction(self._count_action)
+        start_menu.addAction(self._resume_action)
+        start_menu.addAction(self._retention_action)
+        start_menu.addAction(self._stats_action)
         start_menu.addSeparator()
         start_menu.addAction(self._exit_action)
 
@@ -106,6 +240,11 @@ class MainWindow(QMainWindow):
         toolbar = QToolBar("Main Toolbar")
         toolbar.addAction(self._settings_action)
         toolbar.addAction(self._ensure_action)
+        toolbar.addAction(self._resync_action)
+        toolbar.addAction(self._count_action)
+        toolbar.addAction(self._resume_action)
+        toolbar.addSeparator()
+        toolbar.addWidget(self._account_selector)
         toolbar.addSeparator()
         toolbar.addAction(self._exit_action)
         self.addToolBar(toolbar)
@@ -114,16 +253,38 @@ class MainWindow(QMainWindow):
     def _create_dialogs_table(self) -> None:
         """Create the dialogs table."""
         _LOGGER.debug("MainWindow, create dialogs table, begin")
-        self._dialogs_table = QTableWidget(self)
-        self._dialogs_table.setColumnCount(3)
-        self._dialogs_table.setColumnWidth(0, 550)
-        self._dialogs_table.setColumnWidth(1, 150)
-        self._dialogs_table.setColumnWidth(2, 150)
-        self._dialogs_table.setHorizontalHeaderItem(0, QTableWidgetItem("Dialog Title"))
-        self._dialogs_table.setHorizontalHeaderItem(1, QTableWidgetItem("Entity Type"))
-        self._dialogs_table.setHorizontalHeaderItem(2, QTableWidgetItem("Entity ID"))
+        self._dialogs_model = DialogsTableModel(self)
+        self._dialogs_filter_model = DialogsFilterModel(self._dialogs_model, self)
+        self._dialogs_table = QTableView(self)
+        self._dialogs_table.setModel(self._dialogs_filter_model)
+        self._dialogs_table.setColumnWidth(TITLE_COLUMN, 550)
+        self._dialogs_table.setColumnWidth(TYPE_COLUMN, 150)
+        self._dialogs_table.setColumnWidth(ID_COLUMN, 150)
+        self._dialogs_table.setColumnWidth(MESSAGES_COLUMN, 150)
         _LOGGER.debug("MainWindow, create dialogs table, end")
 
+    def _create_dialogs_search_controls(self) -> None:
+        """Create the dialogs search box and the buttons which check the found dialogs."""
+        _LOGGER.debug("MainWindow, create dialogs search controls, begin")
+
+        self._search_input = QLineEdit(self)
+        self._search_input.setPlaceholderText("Search dialogs by title, type or ID")
+        self._search_input.setClearButtonEnabled(True)
+        self._search_input.textChanged.connect(self._dialogs_filter_model.set_query)  # type: ignore
+
+        self._check_visible_button = QPushButton("Check All Visible")
+        self._check_visible_button.clicked.connect(self._dialogs_filter_model.check_all_visible)  # type: ignore
+        self._invert_visible_button = QPushButton("Invert Visible")
+        self._invert_visible_button.clicked.connect(self._dialogs_filter_model.invert_visible)  # type: ignore
+
+        _LOGGER.debug("MainWindow, create dialogs search controls, end")
+
+    def _create_filter_panel(self) -> None:
+        """Create the panel with the filters of the messages to be deleted."""
+        _LOGGER.debug("MainWindow, create filter panel, begin")
+        self._filter_panel = FilterPanel(self)
+        _LOGGER.debug("MainWindow, create filter panel, end")
+
     def _create_dialogs_fetch_button(self) -> None:
         """Create the button which fetches all the dialogs."""
         _LOGGER.debug("MainWindow, create fetch button, begin")
@@ -133,6 +294,16 @@ class MainWindow(QMainWindow):
 
         _LOGGER.debug("MainWindow, create fetch button, end")
 
+    def _create_dialogs_cancel_button(self) -> None:
+        """Create the button which cancels the dialogs fetching or the messages deletion in progress."""
+        _LOGGER.debug("MainWindow, create cancel button, begin")
+
+        self._cancel_button = QPushButton("Cancel")
+        self._cancel_button.setEnabled(False)
+        self._cancel_button.clicked.connect(self._cancel_button_clicked)  # type: ignore
+
+        _LOGGER.debug("MainWindow, create cancel button, end")
+
     def _create_dialogs_delete_button(self) -> None:
         """Create the button which deletes the selected dialogs."""
         _LOGGER.debug("MainWindow, create delete button, begin")
@@ -142,15 +313,31 @@ class MainWindow(QMainWindow):
 
         _LOGGER.debug("MainWindow, create delete button, end")
 
+    def _create_progress_bar(self) -> None:
+        """Create the status bar progress bar of the dialogs which messages deletion is done."""
+        _LOGGER.debug("MainWindow, create progress bar, begin")
+
+        self._progress_bar = QProgressBar()
+        self._progress_bar.setFormat("%v / %m dialogs")
+        self._progress_bar.setVisible(False)
+        self.statusBar().addPermanentWidget(self._progress_bar)
+
+        _LOGGER.debug("MainWindow, create progress bar, end")
+
     def _create_layout(self) -> None:
         """Create layout of the app main window."""
         _LOGGER.debug("MainWindow, create layout, begin")
 
         layout = QGridLayout()
         layout.setSpacing(10)
-        layout.addWidget(self._dialogs_table, 0, 0, 1, 2)
-        layout.addWidget(self._fetch_button, 1, 0)
-        layout.addWidget(self._delete_button, 1, 1)
+        layout.addWidget(self._search_input, 0, 0)
+        layout.addWidget(self._check_visible_button, 0, 1)
+        layout.addWidget(self._invert_visible_button, 0, 2)
+        layout.addWidget(self._dialogs_table, 1, 0, 1, 3)
+        layout.addWidget(self._filter_panel, 2, 0, 1, 3)
+        layout.addWidget(self._fetch_button, 3, 0)
+        layout.addWidget(self._cancel_button, 3, 1)
+        layout.addWidget(self._delete_button, 3, 2)
 
         central_widget = QWidget(self)
         central_widget.setLayout(layout)
@@ -162,21 +349,177 @@ class MainWindow(QMainWindow):
     def _settings_action_triggered(self) -> None:
         """Slot which handles the open settings action trigger signal."""
         _LOGGER.debug("MainWindow, settings action trigger, begin")
-        SettingsDialog(self).exec()
+        settings_dialog.SettingsDialog(self).exec()
+        self._reload_accounts()
         _LOGGER.debug("MainWindow, settings action trigger, begin")
 
+    def _reload_accounts(self) -> None:
+        """Reload the account selector items, the accounts could be added in the settings."""
+        self._account_selector.blockSignals(True)
+        self._account_selector.clear()
+        self._account_selector.addItems(app_settings().accounts())
+        self._account_selector.setCurrentText(telegram.current_account())
+        self._account_selector.blockSignals(False)
+
+    @asyncSlot(str)
+    async def _account_selector_changed(self, account: str) -> None:
+        """Async slot which switches the account and shows its dialogs, keeping the checked dialogs of the others.
+
+        Args:
+            account: Name of the account.
+        """
+        _LOGGER.debug("MainWindow, account selector change, begin, account: %s", account)
+
+        if self._fetch_task is not None:
+            self._fetch_task.cancel()
+        self._selections[telegram.current_account()] = self._dialogs_model.checked_ids()
+        # The retention pass uses the shared client which is shut down on the switch, the passes of an account
+        # which isn't current are skipped until it's selected again.
+        async with self._retention_tray.paused():
+            await telegram.use_account(account)
+        self._resume_action.setEnabled(telegram.unfinished_deletion() is not None)
+        await self._fetch_dialogs(resync=False)
+        self._dialogs_model.check_ids(self._selections.pop(account, []))
+
+        _LOGGER.debug("MainWindow, account selector change, end")
+
     @Slot()
     def _ensure_action_triggered(self) -> None:
         """Slot which handles the ensure session action trigger signal."""
         _LOGGER.debug("MainWindow, ensure action trigger, begin")
-        EnsureSessionDialog(self).exec()
+        ensure_dialog.EnsureSessionDialog(self).exec()
         _LOGGER.debug("MainWindow, ensure action trigger, end")
 
-    @Slot()
-    def _exit_action_triggered(self) -> None:
-        """Slot which handles the exit action trigger signal."""
+    @asyncSlot()
+    async def _resync_action_triggered(self) -> None:
+        """Async slot which handles the resync cache action trigger signal."""
+        _LOGGER.debug("MainWindow, resync action trigger, begin")
+
+        telegram.clear_cache()
+        await self._fetch_dialogs(resync=True)
+
+        _LOGGER.debug("MainWindow, resync action trigger, end")
+
+    @asyncSlot()
+    async def _resume_action_triggered(self) -> None:
+        """Async slot which handles the resume deletion action trigger signal."""
+        _LOGGER.debug("MainWindow, resume action trigger, begin")
+
+        job = telegram.unfinished_deletion()
+        if job is None:
+            return
+
+        async def delete(
+            monitor: DeletionMonitor, cancel_token: telegram.CancelToken
+        ) -> Mapping[Any, telegram.DeletionResult]:
+            return await telegram.resume_deletion(
+                concurrency=app_settings().delete_concurrency(),
+                progress=lambda progress: monitor.report(progress.entity_id, progress),
+                cancel_token=cancel_token,
+            )
+
+        await self._run_deletion(len(job.pending_ids), delete)
+
+        _LOGGER.debug("MainWindow, resume action trigger, end")
+
+    @asyncSlot()
+    async def _count_action_triggered(self) -> None:
+        """Async slot which handles the count messages action trigger signal.
+
+        The user's messages of the checked dialogs are counted concurrently without deleting anything, the counts fill
+        the messages column as they arrive and the deletion duration is estimated at the current throughput.
+        """
+        _LOGGER.debug("MainWindow, count action trigger, begin")
+
+        entity_ids = self._dialogs_model.checked_ids()
+        if not entity_ids:
+            self.statusBar().showMessage("Check the dialogs to count the messages of")
+            return
+        counted: List[int] = []
+
+        def show_count(entity_id: int, result: telegram.CountResult) -> None:
+            if result.error is None:
+                self._dialogs_model.set_message_count(entity_id, result.message_count)
+            counted.append(entity_id)
+            self.statusBar().showMessage(f"Counted the messages of {len(counted)} of {len(entity_ids)} dialogs...")
+
+        self._count_action.setEnabled(False)
+        try:
+            results = await telegram.count_messages(
+                entity_ids,
+                concurrency=app_settings().delete_concurrency(),
+                message_filter=self._filter_panel.message_filter(),
+                on_count=show_count,
+            )
+        finally:
+            self._count_action.setEnabled(True)
+        counts = [result.message_count for result in results.values() if result.error is None]
+        failed_count = len(results) - len(counts)
+        estimate = timedelta(seconds=round(telegram.estimate_deletion_seconds(counts)))
+        self.statusBar().showMessage(
+            f"Up to {sum(counts)} messages in {len(counts)} dialogs, {failed_count} dialogs failed, "
+            f"the deletion would take about {estimate}"
+        )
+
+        _LOGGER.debug("MainWindow, count action trigger, end")
+
+    @asyncSlot()
+    async def _retention_action_triggered(self) -> None:
+        """Async slot which sets up the recurring retention cleanup of the checked dialogs and starts it."""
+        _LOGGER.debug("MainWindow, retention action trigger, begin")
+
+        account = telegram.current_account()
+        entity_ids = self._dialogs_model.checked_ids()
+        if not entity_ids:
+            self.statusBar().showMessage("Check the dialogs to be kept clean first.")
+            return
+        settings = app_settings()
+        days, accepted = QInputDialog.getInt(
+            self,
+            "Retention Cleanup",
+            f"Keep deleting my messages in {len(entity_ids)} dialogs once they're older than (days):",
+            settings.retention_days(account) or _DEFAULT_RETENTION_DAYS,
+            1,
+            36500,
+        )
+        if not accepted:
+            return
+        settings.set_retention_days(days, account)
+        settings.set_retention_ids(entity_ids, account)
+        await self._retention_tray.start(
+            retention.RetentionPolicy(account, tuple(entity_ids), days), settings.delete_concurrency()
+        )
+        self.statusBar().showMessage("Retention cleanup is running, see the tray icon.")
+
+        _LOGGER.debug("MainWindow, retention action trigger, end")
+
+    def closeEvent(self, event: QCloseEvent) -> None:
+        """Hide the window into the tray instead of closing it while the retention cleanup is running.
+
+        Otherwise the application exits through the exit action, so the session, the cache and the journal are
+        released the same way on every exit.
+
+        Args:
+            event: Close event.
+        """
+        if self._exiting:
+            super().closeEvent(event)
+            return
+        event.ignore()
+        self.hide()
+        if self._retention_tray.running and QSystemTrayIcon.isSystemTrayAvailable():
+            self._retention_tray.showMessage("Trollogeddon", "Retention cleanup keeps running in the tray.")
+            return
+        self._exit_action.trigger()
+
+    @asyncSlot()
+    async def _exit_action_triggered(self) -> None:
+        """Async slot which handles the exit action trigger signal."""
         _LOGGER.debug("MainWindow, exit action trigger, begin")
 
+        self._exiting = True
+        await self._retention_tray.stop()
+        await telegram.shutdown()
         app = QApplication.instance()
         if app:
             app.quit()
@@ -187,39 +530,178 @@ class MainWindow(QMainWindow):
     async def _fetch_button_clicked(self) -> None:
         """Async slot which handles the fetch all the dialogs button click signal."""
         _LOGGER.debug("MainWindow, fetch button click, begin")
+        await self._fetch_dialogs(resync=False)
+        _LOGGER.debug("MainWindow, fetch button click, end")
 
-        self._dialogs_table.clearContents()
-        dialogs = await fetch_all_dialogs()
-
-        self._dialogs_table.setRowCount(len(dialogs))
-        for row_index, dialog in enumerate(dialogs):
-            dialog_title = QTableWidgetItem()
-            dialog_title.setText(dialog.name)
-            dialog_title.setFlags(Qt.ItemIsUserCheckable | Qt.ItemIsEnabled)  # type: ignore
-            dialog_title.setCheckState(Qt.Unchecked)  # type: ignore
-            self._dialogs_table.setItem(row_index, 0, dialog_title)
-
-            entity_type = QTableWidgetItem()
-            entity_type.setText(dialog.entity.__class__.__name__)
-            self._dialogs_table.setItem(row_index, 1, entity_type)
+    async def _fetch_dialogs(self, resync: bool) -> None:
+        """Fetch all the dialogs into the dialogs table, page by page.
 
-            entity_id = QTableWidgetItem()
-            entity_id.setText(str(dialog.entity.id))
-            self._dialogs_table.setItem(row_index, 2, entity_id)
+        Args:
+            resync: Fetch the dialogs from Telegram even if they are cached already.
+        """
+        _LOGGER.debug("MainWindow, fetch dialogs, begin")
+
+        self._dialogs_model.clear()
+        self._fetch_button.setEnabled(False)
+        self._cancel_button.setEnabled(True)
+        self._fetch_task = asyncio.current_task()
+
+        try:
+            async for dialogs in telegram.iter_dialogs_pages(resync=resync):
+                self._dialogs_model.append_dialogs(dialogs)
+                self.statusBar().showMessage(f"Fetched {self._dialogs_model.rowCount()} dialogs...")
+            self.statusBar().showMessage(f"Fetched {self._dialogs_model.rowCount()} dialogs")
+        except asyncio.CancelledError:
+            _LOGGER.debug("MainWindow, fetch dialogs, cancelled")
+            self.statusBar().showMessage(f"Fetching cancelled, fetched {self._dialogs_model.rowCount()} dialogs")
+        finally:
+            self._fetch_task = None
+            self._fetch_button.setEnabled(True)
+            self._cancel_button.setEnabled(self._cancel_token is not None)
+
+        _LOGGER.debug("MainWindow, fetch dialogs, end")
 
-        _LOGGER.debug("MainWindow, fetch button click, end")
+    @Slot()
+    def _cancel_button_clicked(self) -> None:
+        """Slot which handles the cancel dialogs fetching or messages deletion button click signal."""
+        _LOGGER.debug("MainWindow, cancel button click, begin")
+        if self._fetch_task is not None:
+            self._fetch_task.cancel()
+        if self._cancel_token is not None:
+            self._cancel_token.cancel()
+            self.statusBar().showMessage("Cancelling, finishing the chunks in flight...")
+        _LOGGER.debug("MainWindow, cancel button click, end")
 
     @asyncSlot()
     async def _delete_button_clicked(self) -> None:
         """Async slot which handles delete selected dialogs button click signal."""
         _LOGGER.debug("MainWindow, delete button click, begin")
 
-        selected_ids: List[int] = [
-            int(self._dialogs_table.item(row_index, 2).text())
-            for row_index in range(self._dialogs_table.rowCount())
-            if self._dialogs_table.item(row_index, 0).checkState() == Qt.Checked  # type: ignore
-        ]
-        _LOGGER.debug("MainWindow, delete button click, to be deleted: %s", str(selected_ids))
-        await delete_messages(selected_ids)
+        selections = {**self._selections, telegram.current_account(): self._dialogs_model.checked_ids()}
+        selections = {account: ids for account, ids in selections.items() if ids}
+        message_filter = self._filter_panel.message_filter()
+        archive_path = self._filter_panel.archive_path()
+        _LOGGER.debug("MainWindow, delete button click, to be deleted: %s, %s", selections, message_filter)
+        if set(selections) - {telegram.current_account()}:
+            await self._delete_in_workers(selections, message_filter, archive_path)
+        else:
+
+            async def delete(
+                monitor: DeletionMonitor, cancel_token: telegram.CancelToken
+            ) -> Mapping[Any, telegram.DeletionResult]:
+                return await telegram.delete_messages(
+                    selections.get(telegram.current_account(), []),
+                    concurrency=app_settings().delete_concurrency(),
+                    message_filter=message_filter,
+                    progress=lambda progress: monitor.report(progress.entity_id, progress),
+                    cancel_token=cancel_token,
+                    archive_path=archive_path,
+                )
+
+            await self._run_deletion(sum(len(ids) for ids in selections.values()), delete)
 
         _LOGGER.debug("MainWindow, delete button click, end")
+
+    async def _delete_in_workers(
+        self, selections: Dict[str, List[int]], message_filter: MessageFilter, archive_path: str
+    ) -> None:
+        """Delete the messages of several accounts in parallel worker processes, one process per account.
+
+        Args:
+            selections: Entity IDs to be used to delete the messages from, mapped by the account names.
+            message_filter: Filter of the messages to be deleted.
+            archive_path: Path to the archive, empty if the messages are not archived.
+        """
+        _LOGGER.debug("MainWindow, delete in workers, begin")
+
+        async def delete(
+            monitor: DeletionMonitor, cancel_token: telegram.CancelToken
+        ) -> Mapping[Any, telegram.DeletionResult]:
+            def report(event: account_workers.AccountProgress) -> None:
+                monitor.report((event.account, event.progress.entity_id), event.progress)
+
+            # The workers use the session, cache & journal files of the accounts, including the current one.
+            await telegram.shutdown()
+            results = await account_workers.delete_in_workers(
+                selections, app_settings().delete_concurrency(), message_filter, report, cancel_token, archive_path
+            )
+            return {
+                (account, entity_id): result
+                for account, account_results in results.items()
+                for entity_id, result in account_results.items()
+            }
+
+        await self._run_deletion(sum(len(ids) for ids in selections.values()), delete)
+
+        _LOGGER.debug("MainWindow, delete in workers, end")
+
+    async def _run_deletion(
+        self,
+        total_count: int,
+        delete: Callable[[DeletionMonitor, telegram.CancelToken], Awaitable[Mapping[Any, telegram.DeletionResult]]],
+    ) -> None:
+        """Run the deletion with the live progress rendering and the cancellation, then show its results.
+
+        The retention cleanup is paused while the deletion runs.
+
+        Args:
+            total_count: Amount of the entities which messages are going to be deleted.
+            delete: Runs the deletion, reports its progress to the monitor and stops once the token is cancelled.
+        """
+        _LOGGER.debug("MainWindow, run deletion, begin")
+
+        self._cancel_token = telegram.CancelToken()
+        # Switching the account shuts down the client, the cache and the journal the deletion uses.
+        self._account_selector.setEnabled(False)
+        self._delete_button.setEnabled(False)
+        self._resume_action.setEnabled(False)
+        self._cancel_button.setEnabled(True)
+        self._progress_bar.setRange(0, total_count)
+        self._progress_bar.setValue(0)
+        self._progress_bar.setVisible(True)
+        try:
+            # The retention passes would compete with the deletion for the client, the cache & the journal.
+            async with self._retention_tray.paused():
+                async with DeletionMonitor(total_count, self._render_progress) as monitor:
+                    results = await delete(monitor, self._cancel_token)
+        finally:
+            self._cancel_token = None
+            self._account_selector.setEnabled(True)
+            self._delete_button.setEnabled(True)
+            self._cancel_button.setEnabled(self._fetch_task is not None)
+            self._progress_bar.setVisible(False)
+        self._show_deletion_results(results)
+
+        _LOGGER.debug("MainWindow, run deletion, end")
+
+    def _render_progress(self, summary: DeletionSummary) -> None:
+        """Render the deletion progress in the status bar.
+
+        Args:
+            summary: Progress of the deletion from all the entities.
+        """
+        self._progress_bar.setValue(summary.done_count)
+        if self._cancel_token is not None and self._cancel_token.cancelled:
+            return
+        self.statusBar().showMessage(
+            f"Deleted {summary.deleted_count} of {summary.scanned_count} scanned messages, "
+            f"{summary.done_count} of {summary.total_count} dialogs done, {summary.rate:.1f} messages/s..."
+        )
+
+    def _show_deletion_results(self, results: Mapping[Any, telegram.DeletionResult]) -> None:
+        """Show the summary of the deletion results and allow to resume the deletion if some entities failed.
+
+        Args:
+            results: Deletion results mapped by entity IDs, or by account names & entity IDs.
+        """
+        deleted_count = sum(result.deleted_count for result in results.values())
+        cancelled_ids = [
+            key for key, result in results.items() if isinstance(result.error, telegram.DeletionCancelledError)
+        ]
+        failed_ids = [key for key, result in results.items() if result.error is not None and key not in cancelled_ids]
+        _LOGGER.debug("MainWindow, show deletion results, failed: %s, cancelled: %s", failed_ids, cancelled_ids)
+        self.statusBar().showMessage(
+            f"Deleted {deleted_count} messages from {len(results)} dialogs, {len(failed_ids)} dialogs failed"
+            + (f", {len(cancelled_ids)} dialogs cancelled" if cancelled_ids else "")
+        )
+        self._resume_action.setEnabled(telegram.unfinished_deletion() is not None)
@@ -0,0 +1,159 @@
+# Copyright 2023 resurtm@gmail.com
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the "Software"), to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions
+# of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED
+# TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF
+# CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+#
+# https://opensource.org/licenses/MIT
+
+
+"""Message filters which are pushed down to the Telegram search requests."""
+
+from dataclasses import asdict, dataclass, replace
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, Final, Optional
+
+# Class names of the media type filters by their display names, applied by the server in the search requests. The
+# classes are resolved on use, since importing Telethon takes a noticeable part of the GUI startup.
+MEDIA_FILTERS: Final = {
+    "Photos": "InputMessagesFilterPhotos",
+    "Videos": "InputMessagesFilterVideo",
+    "Photos & Videos": "InputMessagesFilterPhotoVideo",
+    "Documents": "InputMessagesFilterDocument",
+    "Voice Messages": "InputMessagesFilterVoice",
+    "Round Videos": "InputMessagesFilterRoundVideo",
+    "Music": "InputMessagesFilterMusic",
+    "GIFs": "InputMessagesFilterGif",
+    "Links": "InputMessagesFilterUrl",
+    "Polls": "InputMessagesFilterPoll",
+}
+
+
+@dataclass(frozen=True)
+class MessageFilter:
+    """Selects a subset of the user's messages to be deleted.
+
+    Everything except the lower date bound is sent to Telegram as the search request parameters, so only the matching
+    messages travel over the wire. The messages are returned newest first, so the iteration simply stops at the first
+    message older than the lower date bound. The dates are timezone aware, same as the message dates.
+
+    The whole history flag is a deletion mode rather than a filter: if nothing is filtered, the entities which allow
+    it are cleared with a whole history deletion request instead of being deleted from message by message.
+    """
+
+    search: str = ""
+    media: str = ""
+    min_date: Optional[datetime] = None
+    max_date: Optional[datetime] = None
+    min_id: int = 0
+    max_id: int = 0
+    whole_history: bool = False
+
+    @property
+    def is_empty(self) -> bool:
+        """Check whether the filter matches all the user's messages.
+
+        Returns:
+            True if no filtering is requested, the whole history flag doesn't filter anything.
+        """
+        return replace(self, whole_history=False) == MessageFilter()
+
+    def iter_messages_params(self) -> Dict[str, Any]:
+        """Build the `TelegramClient.iter_messages` parameters which apply the filter on the server side.
+
+        Returns:
+            Keyword parameters of the `TelegramClient.iter_messages` method.
+        """
+        params: Dict[str, Any] = {}
+        if self.search:
+            params["search"] = self.search
+        if self.media:
+            from telethon.tl import types  # type: ignore
+
+            params["filter"] = getattr(types, MEDIA_FILTERS[self.media])
+        if self.max_date is not None:
+            params["offset_date"] = self.max_date
+        if self.min_id:
+            params["min_id"] = self.min_id
+        if self.max_id:
+            params["max_id"] = self.max_id
+        return params
+
+    def is_below_min_date(self, date: Optional[datetime]) -> bool:
+        """Check whether the message date is older than the lower date bound.
+
+        Args:
+            date: Message date.
+
+        Returns:
+            True if the message and all the following (older) ones don't match the filter.
+        """
+        return self.min_date is not None and date is not None and date < self.min_date
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Convert the filter into a JSON serializable dictionary.
+
+        Returns:
+            Dictionary with the filter fields, the dates are in the ISO format.
+        """
+        result = asdict(self)
+        for key in ("min_date", "max_date"):
+            if result[key] is not None:
+                result[key] = result[key].isoformat()
+        return result
+
+    @staticmethod
+    def from_dict(data: Dict[str, Any]) -> "MessageFilter":
+        """Create a filter from the dictionary produced by `to_dict`.
+
+        Args:
+            data: Dictionary with the filter fields.
+
+        Returns:
+            New filter instance.
+        """
+        data = dict(data)
+        for key in ("min_date", "max_date"):
+            if data.get(key) is not None:
+                data[key] = datetime.fromisoformat(data[key])
+        return MessageFilter(**data)
+
+    @staticmethod
+    def from_days(first_day: Optional[date], last_day: Optional[date], **fields: Any) -> "MessageFilter":
+        """Create a filter of the messages sent between the days, both inclusive, in the local timezone.
+
+        Args:
+            first_day: First day of the messages, not bounded if not provided.
+            last_day: Last day of the messages, not bounded if not provided.
+            fields: Other fields of the filter.
+
+        Returns:
+            New filter instance, the upper bound is the local midnight after the last day.
+        """
+        return MessageFilter(
+            min_date=_local_midnight(first_day) if first_day is not None else None,
+            max_date=_local_midnight(last_day + timedelta(days=1)) if last_day is not None else None,
+            **fields,
+        )
+
+
+def _local_midnight(day: date) -> datetime:
+    """Convert the date into the timezone aware local midnight.
+
+    Args:
+        day: Date to be converted.
+
+    Returns:
+        Timezone aware local midnight of the date.
+    """
+    return datetime(day.year, day.month, day.day).astimezone()
@@ -0,0 +1,67 @@
+# Copyright 2023 resurtm@gmail.com
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the "Software"), to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions
+# of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED
+# TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF
+# CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+#
+# https://opensource.org/licenses/MIT
+
+
+"""Message filters which are pushed down to the Telegram search requests. Tests."""
+
+import json
+from datetime import date, datetime, timezone
+
+from message_filter import MessageFilter
+from telethon.tl.types import InputMessagesFilterVoice  # type: ignore
+
+
+def test_iter_messages_params() -> None:
+    """Test the `MessageFilter.iter_messages_params` method sends only the requested filters."""
+    assert MessageFilter().is_empty
+    assert MessageFilter(whole_history=True).is_empty
+    assert MessageFilter(whole_history=True).iter_messages_params() == {}
+
+    max_date = datetime(2023, 1, 1, tzinfo=timezone.utc)
+    message_filter = MessageFilter(search="x", media="Voice Messages", max_date=max_date, min_id=10, max_id=20)
+    assert not message_filter.is_empty
+    assert message_filter.iter_messages_params() == {
+        "search": "x",
+        "filter": InputMessagesFilterVoice,
+        "offset_date": max_date,
+        "min_id": 10,
+        "max_id": 20,
+    }
+
+
+def test_is_below_min_date() -> None:
+    """Test the `MessageFilter.is_below_min_date` method compares the message date with the lower date bound."""
+    min_date = datetime(2023, 1, 1, tzinfo=timezone.utc)
+    assert not MessageFilter().is_below_min_date(min_date)
+    assert not MessageFilter(min_date=min_date).is_below_min_date(min_date)
+    assert MessageFilter(min_date=min_date).is_below_min_date(datetime(2022, 12, 31, tzinfo=timezone.utc))
+
+
+def test_dict_round_trip() -> None:
+    """Test the filter survives the JSON serialization through the `to_dict` and `from_dict` methods."""
+    min_date = datetime(2023, 1, 1, tzinfo=timezone.utc)
+    message_filter = MessageFilter(search="x", min_date=min_date, max_id=5, whole_history=True)
+    assert MessageFilter.from_dict(json.loads(json.dumps(message_filter.to_dict()))) == message_filter
+
+
+def test_from_days() -> None:
+    """Test the `MessageFilter.from_days` method bounds the messages by the local midnights, the last day inclusive."""
+    assert MessageFilter.from_days(None, None, search="x") == MessageFilter(search="x")
+    assert MessageFilter.from_days(date(2023, 1, 2), date(2023, 1, 31), max_id=5) == MessageFilter(
+        min_date=datetime(2023, 1, 2).astimezone(), max_date=datetime(2023, 2, 1).astimezone(), max_id=5
+    )
@@ -0,0 +1,367 @@
+# Copyright 2023 resurtm@gmail.com
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the "Software"), to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions
+# of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED
+# TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF
+# CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+#
+# https://opensource.org/licenses/MIT
+
+
+"""Performance metrics of the Telegram RPCs: counts, latency histograms, flood waits, traffic and queue depths."""
+
+import asyncio
+import json
+import time
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Final,
+    Generic,
+    List,
+    Optional,
+    Type,
+    TypeVar,
+    Union,
+)
+
+from telethon.network.connection.tcpfull import ConnectionTcpFull  # type: ignore
+
+# Upper bounds of the latency histogram buckets, seconds. The last implicit bucket has no upper bound.
+LATENCY_BUCKETS: Final = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_PROMETHEUS_PREFIX: Final = "trollogeddon"
+
+_T = TypeVar("_T")
+
+
+@dataclass
+class RpcStats:
+    """Aggregated measurements of a single RPC method."""
+
+    count: int = 0
+    error_count: int = 0
+    flood_wait_count: int = 0
+    flood_wait_seconds: float = 0.0
+    total_seconds: float = 0.0
+    items: int = 0
+    buckets: List[int] = field(default_factory=lambda: [0] * (len(LATENCY_BUCKETS) + 1))
+
+    @property
+    def mean_seconds(self) -> float:
+        """Get the mean latency.
+
+        Returns:
+            The mean latency, seconds, zero if there were no calls.
+        """
+        return self.total_seconds / self.count if self.count else 0.0
+
+    def percentile(self, percentile: float) -> float:
+        """Estimate the latency percentile from the histogram.
+
+        Args:
+            percentile: Percentile from 0 to 100.
+
+        Returns:
+            Upper bound of the bucket containing the percentile, seconds. The infinite bound if it's in the last
+            bucket, zero if there were no calls.
+        """
+        if not self.count:
+            return 0.0
+        rank = percentile / 100 * self.count
+        seen = 0
+        for bound, amount in zip(LATENCY_BUCKETS, self.buckets):
+            seen += amount
+            if seen >= rank:
+                return bound
+        return float("inf")
+
+    def observe(self, seconds: float, items: int) -> None:
+        """Add a single call.
+
+        Args:
+            seconds: Latency of the call.
+            items: Amount of the items (messages, dialogs, message IDs) transferred by the call.
+        """
+        self.count += 1
+        self.total_seconds += seconds
+        self.items += items
+        index = next((index for index, bound in enumerate(LATENCY_BUCKETS) if seconds <= bound), len(LATENCY_BUCKETS))
+        self.buckets[index] += 1
+
+
+@dataclass
+class QueueStats:
+    """Aggregated depth samples of a single pipeline queue, taken on every put and get."""
+
+    capacity: int = 0
+    samples: int = 0
+    total_depth: int = 0
+    max_depth: int = 0
+    put_count: int = 0
+    put_wait_seconds: float = 0.0
+    get_wait_seconds: float = 0.0
+
+    @property
+    def mean_depth(self) -> float:
+        """Get the mean depth.
+
+        Returns:
+            The mean amount of the queued items, zero if there were no samples.
+        """
+        return self.total_depth / self.samples if self.samples else 0.0
+
+
+class RpcMetrics:
+    """Collects the measurements of the RPCs by their method names and the traffic of the connections.
+
+    It's designed to be cheap enough for every RPC: a few additions per call, no locks and no logging.
+    """
+
+    def __init__(self) -> None:
+        """Construct a new empty instance of the metrics."""
+        self._stats: Dict[str, RpcStats] = {}
+        self._queues: Dict[str, QueueStats] = {}
+        self.bytes_sent = 0
+        self.bytes_received = 0
+
+    def record(
+        self,
+        method: str,
+        seconds: float,
+        items: int = 0,
+        error: Optional[Exception] = None,
+        flood_wait: Optional[float] = None,
+    ) -> None:
+        """Record a single RPC.
+
+        Args:
+            method: Name of the RPC method.
+            seconds: Latency of the call.
+            items: Amount of the items transferred by the call.
+            error: Error the call failed with, if any.
+            flood_wait: Duration of the flood wait the call failed with, seconds, if any.
+        """
+        stats = self._stats.get(method)
+        if stats is None:
+            stats = self._stats[method] = RpcStats()
+        stats.observe(seconds, items)
+        if error is not None:
+            stats.error_count += 1
+        if flood_wait is not None:
+            stats.flood_wait_count += 1
+            stats.flood_wait_seconds += flood_wait
+
+    def record_queue(
+        self, queue: str, depth: int, capacity: int, put_wait: Optional[float] = None, get_wait: Optional[float] = None
+    ) -> None:
+        """Record a depth sample of the pipeline queue.
+
+        Args:
+            queue: Name of the queue.
+            depth: Amount of the queued items after the put or get.
+            capacity: Maximum amount of the queued items.
+            put_wait: Time the producer waited for a free slot, seconds, if it's a put.
+            get_wait: Time the consumer waited for an item, seconds, if it's a get.
+        """
+        stats = self._queues.get(queue)
+        if stats is None:
+            stats = self._queues[queue] = QueueStats(capacity=capacity)
+        stats.samples += 1
+        stats.total_depth += depth
+        stats.max_depth = max(stats.max_depth, depth)
+        if put_wait is not None:
+            stats.put_count += 1
+            stats.put_wait_seconds += put_wait
+        if get_wait is not None:
+            stats.get_wait_seconds += get_wait
+
+    def queue_snapshot(self) -> Dict[str, QueueStats]:
+        """Copy the current queue depth measurements.
+
+        Returns:
+            Measurements mapped by the queue names, sorted by the names.
+        """
+        return {queue: QueueStats(**asdict(stats)) for queue, stats in sorted(self._queues.items())}
+
+    def snapshot(self) -> Dict[str, RpcStats]:
+        """Copy the current measurements.
+
+        Returns:
+            Measurements mapped by the RPC method names, sorted by the names.
+        """
+        return {
+            method: RpcStats(**{**asdict(stats), "buckets": list(stats.buckets)})
+            for method, stats in sorted(self._stats.items())
+        }
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Convert the measurements into a JSON serializable dictionary.
+
+        Returns:
+            Dictionary with the traffic and the measurements of every RPC method.
+        """
+        return {
+            "bytes_sent": self.bytes_sent,
+            "bytes_received": self.bytes_received,
+            "latency_buckets": list(LATENCY_BUCKETS),
+            "methods": {method: asdict(stats) for method, stats in self.snapshot().items()},
+            "queues": {queue: asdict(stats) for queue, stats in self.queue_snapshot().items()},
+        }
+
+    def to_prometheus(self) -> str:
+        """Convert the measurements into the Prometheus text exposition format.
+
+        Returns:
+            The metrics text.
+        """
+        lines: List[str] = []
+        snapshot = self.snapshot()
+
+        def counter(name: str, help_text: str, value: Callable[[RpcStats], Union[int, float]]) -> None:
+            lines.append(f"# HELP {_PROMETHEUS_PREFIX}_{name} {help_text}")
+            lines.append(f"# TYPE {_PROMETHEUS_PREFIX}_{name} counter")
+            for method, stats in snapshot.items():
+                lines.append(f'{_PROMETHEUS_PREFIX}_{name}{{method="{method}"}} {value(stats)}')
+
+        counter("rpc_requests_total", "Telegram RPCs issued.", lambda stats: stats.count)
+        counter("rpc_errors_total", "Telegram RPCs failed.", lambda stats: stats.error_count)
+        counter("rpc_flood_waits_total", "Telegram RPCs failed with flood waits.", lambda stats: stats.flood_wait_count)
+        counter("rpc_flood_wait_seconds_total", "Flood wait durations.", lambda stats: stats.flood_wait_seconds)
+        counter("rpc_items_total", "Messages, dialogs or message IDs transferred.", lambda stats: stats.items)
+
+        name = f"{_PROMETHEUS_PREFIX}_rpc_duration_seconds"
+        lines.append(f"# HELP {name} Telegram RPC latency.")
+        lines.append(f"# TYPE {name} histogram")
+        for method, stats in snapshot.items():
+            cumulative = 0
+            for bound, amount in zip([*map(str, LATENCY_BUCKETS), "+Inf"], stats.buckets):
+                cumulative += amount
+                lines.append(f'{name}_bucket{{method="{method}",le="{bound}"}} {cumulative}')
+            lines.append(f'{name}_sum{{method="{method}"}} {stats.total_seconds}')
+            lines.append(f'{name}_count{{method="{method}"}} {stats.count}')
+
+        queues = self.queue_snapshot()
+
+        def queue_metric(
+            name: str, metric_type: str, help_text: str, value: Callable[[QueueStats], Union[int, float]]
+        ) -> None:
+            lines.append(f"# HELP {_PROMETHEUS_PREFIX}_{name} {help_text}")
+            lines.append(f"# TYPE {_PROMETHEUS_PREFIX}_{name} {metric_type}")
+            for queue, queue_stats in queues.items():
+                lines.append(f'{_PROMETHEUS_PREFIX}_{name}{{queue="{queue}"}} {value(queue_stats)}')
+
+        queue_metric("queue_capacity", "gauge", "Pipeline queue capacity.", lambda stats: stats.capacity)
+        queue_metric("queue_depth_max", "gauge", "Maximum pipeline queue depth.", lambda stats: stats.max_depth)
+        queue_metric("queue_depth_mean", "gauge", "Mean pipeline queue depth.", lambda stats: stats.mean_depth)
+        queue_metric("queue_puts_total", "counter", "Items put into the pipeline queue.", lambda stats: stats.put_count)
+        queue_metric(
+            "queue_put_wait_seconds_total",
+            "counter",
+            "Time the producers waited for the full queue.",
+            lambda stats: stats.put_wait_seconds,
+        )
+        queue_metric(
+            "queue_get_wait_seconds_total",
+            "counter",
+            "Time the consumers waited for the empty queue.",
+            lambda stats: stats.get_wait_seconds,
+        )
+
+        for direction, value in (("sent", self.bytes_sent), ("received", self.bytes_received)):
+            lines.append(f"# HELP {_PROMETHEUS_PREFIX}_bytes_{direction}_total MTProto payload bytes {direction}.")
+            lines.append(f"# TYPE {_PROMETHEUS_PREFIX}_bytes_{direction}_total counter")
+            lines.append(f"{_PROMETHEUS_PREFIX}_bytes_{direction}_total {value}")
+        return "\n".join(lines) + "\n"
+
+    def dump(self, path: Union[str, Path]) -> None:
+        """Write the measurements into the file, in the Prometheus text format if its suffix is ".prom".
+
+        Args:
+            path: Path of the file, JSON is written unless the suffix is ".prom".
+        """
+        path = Path(path)
+        text = self.to_prometheus() if path.suffix == ".prom" else json.dumps(self.to_dict(), indent=2)
+        path.write_text(text, encoding="utf-8")
+
+
+class MeteredQueue(Generic[_T]):
+    """Bounded asyncio queue connecting the pipeline stages, every put and get is recorded into the metrics.
+
+    A full queue blocks the producers, so a slow stage holds back the stages before it instead of letting the items
+    pile up in the memory.
+    """
+
+    def __init__(self, name: str, maxsize: int, metrics: RpcMetrics) -> None:
+        """Construct a new empty instance of the queue.
+
+        Args:
+            name: Name of the queue in the metrics.
+            maxsize: Maximum amount of the queued items.
+            metrics: Metrics to be updated.
+        """
+        self.name = name
+        self._queue: "asyncio.Queue[_T]" = asyncio.Queue(maxsize)
+        self._metrics = metrics
+
+    async def put(self, item: _T) -> None:
+        """Put the item into the queue, waiting for a free slot if it's full.
+
+        Args:
+            item: The item to be queued.
+        """
+        started_at = time.perf_counter()
+        await self._queue.put(item)
+        self._metrics.record_queue(
+            self.name, self._queue.qsize(), self._queue.maxsize, put_wait=time.perf_counter() - started_at
+        )
+
+    async def get(self) -> _T:
+        """Get the next item from the queue, waiting for it if the queue is empty.
+
+        Returns:
+            The item.
+        """
+        started_at = time.perf_counter()
+        item = await self._queue.get()
+        self._metrics.record_queue(
+            self.name, self._queue.qsize(), self._queue.maxsize, get_wait=time.perf_counter() - started_at
+        )
+        return item
+
+
+def metered_connection(metrics: RpcMetrics) -> Type[ConnectionTcpFull]:
+    """Create the Telethon connection class which counts the traffic into the metrics.
+
+    Args:
+        metrics: Metrics to be updated.
+
+    Returns:
+        The connection class to be passed to the `TelegramClient` constructor.
+    """
+
+    class MeteredConnection(ConnectionTcpFull):
+        """TCP full connection counting the MTProto payload bytes."""
+
+        def _send(self, data: bytes) -> None:
+            metrics.bytes_sent += len(data)
+            super()._send(data)
+
+        async def _recv(self) -> bytes:
+            data = await super()._recv()
+            metrics.bytes_received += len(data)
+            return data
+
+    return MeteredConnection
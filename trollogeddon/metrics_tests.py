@@ -0,0 +1,96 @@
+# Copyright 2023 resurtm@gmail.com
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the "Software"), to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions
+# of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED
+# TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF
+# CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+#
+# https://opensource.org/licenses/MIT
+
+
+"""Performance metrics of the Telegram RPCs. Tests."""
+
+import asyncio
+import json
+from pathlib import Path
+
+import pytest
+from metrics import LATENCY_BUCKETS, MeteredQueue, RpcMetrics
+
+
+def test_record() -> None:
+    """Test the RPCs are aggregated by the methods into the counts and the latency histograms."""
+    metrics = RpcMetrics()
+    metrics.record("delete_messages", 0.003, items=100)
+    metrics.record("delete_messages", 0.02, items=50)
+    metrics.record("delete_messages", 0.2, error=ValueError(), flood_wait=3)
+    metrics.record("connect", 60.0)
+
+    snapshot = metrics.snapshot()
+    assert list(snapshot) == ["connect", "delete_messages"]
+    stats = snapshot["delete_messages"]
+    assert (stats.count, stats.items, stats.error_count) == (3, 150, 1)
+    assert (stats.flood_wait_count, stats.flood_wait_seconds) == (1, 3)
+    assert stats.mean_seconds == (0.003 + 0.02 + 0.2) / 3
+    assert stats.buckets[LATENCY_BUCKETS.index(0.005)] == 1
+    assert stats.percentile(50) == 0.025
+    assert stats.percentile(99) == 0.25
+    assert snapshot["connect"].percentile(50) == float("inf")
+    assert snapshot["connect"].buckets[-1] == 1
+
+    snapshot["connect"].count = 10
+    assert metrics.snapshot()["connect"].count == 1
+
+
+def test_dump(tmp_path: Path) -> None:
+    """Test the measurements are written in the JSON and the Prometheus text formats."""
+    metrics = RpcMetrics()
+    metrics.record("iter_messages", 0.07, items=100)
+    metrics.bytes_sent = 10
+    metrics.bytes_received = 20
+
+    metrics.dump(tmp_path / "metrics.json")
+    metrics.dump(tmp_path / "metrics.prom")
+
+    data = json.loads((tmp_path / "metrics.json").read_text(encoding="utf-8"))
+    assert (data["bytes_sent"], data["bytes_received"]) == (10, 20)
+    assert data["methods"]["iter_messages"]["items"] == 100
+    text = (tmp_path / "metrics.prom").read_text(encoding="utf-8")
+    assert 'trollogeddon_rpc_requests_total{method="iter_messages"} 1\n' in text
+    assert 'trollogeddon_rpc_duration_seconds_bucket{method="iter_messages",le="0.05"} 0\n' in text
+    assert 'trollogeddon_rpc_duration_seconds_bucket{method="iter_messages",le="0.1"} 1\n' in text
+    assert 'trollogeddon_rpc_duration_seconds_bucket{method="iter_messages",le="+Inf"} 1\n' in text
+    assert "trollogeddon_bytes_received_total 20\n" in text
+
+
+@pytest.mark.asyncio
+async def test_metered_queue() -> None:
+    """Test the queue depth is sampled on every put and get, and the full queue blocks the producer."""
+    metrics = RpcMetrics()
+    queue: MeteredQueue[int] = MeteredQueue("chunks", 2, metrics)
+
+    async def produce() -> None:
+        for item in range(3):
+            await queue.put(item)
+
+    producer = asyncio.ensure_future(produce())
+    await asyncio.sleep(0.01)
+    assert not producer.done()
+    assert [await queue.get() for _ in range(3)] == [0, 1, 2]
+    await producer
+
+    stats = metrics.queue_snapshot()["chunks"]
+    assert (stats.capacity, stats.max_depth, stats.put_count, stats.samples) == (2, 2, 3, 6)
+    assert stats.put_wait_seconds >= 0.01
+    assert 0 < stats.mean_depth < stats.max_depth
+    assert metrics.to_dict()["queues"]["chunks"]["max_depth"] == 2
+    assert 'trollogeddon_queue_depth_max{queue="chunks"} 2\n' in metrics.to_prometheus()
@@ -18,11 +18,20 @@
 
 """Mocked data for testing and development purposes."""
 
-from dataclasses import dataclass
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, List, Optional
 from unittest.mock import AsyncMock, MagicMock, call
 
 from telethon.tl.custom.dialog import Dialog  # type: ignore
 from telethon.tl.custom.message import Message  # type: ignore
+from telethon.tl.types import (  # type: ignore
+    Channel,
+    ChatPhotoEmpty,
+    InputPeerChannel,
+    InputPeerUser,
+    User,
+)
 
 
 @dataclass
@@ -30,6 +39,10 @@ class MockedDialog(Dialog):
     """Mocked Telegram dialog dataclass for testing purposes."""
 
     name: str
+    entity: Any = field(default_factory=lambda: User(id=0))
+    input_entity: Any = None
+    date: Optional[datetime] = None
+    message: Any = None
 
 
 @dataclass
@@ -38,6 +51,7 @@ class MockedMessage(Message):
 
     id: int
     delete: AsyncMock
+    date: Optional[datetime] = None
 
 
 def get_mocked_dialog1() -> Dialog:
@@ -46,7 +60,7 @@ def get_mocked_dialog1() -> Dialog:
     Returns:
         New mocked dialog instance, variation 1.
     """
-    return MockedDialog(name="Chat 111")
+    return MockedDialog(name="Chat 111", entity=User(id=111), input_entity=InputPeerUser(111, 1111))
 
 
 def get_mocked_dialog2() -> Dialog:
@@ -55,7 +69,11 @@ def get_mocked_dialog2() -> Dialog:
     Returns:
         New mocked dialog instance, variation 2.
     """
-    return MockedDialog(name="Chat 222")
+    return MockedDialog(
+        name="Chat 222",
+        entity=Channel(id=222, title="Chat 222", photo=ChatPhotoEmpty(), date=None),
+        input_entity=InputPeerChannel(222, 2222),
+    )
 
 
 def get_mocked_message1() -> MockedMessage:
@@ -74,3 +92,16 @@ def get_mocked_message2() -> MockedMessage:
         New mocked message instance, variation 2.
     """
     return MockedMessage(id=111999, delete=AsyncMock())
+
+
+def get_mocked_messages(count: int, first_id: int = 1) -> List[MockedMessage]:
+    """Create a list of mocked message instances with sequential IDs.
+
+    Args:
+        count: amount of the messages to be created.
+        first_id: ID of the first message in the list.
+
+    Returns:
+        New list of mocked message instances.
+    """
+    return [MockedMessage(id=first_id + index, delete=AsyncMock()) for index in range(count)]
@@ -0,0 +1,135 @@
+# Copyright 2023 resurtm@gmail.com
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the "Software"), to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions
+# of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED
+# TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF
+# CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+#
+# https://opensource.org/licenses/MIT
+
+"""In-memory LRU cache of the dialogs input peers backed by the on-disk cache."""
+
+import logging
+from collections import OrderedDict
+from typing import Any, Final, Mapping, Optional
+
+from cache import Cache, CachedPeer
+from telethon.tl import types  # type: ignore
+
+_LOGGER: Final = logging.getLogger(__name__)
+
+# Maximum amount of input peers kept in memory.
+DEFAULT_CAPACITY: Final = 10_000
+
+
+class InputPeerCache:
+    """LRU cache of the input peers of the fetched dialogs, so the deletion never resolves the entities again.
+
+    The input peers carry the access hashes, so Telethon sends them as they are, without looking the entities up in
+    the session or asking Telegram. The peers are persisted together with the dialogs in the on-disk cache and loaded
+    into memory on the first use.
+    """
+
+    def __init__(self, cache: Cache, capacity: int = DEFAULT_CAPACITY) -> None:
+        """Construct a new instance of the input peers cache.
+
+        Args:
+            cache: On-disk cache the input peers are persisted in.
+            capacity: Maximum amount of input peers kept in memory.
+        """
+        self.cache = cache
+        self._capacity = max(1, capacity)
+        self._peers: "OrderedDict[int, Any]" = OrderedDict()
+
+    def get(self, entity_id: int) -> Optional[Any]:
+        """Get the input peer of the dialog, loading it from the on-disk cache if it's not in memory.
+
+        Args:
+            entity_id: Dialog entity ID.
+
+        Returns:
+            The input peer, `None` if it's not cached.
+        """
+        peer = self._peers.get(entity_id)
+        if peer is not None:
+            self._peers.move_to_end(entity_id)
+            return peer
+        cached = self.cache.input_peer(entity_id)
+        if cached is None:
+            return None
+        peer = _from_cached(cached)
+        self._remember(entity_id, peer)
+        return peer
+
+    def replace(self, peers: Mapping[int, Any]) -> None:
+        """Replace all the cached input peers with the ones of the freshly fetched dialogs.
+
+        Args:
+            peers: Input peers mapped by the dialog entity IDs, the unsupported peer types are skipped.
+        """
+        cached = [peer for peer in (_to_cached(entity_id, peer) for entity_id, peer in peers.items()) if peer]
+        self.cache.replace_input_peers(cached)
+        self._peers.clear()
+        for peer in cached:
+            self._remember(peer.entity_id, _from_cached(peer))
+        _LOGGER.debug("InputPeerCache, replaced, peers: %d", len(cached))
+
+    def _remember(self, entity_id: int, peer: Any) -> None:
+        """Put the input peer into memory, evicting the least recently used one if the cache is full.
+
+        Args:
+            entity_id: Dialog entity ID.
+            peer: Input peer of the dialog.
+        """
+        self._peers[entity_id] = peer
+        self._peers.move_to_end(entity_id)
+        if len(self._peers) > self._capacity:
+            self._peers.popitem(last=False)
+
+
+def _to_cached(entity_id: int, peer: Any) -> Optional[CachedPeer]:
+    """Convert the input peer into the cache record.
+
+    Args:
+        entity_id: Dialog entity ID.
+        peer: Input peer of the dialog.
+
+    Returns:
+        The cache record, `None` if the peer type isn't supported.
+    """
+    if isinstance(peer, types.InputPeerUser):
+        return CachedPeer(entity_id, "InputPeerUser", peer.user_id, peer.access_hash or 0)
+    if isinstance(peer, types.InputPeerChannel):
+        return CachedPeer(entity_id, "InputPeerChannel", peer.channel_id, peer.access_hash or 0)
+    if isinstance(peer, types.InputPeerChat):
+        return CachedPeer(entity_id, "InputPeerChat", peer.chat_id)
+    if isinstance(peer, types.InputPeerSelf):
+        return CachedPeer(entity_id, "InputPeerSelf", entity_id)
+    return None
+
+
+def _from_cached(cached: CachedPeer) -> Any:
+    """Convert the cache record into the input peer.
+
+    Args:
+        cached: Cache record of the input peer.
+
+    Returns:
+        The input peer.
+    """
+    if cached.peer_type == "InputPeerUser":
+        return types.InputPeerUser(cached.peer_id, cached.access_hash)
+    if cached.peer_type == "InputPeerChannel":
+        return types.InputPeerChannel(cached.peer_id, cached.access_hash)
+    if cached.peer_type == "InputPeerChat":
+        return types.InputPeerChat(cached.peer_id)
+    return types.InputPeerSelf()
@@ -0,0 +1,73 @@
+# Copyright 2023 resurtm@gmail.com
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the "Software"), to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions
+# of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED
+# TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF
+# CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+#
+# https://opensource.org/licenses/MIT
+
+"""In-memory LRU cache of the dialogs input peers. Tests."""
+
+from cache import Cache, CachedPeer
+from peer_cache import InputPeerCache
+from pytest_mock.plugin import MockerFixture
+from telethon.tl import types  # type: ignore
+
+
+def test_replace_and_get(mocker: MockerFixture) -> None:
+    """Test the peers are persisted in the on-disk cache and served from memory afterwards.
+
+    Args:
+        mocker: Mocker fixture instance to mock the things.
+    """
+    cache = Cache(":memory:")
+    peers = InputPeerCache(cache)
+    peers.replace(
+        {
+            1: types.InputPeerUser(1, 11),
+            2: types.InputPeerChannel(2, 22),
+            3: types.InputPeerChat(3),
+            4: types.InputPeerSelf(),
+            5: types.InputPeerEmpty(),
+        }
+    )
+
+    assert cache.input_peer(2) == CachedPeer(2, "InputPeerChannel", 2, 22)
+    assert cache.input_peer(5) is None
+    lookup_mock = mocker.spy(cache, "input_peer")
+    assert peers.get(1) == types.InputPeerUser(1, 11)
+    assert peers.get(3) == types.InputPeerChat(3)
+    assert peers.get(4) == types.InputPeerSelf()
+    assert lookup_mock.call_count == 0
+
+    assert InputPeerCache(cache).get(2) == types.InputPeerChannel(2, 22)
+    assert InputPeerCache(cache).get(5) is None
+
+
+def test_lru_eviction(mocker: MockerFixture) -> None:
+    """Test the least recently used peer is evicted from memory but is still loaded from the on-disk cache.
+
+    Args:
+        mocker: Mocker fixture instance to mock the things.
+    """
+    cache = Cache(":memory:")
+    peers = InputPeerCache(cache, capacity=2)
+    peers.replace({1: types.InputPeerUser(1, 11), 2: types.InputPeerUser(2, 22)})
+    lookup_mock = mocker.spy(cache, "input_peer")
+
+    assert peers.get(1) == types.InputPeerUser(1, 11)
+    cache.replace_input_peers([CachedPeer(3, "InputPeerUser", 3, 33), CachedPeer(2, "InputPeerUser", 2, 22)])
+    assert peers.get(3) == types.InputPeerUser(3, 33)
+    assert lookup_mock.call_count == 1
+    assert peers.get(2) == types.InputPeerUser(2, 22)
+    assert lookup_mock.call_count == 2
@@ -0,0 +1,168 @@
+# Copyright 2023 resurtm@gmail.com
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the "Software"), to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions
+# of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED
+# TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF
+# CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+#
+# https://opensource.org/licenses/MIT
+
+
+"""Adaptive token bucket rate limiter for the Telegram API requests."""
+
+import asyncio
+import logging
+import time
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Final, Optional
+
+_LOGGER: Final = logging.getLogger(__name__)
+
+# Requests per second the limiter starts with.
+_INITIAL_RATE: Final = 5.0
+# Lowest requests per second the limiter may fall back to after flood waits.
+_MIN_RATE: Final = 0.2
+# Highest requests per second the limiter may grow to.
+_MAX_RATE: Final = 30.0
+# Requests per second added after every successful request (additive increase).
+_RATE_INCREASE_STEP: Final = 0.05
+# Factor the rate is multiplied by after a flood wait (multiplicative decrease).
+_RATE_DECREASE_FACTOR: Final = 0.5
+
+
+@dataclass(frozen=True)
+class RateLimiterState:
+    """Snapshot of the rate limiter state."""
+
+    rate: float
+    backoff_remaining: float
+    flood_wait_count: int
+    flood_wait_seconds: float
+
+    @property
+    def in_backoff(self) -> bool:
+        """Check whether the limiter is waiting out a flood wait at the moment.
+
+        Returns:
+            True if no requests are let through until the flood wait is over.
+        """
+        return self.backoff_remaining > 0
+
+
+class RateLimiter:
+    """Token bucket rate limiter which adapts its rate to the observed flood waits (AIMD).
+
+    Every successful request increases the rate by a small constant step, every flood wait halves it and blocks all
+    the requests until the wait is over. This way the rate settles just below the point where Telegram starts to
+    answer with flood waits.
+    """
+
+    def __init__(
+        self,
+        rate: float = _INITIAL_RATE,
+        min_rate: float = _MIN_RATE,
+        max_rate: float = _MAX_RATE,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], Awaitable[None]] = asyncio.sleep,
+    ) -> None:
+        """Construct a new instance of the rate limiter.
+
+        Args:
+            rate: initial rate, requests per second.
+            min_rate: lowest rate the limiter may decrease to, requests per second.
+            max_rate: highest rate the limiter may increase to, requests per second.
+            clock: monotonic clock function, seconds.
+            sleep: async sleep function, seconds.
+        """
+        self._min_rate = min_rate
+        self._max_rate = max_rate
+        self._rate = min(max(rate, min_rate), max_rate)
+        self._clock = clock
+        self._sleep = sleep
+        self._tokens = 1.0
+        self._updated_at = clock()
+        self._backoff_until = 0.0
+        self._flood_wait_count = 0
+        self._flood_wait_seconds = 0.0
+        self._lock: Optional[asyncio.Lock] = None
+
+    @property
+    def rate(self) -> float:
+        """Get the current rate of the limiter.
+
+        Returns:
+            The current rate, requests per second.
+        """
+        return self._rate
+
+    def state(self) -> RateLimiterState:
+        """Take a snapshot of the current limiter state.
+
+        Returns:
+            The current limiter state.
+        """
+        return RateLimiterState(
+            rate=self._rate,
+            backoff_remaining=max(0.0, self._backoff_until - self._clock()),
+            flood_wait_count=self._flood_wait_count,
+            flood_wait_seconds=self._flood_wait_seconds,
+        )
+
+    async def acquire(self) -> None:
+        """Wait until the next request is allowed to be sent."""
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            while True:
+                now = self._clock()
+                if now < self._backoff_until:
+                    await self._sleep(self._backoff_until - now)
+                    continue
+                self._refill(now)
+                if self._tokens >= 1.0:
+                    self._tokens -= 1.0
+                    return
+                await self._sleep((1.0 - self._tokens) / self._rate)
+
+    def on_success(self) -> None:
+        """Register a successful request, increase the rate additively."""
+        self._rate = min(self._max_rate, self._rate + _RATE_INCREASE_STEP)
+
+    def on_flood_wait(self, seconds: float) -> None:
+        """Register a flood wait, decrease the rate multiplicatively and block the requests for the wait duration.
+
+        The requests which were in flight when the flood wait began report it as well, the rate is decreased once per
+        flood wait event: the flood waits reported during the backoff only extend it.
+
+        Args:
+            seconds: duration of the flood wait reported by Telegram.
+        """
+        now = self._clock()
+        self._refill(now)
+        if now >= self._backoff_until:
+            self._rate = max(self._min_rate, self._rate * _RATE_DECREASE_FACTOR)
+        self._tokens = 0.0
+        self._backoff_until = max(self._backoff_until, now + seconds)
+        self._flood_wait_count += 1
+        self._flood_wait_seconds += seconds
+        self._updated_at = self._backoff_until
+        _LOGGER.warning("Flood wait of %s seconds, rate decreased to %.2f requests per second", seconds, self._rate)
+
+    def _refill(self, now: float) -> None:
+        """Refill the bucket with the tokens accumulated since the last update.
+
+        Args:
+            now: current clock value.
+        """
+        capacity = max(1.0, self._rate)
+        self._tokens = min(capacity, self._tokens + max(0.0, now - self._updated_at) * self._rate)
+        self._updated_at = max(self._updated_at, now)
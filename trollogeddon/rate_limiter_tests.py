@@ -0,0 +1,112 @@
+# Copyright 2023 resurtm@gmail.com
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the "Software"), to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions
+# of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED
+# TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF
+# CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+#
+# https://opensource.org/licenses/MIT
+
+
+"""Adaptive token bucket rate limiter for the Telegram API requests. Tests."""
+
+from typing import List
+
+import pytest
+from rate_limiter import RateLimiter
+
+
+class _FakeClock:
+    """Fake monotonic clock which is advanced by the fake sleep only."""
+
+    def __init__(self) -> None:
+        self.now = 0.0
+        self.sleeps: List[float] = []
+
+    def __call__(self) -> float:
+        return self.now
+
+    async def sleep(self, seconds: float) -> None:
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+@pytest.mark.asyncio
+async def test_acquire_rate() -> None:
+    """Test the `RateLimiter.acquire` method lets the requests through at the configured rate."""
+    clock = _FakeClock()
+    limiter = RateLimiter(rate=2.0, clock=clock, sleep=clock.sleep)
+
+    for _ in range(5):
+        await limiter.acquire()
+
+    assert clock.now == pytest.approx(2.0)
+
+
+@pytest.mark.asyncio
+async def test_on_flood_wait() -> None:
+    """Test the `RateLimiter.on_flood_wait` method halves the rate and blocks the requests for the wait duration."""
+    clock = _FakeClock()
+    limiter = RateLimiter(rate=4.0, clock=clock, sleep=clock.sleep)
+
+    limiter.on_flood_wait(10)
+    state = limiter.state()
+    assert state.rate == pytest.approx(2.0)
+    assert state.in_backoff
+    assert state.backoff_remaining == pytest.approx(10.0)
+    assert state.flood_wait_count == 1
+    assert state.flood_wait_seconds == pytest.approx(10.0)
+
+    await limiter.acquire()
+    assert clock.now >= 10.0
+    assert not limiter.state().in_backoff
+
+
+def test_on_flood_wait_in_flight() -> None:
+    """Test the flood waits of the requests which were in flight at the same time decrease the rate only once."""
+    clock = _FakeClock()
+    limiter = RateLimiter(rate=8.0, clock=clock)
+
+    # Every concurrent request gets its own flood wait error, they arrive while the first one is being waited out.
+    for _ in range(8):
+        limiter.on_flood_wait(10)
+        clock.now += 0.5
+    state = limiter.state()
+    assert state.rate == pytest.approx(4.0)
+    assert state.backoff_remaining == pytest.approx(9.5)
+    assert state.flood_wait_count == 8
+
+    clock.now += state.backoff_remaining
+    limiter.on_flood_wait(10)
+    assert limiter.rate == pytest.approx(2.0)
+
+
+def test_on_success() -> None:
+    """Test the `RateLimiter.on_success` method increases the rate additively up to the maximum."""
+    limiter = RateLimiter(rate=1.0, max_rate=1.1)
+
+    limiter.on_success()
+    assert limiter.rate == pytest.approx(1.05)
+
+    for _ in range(10):
+        limiter.on_success()
+    assert limiter.rate == pytest.approx(1.1)
+
+
+def test_rate_bounds() -> None:
+    """Test the rate never drops below the configured minimum."""
+    limiter = RateLimiter(rate=1.0, min_rate=0.5, clock=lambda: 0.0)
+
+    for _ in range(5):
+        limiter.on_flood_wait(0)
+
+    assert limiter.rate == pytest.approx(0.5)
@@ -0,0 +1,182 @@
+# Copyright 2023 resurtm@gmail.com
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the "Software"), to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions
+# of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED
+# TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF
+# CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+#
+# https://opensource.org/licenses/MIT
+
+
+"""Recurring retention cleanup, it keeps deleting the user's messages older than the retention period."""
+
+import asyncio
+import logging
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Dict, Final, Optional, Tuple
+
+from settings import DEFAULT_DELETE_CONCURRENCY
+from telegram import (
+    CancelToken,
+    DeletionResult,
+    current_account,
+    enforce_retention,
+)
+
+_LOGGER: Final = logging.getLogger(__name__)
+
+# Default time between the starts of the retention passes.
+DEFAULT_RETENTION_INTERVAL: Final = timedelta(hours=1)
+
+
+@dataclass(frozen=True)
+class RetentionPolicy:
+    """Deletes the user's messages older than the retention period from the dialogs of an account."""
+
+    account: str
+    entity_ids: Tuple[int, ...]
+    days: int
+
+    @property
+    def retention(self) -> timedelta:
+        """Get the age of the messages which are kept.
+
+        Returns:
+            The retention period.
+        """
+        return timedelta(days=self.days)
+
+
+@dataclass(frozen=True)
+class RetentionPass:
+    """Outcome of a single retention pass."""
+
+    started_at: datetime
+    results: Dict[int, DeletionResult] = field(default_factory=dict)
+    # The pass is skipped if another account is used by the process at the moment.
+    skipped: bool = False
+
+    @property
+    def deleted_count(self) -> int:
+        """Get the amount of the deleted messages.
+
+        Returns:
+            Sum of the deleted messages of all the dialogs.
+        """
+        return sum(result.deleted_count for result in self.results.values())
+
+    @property
+    def failed_count(self) -> int:
+        """Get the amount of the failed dialogs, they are retried on the next pass.
+
+        Returns:
+            Amount of the dialogs with errors.
+        """
+        return sum(1 for result in self.results.values() if result.error is not None)
+
+
+class RetentionScheduler:
+    """Runs the incremental retention passes of the policy periodically over the persistent Telegram client.
+
+    Each pass only scans the messages which crossed the retention boundary since the previous one, see
+    `enforce_retention`, so an idle pass costs a single search request per dialog.
+    """
+
+    def __init__(
+        self,
+        policy: RetentionPolicy,
+        interval: timedelta = DEFAULT_RETENTION_INTERVAL,
+        concurrency: int = DEFAULT_DELETE_CONCURRENCY,
+        on_pass: Optional[Callable[[RetentionPass], None]] = None,
+    ) -> None:
+        """Construct a new instance of the retention scheduler.
+
+        Args:
+            policy: Retention policy which is enforced.
+            interval: Time between the starts of the passes.
+            concurrency: Maximum amount of dialogs which messages are being deleted from at the same time.
+            on_pass: Called after every pass if provided.
+        """
+        _LOGGER.debug("RetentionScheduler, constructor, policy: %s", policy)
+        self.policy = policy
+        self._interval = interval
+        self._concurrency = concurrency
+        self._on_pass = on_pass
+        self._cancel_token = CancelToken()
+        self._stopped = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def running(self) -> bool:
+        """Check whether the scheduler was started and not stopped yet.
+
+        Returns:
+            True if the passes are being run.
+        """
+        return self._task is not None and not self._task.done()
+
+    def start(self) -> None:
+        """Start running the passes in the background, the first pass starts immediately."""
+        _LOGGER.debug("RetentionScheduler, start")
+        self._task = asyncio.ensure_future(self.run())
+
+    async def stop(self) -> None:
+        """Stop running the passes, the pass in progress is cancelled and its dialogs keep their checkpoints."""
+        _LOGGER.debug("RetentionScheduler, stop, begin")
+        self._stopped.set()
+        self._cancel_token.cancel()
+        if self._task is not None:
+            await self._task
+        _LOGGER.debug("RetentionScheduler, stop, end")
+
+    async def run(self) -> None:
+        """Run the passes until the scheduler is stopped."""
+        while not self._stopped.is_set():
+            started = asyncio.get_running_loop().time()
+            retention_pass = await self.run_pass()
+            if self._on_pass is not None:
+                self._on_pass(retention_pass)
+            delay = self._interval.total_seconds() - (asyncio.get_running_loop().time() - started)
+            try:
+                await asyncio.wait_for(self._stopped.wait(), max(0.0, delay))
+            except asyncio.TimeoutError:
+                pass
+
+    async def run_pass(self) -> RetentionPass:
+        """Run a single retention pass, errors fail the dialogs of the pass instead of stopping the scheduler.
+
+        Returns:
+            Outcome of the pass.
+        """
+        started_at = datetime.now(timezone.utc)
+        if current_account() != self.policy.account:
+            _LOGGER.info("Retention pass skipped, account %s is not in use", self.policy.account)
+            return RetentionPass(started_at, skipped=True)
+        try:
+            results = await enforce_retention(
+                self.policy.entity_ids,
+                self.policy.retention,
+                concurrency=self._concurrency,
+                now=started_at,
+                cancel_token=self._cancel_token,
+            )
+        except Exception as error:
+            _LOGGER.error("Retention pass failed: %r", error)
+            results = {entity_id: DeletionResult(error=error) for entity_id in self.policy.entity_ids}
+        retention_pass = RetentionPass(started_at, results)
+        _LOGGER.info(
+            "Retention pass done, deleted: %d, failed dialogs: %d",
+            retention_pass.deleted_count,
+            retention_pass.failed_count,
+        )
+        return retention_pass
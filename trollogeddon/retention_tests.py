@@ -0,0 +1,92 @@
+# Copyright 2023 resurtm@gmail.com
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the "Software"), to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions
+# of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED
+# TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF
+# CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+#
+# https://opensource.org/licenses/MIT
+
+
+"""Recurring retention cleanup tests."""
+
+import asyncio
+from datetime import timedelta
+from typing import List
+
+import pytest
+from pytest_mock import MockerFixture
+from retention import RetentionPass, RetentionPolicy, RetentionScheduler
+from telegram import DeletionResult
+
+_POLICY = RetentionPolicy("trollogeddon", (1, 2), 30)
+
+
+@pytest.mark.asyncio
+async def test_run_pass(mocker: MockerFixture) -> None:
+    """Test the pass enforces the retention of the policy and survives the errors.
+
+    Args:
+        mocker: Mocker fixture instance to mock the things.
+    """
+    mocker.patch("retention.current_account", return_value="trollogeddon")
+    retention_mock = mocker.patch(
+        "retention.enforce_retention",
+        side_effect=[{1: DeletionResult(5), 2: DeletionResult(0, ValueError("boom"))}, ConnectionError("offline")],
+    )
+    scheduler = RetentionScheduler(_POLICY, concurrency=3)
+
+    retention_pass = await scheduler.run_pass()
+    assert (retention_pass.deleted_count, retention_pass.failed_count, retention_pass.skipped) == (5, 1, False)
+    retention_mock.assert_awaited_once_with(
+        (1, 2), timedelta(days=30), concurrency=3, now=retention_pass.started_at, cancel_token=mocker.ANY
+    )
+
+    retention_pass = await scheduler.run_pass()
+    assert (retention_pass.deleted_count, retention_pass.failed_count) == (0, 2)
+
+
+@pytest.mark.asyncio
+async def test_run_pass_other_account(mocker: MockerFixture) -> None:
+    """Test the pass is skipped while the process uses another account.
+
+    Args:
+        mocker: Mocker fixture instance to mock the things.
+    """
+    mocker.patch("retention.current_account", return_value="second")
+    retention_mock = mocker.patch("retention.enforce_retention")
+
+    retention_pass = await RetentionScheduler(_POLICY).run_pass()
+    assert retention_pass.skipped
+    retention_mock.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_scheduler(mocker: MockerFixture) -> None:
+    """Test the scheduler repeats the passes at the interval until it's stopped.
+
+    Args:
+        mocker: Mocker fixture instance to mock the things.
+    """
+    mocker.patch("retention.current_account", return_value="trollogeddon")
+    mocker.patch("retention.enforce_retention", return_value={1: DeletionResult(1), 2: DeletionResult(0)})
+    passes: List[RetentionPass] = []
+    scheduler = RetentionScheduler(_POLICY, interval=timedelta(seconds=0.01), on_pass=passes.append)
+
+    scheduler.start()
+    assert scheduler.running
+    while len(passes) < 3:
+        await asyncio.sleep(0.01)
+    await scheduler.stop()
+
+    assert not scheduler.running
+    assert all(retention_pass.deleted_count == 1 for retention_pass in passes)
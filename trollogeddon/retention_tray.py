@@ -0,0 +1,190 @@
+# Copyright 2023 resurtm@gmail.com
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the "Software"), to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions
+# of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED
+# TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF
+# CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+#
+# https://opensource.org/licenses/MIT
+
+
+"""Contains the system tray icon class of the recurring retention cleanup."""
+
+from __future__ import annotations
+
+import logging
+from contextlib import asynccontextmanager
+from datetime import timedelta
+from typing import TYPE_CHECKING, AsyncIterator, Final, Optional
+
+from lazy_modules import lazy_module
+from PySide6.QtCore import Slot
+from PySide6.QtGui import QAction
+from PySide6.QtWidgets import QMainWindow, QMenu, QStyle, QSystemTrayIcon
+from qasync import asyncSlot  # type: ignore
+from settings import app_settings
+
+if TYPE_CHECKING:
+    import retention
+else:
+    retention = lazy_module("retention")
+
+_LOGGER: Final = logging.getLogger(__name__)
+
+
+class RetentionTray(QSystemTrayIcon):
+    """System tray icon which runs the recurring retention cleanup, it keeps running while the main window is hidden."""
+
+    def __init__(self, window: QMainWindow, exit_action: QAction) -> None:
+        """Construct a new instance of the retention tray icon class, the icon is shown once the cleanup starts.
+
+        Args:
+            window: Main window which is shown and hidden from the tray.
+            exit_action: Action which exits the application.
+        """
+        _LOGGER.debug("RetentionTray, constructor, begin")
+        super().__init__(window.style().standardIcon(QStyle.StandardPixmap.SP_TrashIcon), window)
+
+        self._window = window
+        self._scheduler: Optional[retention.RetentionScheduler] = None
+        self._concurrency = 0
+        self._interval: Optional[timedelta] = None
+
+        self._show_action = QAction("&Show Window", self)
+        self._show_action.triggered.connect(self._show_action_triggered)  # type: ignore
+        self._stop_action = QAction("S&top Retention Cleanup", self)
+        self._stop_action.setEnabled(False)
+        self._stop_action.triggered.connect(self._stop_action_triggered)  # type: ignore
+
+        menu = QMenu(window)
+        menu.addAction(self._show_action)
+        menu.addAction(self._stop_action)
+        menu.addSeparator()
+        menu.addAction(exit_action)
+        self.setContextMenu(menu)
+        self.setToolTip("Trollogeddon")
+        self.activated.connect(self._activated)  # type: ignore
+
+        _LOGGER.debug("RetentionTray, constructor, end")
+
+    @property
+    def running(self) -> bool:
+        """Check whether the retention cleanup is running.
+
+        Returns:
+            True if the retention passes are being run.
+        """
+        return self._scheduler is not None and self._scheduler.running
+
+    async def start(
+        self, policy: retention.RetentionPolicy, concurrency: int, interval: Optional[timedelta] = None
+    ) -> None:
+        """Start the retention cleanup of the policy, the running one is stopped first.
+
+        Args:
+            policy: Retention policy which is enforced.
+            concurrency: Maximum amount of dialogs which messages are being deleted from at the same time.
+            interval: Time between the starts of the passes, the default one if not provided.
+        """
+        _LOGGER.debug("RetentionTray, start, begin")
+
+        await self.stop()
+        self._concurrency = concurrency
+        self._interval = interval
+        self._scheduler = retention.RetentionScheduler(
+            policy, interval or retention.DEFAULT_RETENTION_INTERVAL, concurrency, self._pass_done
+        )
+        self._scheduler.start()
+        self._stop_action.setEnabled(True)
+        self.setToolTip(f"Trollogeddon: keeping {policy.days} days in {len(policy.entity_ids)} dialogs")
+        self.show()
+
+        _LOGGER.debug("RetentionTray, start, end")
+
+    async def stop(self) -> None:
+        """Stop the retention cleanup if it's running, the icon is hidden."""
+        _LOGGER.debug("RetentionTray, stop, begin")
+
+        if self._scheduler is not None:
+            await self._scheduler.stop()
+            self._scheduler = None
+        self._stop_action.setEnabled(False)
+        self.hide()
+
+        _LOGGER.debug("RetentionTray, stop, end")
+
+    @asynccontextmanager
+    async def paused(self) -> AsyncIterator[None]:
+        """Stop the retention cleanup for the duration of the block, it's started again afterwards if it was running.
+
+        The pass in progress is cancelled and waited for, so the block can shut the shared client down.
+
+        Yields:
+            Nothing, the cleanup is stopped inside the block.
+        """
+        scheduler = self._scheduler
+        if scheduler is None or not scheduler.running:
+            yield
+            return
+        _LOGGER.debug("RetentionTray, pause")
+        await self.stop()
+        try:
+            yield
+        finally:
+            _LOGGER.debug("RetentionTray, resume")
+            await self.start(scheduler.policy, self._concurrency, self._interval)
+
+    def _pass_done(self, retention_pass: retention.RetentionPass) -> None:
+        """Show the outcome of the retention pass, passes which did nothing are silent.
+
+        Args:
+            retention_pass: Outcome of the pass.
+        """
+        started_at = retention_pass.started_at.astimezone().strftime("%H:%M")
+        self.setToolTip(f"Trollogeddon: last pass at {started_at}, deleted {retention_pass.deleted_count} messages")
+        if retention_pass.failed_count:
+            self.showMessage(
+                "Retention Cleanup",
+                f"{retention_pass.failed_count} dialogs failed, they're retried on the next pass.",
+                QSystemTrayIcon.MessageIcon.Warning,
+            )
+        elif retention_pass.deleted_count:
+            self.showMessage("Retention Cleanup", f"Deleted {retention_pass.deleted_count} old messages.")
+
+    @Slot(QSystemTrayIcon.ActivationReason)
+    def _activated(self, reason: QSystemTrayIcon.ActivationReason) -> None:
+        """Slot which shows the main window once the icon is clicked.
+
+        Args:
+            reason: How the icon was activated.
+        """
+        if reason == QSystemTrayIcon.ActivationReason.Trigger:
+            self._show_action_triggered()
+
+    @Slot()
+    def _show_action_triggered(self) -> None:
+        """Slot which handles the show window action trigger signal."""
+        self._window.showNormal()
+        self._window.activateWindow()
+
+    @asyncSlot()
+    async def _stop_action_triggered(self) -> None:
+        """Async slot which stops the retention cleanup and turns it off in the settings."""
+        _LOGGER.debug("RetentionTray, stop action trigger, begin")
+
+        if self._scheduler is not None:
+            app_settings().set_retention_days(0, self._scheduler.policy.account)
+        await self.stop()
+        # The window could be hidden into the tray, it would be unreachable without the icon.
+        self._show_action_triggered()
+
+        _LOGGER.debug("RetentionTray, stop action trigger, end")
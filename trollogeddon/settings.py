@@ -19,60 +19,660 @@
 """File contains settings related things and utilities."""
 
 import logging
-from typing import Final
+import os
+import re
+import sys
+from configparser import ConfigParser
+from pathlib import Path
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Final,
+    List,
+    Optional,
+    Protocol,
+    Tuple,
+    TypeVar,
+    Union,
+)
 
-from PySide6.QtCore import QSettings
+from app_logging import DEFAULT_LOG_LEVEL, LOG_LEVELS
 
 _SETTINGS_ORG_NAME: Final = "resurtm"
 _SETTINGS_APP_NAME: Final = "trollogeddon"
 
-_SETTINGS_TG_API_ID_KEY: Final = "telegram/api_id"
-_SETTINGS_TG_API_HASH_KEY: Final = "telegram/api_hash"
+_SETTINGS_TG_SECTION: Final = "telegram"
+_SETTINGS_TG_API_ID_NAME: Final = "api_id"
+_SETTINGS_TG_API_HASH_NAME: Final = "api_hash"
+_SETTINGS_TG_RETENTION_DAYS_NAME: Final = "retention_days"
+_SETTINGS_TG_RETENTION_IDS_NAME: Final = "retention_ids"
+_SETTINGS_TG_ACCOUNTS_KEY: Final = "telegram/accounts"
+_SETTINGS_DELETE_CONCURRENCY_KEY: Final = "deletion/concurrency"
+_SETTINGS_LOG_LEVEL_KEY: Final = "logging/level"
+
+# Default amount of dialogs which messages are being deleted from at the same time.
+DEFAULT_DELETE_CONCURRENCY: Final = 4
+
+# Account which is used by default, its credentials are stored in the "telegram" section for the compatibility.
+DEFAULT_ACCOUNT: Final = "trollogeddon"
+# Account names are used as the session, cache & journal file names and as the settings section names.
+_ACCOUNT_NAME_PATTERN: Final = re.compile(r"^[A-Za-z0-9_-]+$")
+
+# Environment variable which overrides the settings file path of the Qt-free backend.
+SETTINGS_PATH_ENV: Final = "TROLLOGEDDON_SETTINGS"
+# Environment variable which overrides the directory of the sessions, caches and journals of the accounts.
+DATA_DIR_ENV: Final = "TROLLOGEDDON_DATA"
+
+# Characters which `QSettings` escapes in the INI values mapped to their escape codes.
+_INI_ESCAPE_CODES: Final = {
+    "\a": "a",
+    "\b": "b",
+    "\f": "f",
+    "\n": "n",
+    "\r": "r",
+    "\t": "t",
+    "\v": "v",
+    '"': '"',
+    "\\": "\\",
+}
+# Escape codes which `QSettings` reads mapped to the characters, a few of them are never written.
+_INI_ESCAPED_CHARS: Final = {**{code: char for char, code in _INI_ESCAPE_CODES.items()}, "?": "?", "'": "'"}
+# Characters which make `QSettings` quote the INI value, so they're not taken as list separators or comments.
+_INI_QUOTED_CHARS: Final = frozenset(";,=")
+_INI_HEX_DIGITS: Final = frozenset("0123456789abcdefABCDEF")
 
 _LOGGER: Final = logging.getLogger(__name__)
 
+# Listener of the credentials changes, it receives the name of the account which credentials have changed.
+CredentialsListener = Callable[[str], None]
+
+_ValueType = TypeVar("_ValueType")
+
+
+class SettingsBackend(Protocol):
+    """Key-value storage of the settings, the subset of the `QSettings` interface which is used by the application."""
+
+    def value(self, key: str, default: Any = None) -> Any:
+        """Get the stored value.
+
+        Args:
+            key: Key of the value in the "section/name" form.
+            default: Value to be returned if nothing is stored.
+        """
+
+    def setValue(self, key: str, value: Any) -> None:
+        """Store the value.
+
+        Args:
+            key: Key of the value in the "section/name" form.
+            value: The value to be stored.
+        """
+
+
+class FileSettings:
+    """Settings backend which doesn't need Qt, used by the headless mode.
+
+    It reads and writes the same INI file as `QSettings` does on Linux, so the headless mode sees the credentials
+    entered in the GUI. Values are escaped and quoted the way `QSettings` does it, unquoted values with commas are read
+    as lists like `QSettings` reads them.
+    """
+
+    def __init__(self, path: Path) -> None:
+        """Construct a new instance of the file settings backend, the file is read immediately if it exists.
+
+        Args:
+            path: Path of the INI file.
+        """
+        self._path = path
+        self._parser = ConfigParser(interpolation=None)
+        self._parser.optionxform = str  # type: ignore
+        self._parser.read(path, encoding="utf-8")
+
+    def value(self, key: str, default: Any = None) -> Any:
+        """Get the stored value.
+
+        Args:
+            key: Key of the value in the "section/name" form.
+            default: Value to be returned if nothing is stored.
+
+        Returns:
+            The stored string or list of strings value, or the default one.
+        """
+        section, name = _split_key(key)
+        stored = self._parser.get(section, name, fallback=None)
+        if stored is None or stored == "@Invalid()":
+            return default
+        value = _ini_unescape(stored)
+        if isinstance(value, str) and value.startswith("@@"):
+            return value[1:]
+        if isinstance(value, str) and value.startswith("@String(") and value.endswith(")"):
+            return value[len("@String(") : -1]
+        return value
+
+    def setValue(self, key: str, value: Any) -> None:
+        """Store the value and write the file.
+
+        Args:
+            key: Key of the value in the "section/name" form.
+            value: The value to be stored.
+        """
+        section, name = _split_key(key)
+        if not self._parser.has_section(section):
+            self._parser.add_section(section)
+        if isinstance(value, bool):
+            stored = "true" if value else "false"
+        else:
+            stored = _ini_escape(f"@{value}" if str(value).startswith("@") else str(value))
+        self._parser.set(section, name, stored)
+        self._path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self._path, "w", encoding="utf-8") as file:
+            self._parser.write(file, space_around_delimiters=False)
+
+
+def _ini_escape(value: str) -> str:
+    """Escape the string value for the INI file the way `QSettings` does it.
+
+    Args:
+        value: The string value.
+
+    Returns:
+        The escaped value, quoted if it contains the list separators or the leading or trailing spaces.
+    """
+    result: List[str] = []
+    escape_hex_digit = False
+    for char in value:
+        if escape_hex_digit and char in _INI_HEX_DIGITS:
+            result.append(f"\\x{ord(char):x}")
+            continue
+        escape_hex_digit = False
+        if char == "\0":
+            result.append("\\0")
+            escape_hex_digit = True
+        elif char in _INI_ESCAPE_CODES:
+            result.append(f"\\{_INI_ESCAPE_CODES[char]}")
+        elif ord(char) <= 0x1F:
+            result.append(f"\\x{ord(char):x}")
+            escape_hex_digit = True
+        else:
+            result.append(char)
+    escaped = "".join(result)
+    if _INI_QUOTED_CHARS.intersection(value) or escaped.startswith(" ") or escaped.endswith(" "):
+        return f'"{escaped}"'
+    return escaped
+
+
+def _ini_unescape(stored: str) -> Union[str, List[str]]:
+    """Unescape the INI file value the way `QSettings` does it.
+
+    Args:
+        stored: The value as it's written in the file.
+
+    Returns:
+        The string value, or the list of strings if the value has unquoted commas.
+    """
+    items: List[str] = []
+    current: List[str] = []
+    # Length of the current value which is kept when the trailing spaces are chopped, i.e. the escaped characters.
+    kept = 0
+    quoted = in_quotes = False
+
+    def skip_spaces(position: int) -> int:
+        while position < len(stored) and stored[position] in " \t":
+            position += 1
+        return position
+
+    def chop_spaces() -> None:
+        while len(current) > kept and current[-1] in " \t":
+            current.pop()
+
+    index = skip_spaces(0)
+    while index < len(stored):
+        char = stored[index]
+        index += 1
+        if char == "\\":
+            if index >= len(stored):
+                break
+            code = stored[index]
+            index += 1
+            if code in _INI_ESCAPED_CHARS:
+                current.append(_INI_ESCAPED_CHARS[code])
+            elif code == "x" or code in "01234567":
+                digits, base = (_INI_HEX_DIGITS, 16) if code == "x" else (frozenset("01234567"), 8)
+                start = index if code == "x" else index - 1
+                while index < len(stored) and stored[index] in digits:
+                    index += 1
+                if index > start:
+                    current.append(chr(min(int(stored[start:index], base), sys.maxunicode)))
+            kept = len(current)
+        elif char == '"':
+            quoted = True
+            in_quotes = not in_quotes
+            if not in_quotes:
+                kept = len(current)
+                index = skip_spaces(index)
+        elif char == "," and not in_quotes:
+            if not quoted:
+                chop_spaces()
+            items.append("".join(current))
+            current, kept, quoted = [], 0, False
+            index = skip_spaces(index)
+        else:
+            current.append(char)
+    if not quoted:
+        chop_spaces()
+    if items:
+        return [*items, "".join(current)]
+    return "".join(current)
+
+
+def settings_path() -> Path:
+    """Get the path of the settings file used by the Qt-free backend.
+
+    Returns:
+        Path from the environment variable, otherwise the path which `QSettings` uses on Linux.
+    """
+    override = os.environ.get(SETTINGS_PATH_ENV)
+    if override:
+        return Path(override).expanduser()
+    config_home = os.environ.get("XDG_CONFIG_HOME") or Path.home() / ".config"
+    return Path(config_home) / _SETTINGS_ORG_NAME / f"{_SETTINGS_APP_NAME}.conf"
+
+
+def data_dir() -> Path:
+    """Get the directory of the sessions, caches and journals, it's the same for the GUI and the headless mode.
+
+    Returns:
+        Path from the environment variable, otherwise the application data directory of Qt on Linux.
+    """
+    override = os.environ.get(DATA_DIR_ENV)
+    if override:
+        return Path(override).expanduser()
+    data_home = os.environ.get("XDG_DATA_HOME") or Path.home() / ".local" / "share"
+    return Path(data_home) / _SETTINGS_ORG_NAME / _SETTINGS_APP_NAME
+
+
+def _split_key(key: str) -> Tuple[str, str]:
+    """Split the settings key into the INI file section and option names.
+
+    Args:
+        key: Key in the "section/name" form, keys without a section go to the "General" one like in `QSettings`.
+
+    Returns:
+        Section and option names.
+    """
+    section, _, name = key.rpartition("/")
+    return section or "General", name
+
+
+def _account_key(account: str, name: str) -> str:
+    """Build the settings key of the account credential.
+
+    Args:
+        account: Name of the account.
+        name: Name of the credential.
+
+    Returns:
+        The key in the "telegram" section for the default account, in the "telegram.<account>" section otherwise.
+    """
+    if account == DEFAULT_ACCOUNT:
+        return f"{_SETTINGS_TG_SECTION}/{name}"
+    return f"{_SETTINGS_TG_SECTION}.{account}/{name}"
+
+
+def parse_api_id(value: Any) -> int:
+    """Parse and validate the Telegram App API_ID value.
+
+    Args:
+        value: The value to be parsed, e.g. the text entered by the user.
+
+    Returns:
+        The API_ID value.
+
+    Raises:
+        ValueError: The value is not a positive integer.
+    """
+    try:
+        api_id = int(str(value).strip())
+    except ValueError:
+        raise ValueError(f"Invalid API ID: {value!r}") from None
+    if api_id <= 0:
+        raise ValueError(f"Invalid API ID: {value!r}")
+    return api_id
+
+
+def _parse_optional_api_id(value: Any) -> Optional[int]:
+    """Parse the stored Telegram App API_ID value.
+
+    Args:
+        value: The stored value.
+
+    Returns:
+        The API_ID value, none if it's not set or not valid.
+    """
+    try:
+        return parse_api_id(value)
+    except ValueError:
+        return None
+
+
+def _split_list(value: Any) -> List[str]:
+    """Split the stored comma separated list.
+
+    Args:
+        value: The stored value, `QSettings` returns a list already if the value wasn't quoted in the file.
+
+    Returns:
+        The list items.
+    """
+    if isinstance(value, (list, tuple)):
+        return [str(item) for item in value]
+    return str(value).split(",")
+
+
+def _parse_retention_days(value: Any) -> int:
+    """Parse the stored retention period.
+
+    Args:
+        value: The stored value.
+
+    Returns:
+        The retention period in days, zero if it's not set or not valid.
+    """
+    try:
+        return max(0, int(str(value)))
+    except (TypeError, ValueError):
+        return 0
+
+
+def _parse_delete_concurrency(value: Any) -> int:
+    """Parse the stored deletion concurrency limit.
+
+    Args:
+        value: The stored value.
+
+    Returns:
+        The concurrency limit, the default one if it's not set or not valid.
+    """
+    try:
+        return max(1, int(str(value)))
+    except (TypeError, ValueError):
+        return DEFAULT_DELETE_CONCURRENCY
+
+
+def _create_backend() -> SettingsBackend:
+    """Create the settings backend.
+
+    The native `QSettings` storage is used if Qt is loaded already (i.e. in the GUI), Qt isn't imported otherwise.
+
+    Returns:
+        New settings backend instance.
+    """
+    if "PySide6.QtCore" in sys.modules:
+        from PySide6.QtCore import QSettings
+
+        return QSettings(_SETTINGS_ORG_NAME, _SETTINGS_APP_NAME)
+    return FileSettings(settings_path())
+
 
 class AppSettings:
-    """Class responsible for application settings routines."""
+    """Class responsible for application settings routines.
+
+    Every value is read from the storage once and is kept parsed in memory, the writes go to both. The instance
+    shared by the process is returned by `app_settings`, the values written through other instances aren't seen by it.
+    """
 
-    def __init__(self) -> None:
-        """Construct a new instance of the application settings class."""
+    def __init__(self, backend: Optional[SettingsBackend] = None) -> None:
+        """Construct a new instance of the application settings class.
+
+        Args:
+            backend: settings storage, picked automatically if not provided.
+        """
         _LOGGER.debug("AppSettings, constructor, begin")
-        self._settings = QSettings(_SETTINGS_ORG_NAME, _SETTINGS_APP_NAME)
+        self._settings = backend if backend is not None else _create_backend()
+        self._values: Dict[str, Any] = {}
+        self._credentials_listeners: List[CredentialsListener] = []
         _LOGGER.debug("AppSettings, constructor, end")
 
-    def api_id(self) -> str:
+    def add_credentials_listener(self, listener: CredentialsListener) -> None:
+        """Register the listener which is notified when the API credentials of an account change.
+
+        Args:
+            listener: The listener, it's called with the name of the account.
+        """
+        self._credentials_listeners.append(listener)
+
+    def _get(self, key: str, default: Any, parse: Callable[[Any], _ValueType]) -> _ValueType:
+        """Get the value from the memory, it's read from the storage and parsed on the first use.
+
+        Args:
+            key: Key of the value in the "section/name" form.
+            default: Value to be parsed if nothing is stored.
+            parse: Function which turns the stored value into the typed one.
+
+        Returns:
+            The typed value.
+        """
+        if key not in self._values:
+            self._values[key] = parse(self._settings.value(key, default))
+        return self._values[key]
+
+    def _set(self, key: str, value: Any, stored: Any = None) -> bool:
+        """Store the value, unchanged values aren't written.
+
+        Args:
+            key: Key of the value in the "section/name" form.
+            value: The typed value kept in the memory.
+            stored: The value written to the storage, the typed value is written if not provided.
+
+        Returns:
+            True if the value has changed.
+        """
+        if key in self._values and self._values[key] == value:
+            return False
+        self._values[key] = value
+        self._settings.setValue(key, value if stored is None else stored)
+        return True
+
+    def _credentials_changed(self, account: str) -> None:
+        """Notify the listeners about the credentials change.
+
+        Args:
+            account: Name of the account.
+        """
+        _LOGGER.debug("AppSettings, credentials changed, %s", account)
+        for listener in self._credentials_listeners:
+            listener(account)
+
+    def accounts(self) -> List[str]:
+        """Get the names of the configured accounts.
+
+        Returns:
+            The account names, the default account goes first.
+        """
+        _LOGGER.debug("AppSettings, get accounts")
+        names = self._get(
+            _SETTINGS_TG_ACCOUNTS_KEY,
+            "",
+            lambda value: [name for name in _split_list(value) if name and name != DEFAULT_ACCOUNT],
+        )
+        return [DEFAULT_ACCOUNT, *dict.fromkeys(names)]
+
+    def add_account(self, account: str) -> None:
+        """Add a new named account, adding an existing one does nothing.
+
+        Args:
+            account: Name of the account, only latin letters, digits, underscores and dashes are allowed.
+
+        Raises:
+            ValueError: The account name is not valid.
+        """
+        _LOGGER.debug("AppSettings, add account")
+        if not _ACCOUNT_NAME_PATTERN.match(account):
+            raise ValueError(f"Invalid account name: {account!r}")
+        accounts = self.accounts()
+        if account not in accounts:
+            names = [*accounts[1:], account]
+            self._set(_SETTINGS_TG_ACCOUNTS_KEY, names, ",".join(names))
+
+    def api_id(self, account: str = DEFAULT_ACCOUNT) -> Optional[int]:
         """Get the existing current Telegram App API_ID value.
 
+        Args:
+            account: Name of the account.
+
         Returns:
-            The current Telegram App API_ID value.
+            The current Telegram App API_ID value, none if it's not set.
         """
         _LOGGER.debug("AppSettings, get api ID")
-        return str(self._settings.value(_SETTINGS_TG_API_ID_KEY))
+        return self._get(_account_key(account, _SETTINGS_TG_API_ID_NAME), None, _parse_optional_api_id)
 
-    def set_api_id(self, api_id: str) -> None:
+    def set_api_id(self, api_id: int, account: str = DEFAULT_ACCOUNT) -> None:
         """Set the new value of the Telegram App API_ID.
 
         Args:
             api_id: the new value to be used.
+            account: Name of the account.
+
+        Raises:
+            ValueError: The value is not a positive integer.
         """
         _LOGGER.debug("AppSettings, set api ID")
-        self._settings.setValue(_SETTINGS_TG_API_ID_KEY, api_id)
+        if self._set(_account_key(account, _SETTINGS_TG_API_ID_NAME), parse_api_id(api_id)):
+            self._credentials_changed(account)
 
-    def api_hash(self) -> str:
+    def api_hash(self, account: str = DEFAULT_ACCOUNT) -> str:
         """Get the existing current Telegram App API_HASH value.
 
+        Args:
+            account: Name of the account.
+
         Returns:
             The current Telegram App API_HASH value.
         """
         _LOGGER.debug("AppSettings, get api hash")
-        return str(self._settings.value(_SETTINGS_TG_API_HASH_KEY))
+        return self._get(_account_key(account, _SETTINGS_TG_API_HASH_NAME), "", lambda value: str(value or ""))
 
-    def set_api_hash(self, api_hash: str) -> None:
+    def set_api_hash(self, api_hash: str, account: str = DEFAULT_ACCOUNT) -> None:
         """Set the new value of the Telegram App API_HASH.
 
         Args:
             api_hash: the new value to be used.
+            account: Name of the account.
         """
         _LOGGER.debug("AppSettings, set api hash")
-        self._settings.setValue(_SETTINGS_TG_API_HASH_KEY, api_hash)
+        if self._set(_account_key(account, _SETTINGS_TG_API_HASH_NAME), api_hash):
+            self._credentials_changed(account)
+
+    def retention_days(self, account: str = DEFAULT_ACCOUNT) -> int:
+        """Get the age in days of the messages which are kept by the recurring retention cleanup.
+
+        Args:
+            account: Name of the account.
+
+        Returns:
+            The retention period in days, zero if the retention cleanup is off.
+        """
+        _LOGGER.debug("AppSettings, get retention days")
+        return self._get(_account_key(account, _SETTINGS_TG_RETENTION_DAYS_NAME), 0, _parse_retention_days)
+
+    def set_retention_days(self, days: int, account: str = DEFAULT_ACCOUNT) -> None:
+        """Set the new age in days of the messages which are kept by the recurring retention cleanup.
+
+        Args:
+            days: the new value to be used, zero turns the retention cleanup off.
+            account: Name of the account.
+        """
+        _LOGGER.debug("AppSettings, set retention days")
+        self._set(_account_key(account, _SETTINGS_TG_RETENTION_DAYS_NAME), days)
+
+    def retention_ids(self, account: str = DEFAULT_ACCOUNT) -> List[int]:
+        """Get the entity IDs of the dialogs which the recurring retention cleanup is applied to.
+
+        Args:
+            account: Name of the account.
+
+        Returns:
+            The entity IDs, invalid ones are skipped.
+        """
+        _LOGGER.debug("AppSettings, get retention IDs")
+        entity_ids = self._get(
+            _account_key(account, _SETTINGS_TG_RETENTION_IDS_NAME),
+            "",
+            lambda value: [int(token) for token in _split_list(value) if token.strip().lstrip("-").isdigit()],
+        )
+        return list(entity_ids)
+
+    def set_retention_ids(self, entity_ids: List[int], account: str = DEFAULT_ACCOUNT) -> None:
+        """Set the new entity IDs of the dialogs which the recurring retention cleanup is applied to.
+
+        Args:
+            entity_ids: the new value to be used.
+            account: Name of the account.
+        """
+        _LOGGER.debug("AppSettings, set retention IDs")
+        self._set(
+            _account_key(account, _SETTINGS_TG_RETENTION_IDS_NAME),
+            list(entity_ids),
+            ",".join(str(entity_id) for entity_id in entity_ids),
+        )
+
+    def delete_concurrency(self) -> int:
+        """Get the maximum amount of dialogs which messages are being deleted from at the same time.
+
+        Returns:
+            The current deletion concurrency limit value.
+        """
+        _LOGGER.debug("AppSettings, get delete concurrency")
+        return self._get(_SETTINGS_DELETE_CONCURRENCY_KEY, DEFAULT_DELETE_CONCURRENCY, _parse_delete_concurrency)
+
+    def set_delete_concurrency(self, concurrency: int) -> None:
+        """Set the new maximum amount of dialogs which messages are being deleted from at the same time.
+
+        Args:
+            concurrency: the new value to be used.
+        """
+        _LOGGER.debug("AppSettings, set delete concurrency")
+        self._set(_SETTINGS_DELETE_CONCURRENCY_KEY, concurrency)
+
+    def log_level(self) -> str:
+        """Get the level of the application logs.
+
+        Returns:
+            The level name, one of `LOG_LEVELS`.
+        """
+        _LOGGER.debug("AppSettings, get log level")
+        return self._get(
+            _SETTINGS_LOG_LEVEL_KEY,
+            DEFAULT_LOG_LEVEL,
+            lambda value: str(value).upper() if str(value).upper() in LOG_LEVELS else DEFAULT_LOG_LEVEL,
+        )
+
+    def set_log_level(self, level: str) -> None:
+        """Set the new level of the application logs, it's applied on the next start.
+
+        Args:
+            level: the level name, one of `LOG_LEVELS`.
+
+        Raises:
+            ValueError: The level name is not valid.
+        """
+        _LOGGER.debug("AppSettings, set log level")
+        if level not in LOG_LEVELS:
+            raise ValueError(f"Invalid log level: {level!r}")
+        self._set(_SETTINGS_LOG_LEVEL_KEY, level)
+
+
+_instance: Optional[AppSettings] = None
+
+
+def app_settings() -> AppSettings:
+    """Get the application settings shared by the process, they are loaded on the first use.
+
+    Returns:
+        The shared application settings instance.
+    """
+    global _instance
+    if _instance is None:
+        _instance = AppSettings()
+    return _instance
@@ -21,9 +21,20 @@
 import logging
 from typing import Final
 
+from app_logging import LOG_LEVELS
 from PySide6.QtCore import Slot
-from PySide6.QtWidgets import QDialog, QGridLayout, QLabel, QLineEdit, QPushButton
-from settings import AppSettings
+from PySide6.QtWidgets import (
+    QComboBox,
+    QDialog,
+    QGridLayout,
+    QLabel,
+    QLineEdit,
+    QMessageBox,
+    QPushButton,
+    QSpinBox,
+)
+from settings import AppSettings, app_settings, parse_api_id
+from telegram import current_account
 
 _LOGGER: Final = logging.getLogger(__name__)
 
@@ -31,12 +42,21 @@ _LOGGER: Final = logging.getLogger(__name__)
 class SettingsDialog(QDialog):
     """Application UI settings dialog class."""
 
+    _account_input: QComboBox
+    _account_label: QLabel
+
     _api_id_input: QLineEdit
     _api_id_label: QLabel
 
     _api_hash_input: QLineEdit
     _api_hash_label: QLabel
 
+    _concurrency_input: QSpinBox
+    _concurrency_label: QLabel
+
+    _log_level_input: QComboBox
+    _log_level_label: QLabel
+
     _save_button: QPushButton
 
     _settings: AppSettings
@@ -51,8 +71,11 @@ class SettingsDialog(QDialog):
 
         super().__init__(parent)
         self._prepare_settings()
+        self._create_account_controls()
         self._create_api_id_controls()
         self._create_api_hash_controls()
+        self._create_concurrency_controls()
+        self._create_log_level_controls()
         self._create_save_button()
         self._create_layout()
 
@@ -63,16 +86,30 @@ class SettingsDialog(QDialog):
         _LOGGER.debug("SettingsDialog, prepare settings, begin")
 
         self.window_title = "Application Settings"
-        self._settings = AppSettings()
+        self._settings = app_settings()
 
         _LOGGER.debug("SettingsDialog, prepare settings, end")
 
+    def _create_account_controls(self) -> None:
+        """Create input & label PySide controls to be used to pick the account which credentials are edited."""
+        _LOGGER.debug("SettingsDialog, create account controls, begin")
+
+        self._account_input = QComboBox()
+        self._account_input.setEditable(True)
+        self._account_input.addItems(self._settings.accounts())
+        self._account_input.setCurrentText(current_account())
+        self._account_input.currentTextChanged.connect(self._account_changed)  # type: ignore
+        self._account_label = QLabel("Account:")
+        self._account_label.setBuddy(self._account_input)
+
+        _LOGGER.debug("SettingsDialog, create account controls, end")
+
     def _create_api_id_controls(self) -> None:
         """Create input & label PySide controls to be used with the Telegram App API_ID value."""
         _LOGGER.debug("SettingsDialog, create API ID controls, begin")
 
         self._api_id_input = QLineEdit()
-        self._api_id_input.setText(self._settings.api_id())
+        self._api_id_input.setText(self._api_id_text(current_account()))
         self._api_id_label = QLabel("App api_id:")
         self._api_id_label.setBuddy(self._api_id_input)
 
@@ -83,12 +120,36 @@ class SettingsDialog(QDialog):
         _LOGGER.debug("SettingsDialog, create API hash controls, begin")
 
         self._api_hash_input = QLineEdit()
-        self._api_hash_input.setText(self._settings.api_hash())
+        self._api_hash_input.setText(self._settings.api_hash(current_account()))
         self._api_hash_label = QLabel("App api_hash:")
         self._api_hash_label.setBuddy(self._api_hash_input)
 
         _LOGGER.debug("SettingsDialog, create API hash controls, end")
 
+    def _create_concurrency_controls(self) -> None:
+        """Create input & label PySide controls to be used with the deletion concurrency limit value."""
+        _LOGGER.debug("SettingsDialog, create concurrency controls, begin")
+
+        self._concurrency_input = QSpinBox()
+        self._concurrency_input.setRange(1, 64)
+        self._concurrency_input.setValue(self._settings.delete_concurrency())
+        self._concurrency_label = QLabel("Parallel dialogs:")
+        self._concurrency_label.setBuddy(self._concurrency_input)
+
+        _LOGGER.debug("SettingsDialog, create concurrency controls, end")
+
+    def _create_log_level_controls(self) -> None:
+        """Create input & label PySide controls to be used with the log level value."""
+        _LOGGER.debug("SettingsDialog, create log level controls, begin")
+
+        self._log_level_input = QComboBox()
+        self._log_level_input.addItems(LOG_LEVELS)
+        self._log_level_input.setCurrentText(self._settings.log_level())
+        self._log_level_label = QLabel("Log level (on restart):")
+        self._log_level_label.setBuddy(self._log_level_input)
+
+        _LOGGER.debug("SettingsDialog, create log level controls, end")
+
     def _create_save_button(self) -> None:
         """Prepare application settings save button."""
         _LOGGER.debug("SettingsDialog, create save button, begin")
@@ -98,13 +159,52 @@ class SettingsDialog(QDialog):
 
         _LOGGER.debug("SettingsDialog, create save button, end")
 
+    @Slot(str)
+    def _account_changed(self, account: str) -> None:
+        """Slot which loads the credentials of the picked account, the new accounts have no credentials yet.
+
+        Args:
+            account: Name of the account.
+        """
+        _LOGGER.debug("SettingsDialog, account change, begin")
+
+        known = account in self._settings.accounts()
+        self._api_id_input.setText(self._api_id_text(account) if known else "")
+        self._api_hash_input.setText(self._settings.api_hash(account) if known else "")
+
+        _LOGGER.debug("SettingsDialog, account change, end")
+
+    def _api_id_text(self, account: str) -> str:
+        """Get the Telegram App API_ID value of the account as the input text.
+
+        Args:
+            account: Name of the account.
+
+        Returns:
+            The API_ID value, an empty string if it's not set.
+        """
+        api_id = self._settings.api_id(account)
+        return "" if api_id is None else str(api_id)
+
     @Slot()
     def _save_button_clicked(self) -> None:
         """Slot method which handles the application settings save button signal."""
         _LOGGER.debug("SettingsDialog, save button click, begin")
 
-        self._settings.set_api_id(self._api_id_input.text())
-        self._settings.set_api_hash(self._api_hash_input.text())
+        account = self._account_input.currentText().strip()
+        try:
+            api_id = parse_api_id(self._api_id_input.text())
+            self._settings.add_account(account)
+        except ValueError as error:
+            QMessageBox.warning(self, "Invalid Settings", str(error))
+            _LOGGER.debug("SettingsDialog, save button click, invalid settings, end")
+            return
+
+        # The shared client is notified and rebuilt on the next request if the credentials of its account change.
+        self._settings.set_api_id(api_id, account)
+        self._settings.set_api_hash(self._api_hash_input.text(), account)
+        self._settings.set_delete_concurrency(self._concurrency_input.value())
+        self._settings.set_log_level(self._log_level_input.currentText())
         self.close()
 
         _LOGGER.debug("SettingsDialog, save button click, end")
@@ -115,12 +215,21 @@ class SettingsDialog(QDialog):
 
         layout = QGridLayout(self)
 
-        layout.addWidget(self._api_id_label, 0, 0)
-        layout.addWidget(self._api_id_input, 0, 1)
+        layout.addWidget(self._account_label, 0, 0)
+        layout.addWidget(self._account_input, 0, 1)
+
+        layout.addWidget(self._api_id_label, 1, 0)
+        layout.addWidget(self._api_id_input, 1, 1)
+
+        layout.addWidget(self._api_hash_label, 2, 0)
+        layout.addWidget(self._api_hash_input, 2, 1)
+
+        layout.addWidget(self._concurrency_label, 3, 0)
+        layout.addWidget(self._concurrency_input, 3, 1)
 
-        layout.addWidget(self._api_hash_label, 1, 0)
-        layout.addWidget(self._api_hash_input, 1, 1)
+        layout.addWidget(self._log_level_label, 4, 0)
+        layout.addWidget(self._log_level_input, 4, 1)
 
-        layout.addWidget(self._save_button, 2, 0, 1, 2)
+        layout.addWidget(self._save_button, 5, 0, 1, 2)
 
         _LOGGER.debug("SettingsDialog, create layout, end")
@@ -0,0 +1,167 @@
+# Copyright 2023 resurtm@gmail.com
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the "Software"), to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions
+# of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED
+# TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF
+# CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+#
+# https://opensource.org/licenses/MIT
+
+
+"""Application settings tests."""
+
+from pathlib import Path
+from typing import Final, List
+
+import pytest
+from PySide6.QtCore import QSettings
+from settings import DEFAULT_ACCOUNT, AppSettings, FileSettings, SettingsBackend
+
+# String values which need the `QSettings` quoting or escaping in the INI files.
+_ESCAPED_VALUES: Final = [
+    "work,home",
+    "a, b",
+    " leading",
+    "trailing ",
+    "a;b=c",
+    'quote"',
+    "back\\slash",
+    "tab\tnew\nline",
+    "\x01abc",
+    "@at",
+    "ünï",
+    "",
+]
+
+
+def test_file_settings(tmp_path: Path) -> None:
+    """Test the file backend reads and writes the INI files in the `QSettings` format."""
+    path = tmp_path / "resurtm" / "trollogeddon.conf"
+    path.parent.mkdir()
+    path.write_text("[telegram]\napi_id=123\napi_hash=abc\n", encoding="utf-8")
+
+    settings = AppSettings(FileSettings(path))
+    assert settings.api_id() == 123
+    assert settings.api_hash() == "abc"
+    assert settings.delete_concurrency() == 4
+
+    settings.set_delete_concurrency(7)
+    assert "[deletion]\nconcurrency=7\n" in path.read_text(encoding="utf-8")
+    assert AppSettings(FileSettings(path)).delete_concurrency() == 7
+
+
+def test_file_settings_missing_file(tmp_path: Path) -> None:
+    """Test the file backend falls back to the defaults and creates the file on the first write."""
+    path = tmp_path / "missing" / "trollogeddon.conf"
+    settings = AppSettings(FileSettings(path))
+    assert settings.delete_concurrency() == 4
+
+    settings.set_api_hash("xyz")
+    assert AppSettings(FileSettings(path)).api_hash() == "xyz"
+
+
+def test_accounts(tmp_path: Path) -> None:
+    """Test the named accounts keep their own credentials, the default account keeps the original keys."""
+    path = tmp_path / "trollogeddon.conf"
+    settings = AppSettings(FileSettings(path))
+    assert settings.accounts() == [DEFAULT_ACCOUNT]
+
+    settings.add_account("work")
+    settings.add_account("work")
+    settings.add_account(DEFAULT_ACCOUNT)
+    settings.set_api_id(1, DEFAULT_ACCOUNT)
+    settings.set_api_id(2, "work")
+    with pytest.raises(ValueError):
+        settings.add_account("bad name")
+
+    settings = AppSettings(FileSettings(path))
+    assert settings.accounts() == [DEFAULT_ACCOUNT, "work"]
+    assert settings.api_id() == 1
+    assert settings.api_id("work") == 2
+    assert "[telegram]\naccounts=work\napi_id=1\n" in path.read_text(encoding="utf-8")
+
+
+def test_retention(tmp_path: Path) -> None:
+    """Test the retention policy is stored per account, the cleanup is off by default."""
+    settings = AppSettings(FileSettings(tmp_path / "trollogeddon.conf"))
+    assert (settings.retention_days(), settings.retention_ids()) == (0, [])
+
+    settings.set_retention_days(30)
+    settings.set_retention_ids([111, -1002])
+    settings.set_retention_days(7, "work")
+    assert (settings.retention_days(), settings.retention_ids()) == (30, [111, -1002])
+    assert (settings.retention_days("work"), settings.retention_ids("work")) == (7, [])
+
+
+def test_cached_values(tmp_path: Path) -> None:
+    """Test the values are read once, the API ID is validated and the credentials listeners see the real changes."""
+    path = tmp_path / "trollogeddon.conf"
+    backend = FileSettings(path)
+    settings = AppSettings(backend)
+    changes: List[str] = []
+    settings.add_credentials_listener(changes.append)
+    assert settings.api_id() is None
+    assert settings.api_hash() == ""
+
+    path.write_text("[telegram]\napi_id=5\n", encoding="utf-8")
+    backend._parser.read(path, encoding="utf-8")
+    assert settings.api_id() is None
+
+    with pytest.raises(ValueError):
+        settings.set_api_id("12a")  # type: ignore
+    settings.set_api_id(12, "work")
+    settings.set_api_id(12, "work")
+    settings.set_api_hash("abc")
+    settings.set_api_hash("abc")
+    settings.set_delete_concurrency(3)
+    assert changes == ["work", DEFAULT_ACCOUNT]
+    assert AppSettings(FileSettings(path)).api_id("work") == 12
+
+
+def test_qsettings_compatibility(tmp_path: Path) -> None:
+    """Test the file backend and `QSettings` read the INI files written by each other."""
+
+    def qt_settings(path: Path) -> SettingsBackend:
+        return QSettings(str(path), QSettings.Format.IniFormat)
+
+    for index, (writer_backend, reader_backend) in enumerate(
+        ((qt_settings, FileSettings), (FileSettings, qt_settings))
+    ):
+        path = tmp_path / f"trollogeddon{index}.conf"
+        writer = writer_backend(path)
+        settings = AppSettings(writer)
+        settings.add_account("work")
+        settings.add_account("home")
+        settings.set_retention_ids([1, -2, 3], "work")
+        for value_index, value in enumerate(_ESCAPED_VALUES):
+            writer.setValue(f"escaped/value{value_index}", value)
+        if isinstance(writer, QSettings):
+            writer.sync()
+
+        reader = reader_backend(path)
+        settings = AppSettings(reader)
+        assert settings.accounts() == [DEFAULT_ACCOUNT, "work", "home"]
+        assert settings.retention_ids("work") == [1, -2, 3]
+        assert [reader.value(f"escaped/value{value_index}") for value_index in range(len(_ESCAPED_VALUES))] == (
+            _ESCAPED_VALUES
+        )
+
+
+def test_unquoted_lists(tmp_path: Path) -> None:
+    """Test the unquoted comma separated values, which both backends read as lists, are still parsed."""
+    path = tmp_path / "trollogeddon.conf"
+    path.write_text("[telegram]\naccounts=work, home\n\n[telegram.work]\nretention_ids=1,2\n", encoding="utf-8")
+
+    for backend in (FileSettings(path), QSettings(str(path), QSettings.Format.IniFormat)):
+        settings = AppSettings(backend)
+        assert settings.accounts() == [DEFAULT_ACCOUNT, "work", "home"]
+        assert settings.retention_ids("work") == [1, 2]
@@ -0,0 +1,113 @@
+# Copyright 2023 resurtm@gmail.com
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the "Software"), to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions
+# of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED
+# TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF
+# CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+#
+# https://opensource.org/licenses/MIT
+
+
+"""Contains the live RPC statistics panel class."""
+
+import logging
+from typing import TYPE_CHECKING, Final, List
+
+from lazy_modules import lazy_module
+from PySide6.QtCore import QTimer, Slot
+from PySide6.QtWidgets import (
+    QHeaderView,
+    QLabel,
+    QTableWidget,
+    QTableWidgetItem,
+    QVBoxLayout,
+    QWidget,
+)
+
+if TYPE_CHECKING:
+    import telegram
+else:
+    telegram = lazy_module("telegram")
+
+_LOGGER: Final = logging.getLogger(__name__)
+
+_HEADERS: Final = ["Method", "Calls", "Errors", "Flood Waits", "Flood Wait, s", "Items", "Mean, ms", "p95, ms"]
+# Interval between the panel refreshes, milliseconds.
+_REFRESH_INTERVAL: Final = 1000
+
+
+class StatsPanel(QWidget):
+    """Panel showing the live measurements of the Telegram RPCs issued by the application process."""
+
+    _table: QTableWidget
+    _summary_label: QLabel
+    _timer: QTimer
+
+    def __init__(self, parent=None) -> None:
+        """Construct a new instance of the RPC statistics panel class.
+
+        Args:
+            parent: parent object.
+        """
+        _LOGGER.debug("StatsPanel, constructor, begin")
+        super().__init__(parent)
+
+        self._table = QTableWidget(0, len(_HEADERS), self)
+        self._table.setHorizontalHeaderLabels(_HEADERS)
+        self._table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeMode.ResizeToContents)
+        self._table.verticalHeader().setVisible(False)
+        self._summary_label = QLabel(self)
+
+        layout = QVBoxLayout(self)
+        layout.addWidget(self._summary_label)
+        layout.addWidget(self._table)
+        self.setLayout(layout)
+
+        self._timer = QTimer(self)
+        self._timer.setInterval(_REFRESH_INTERVAL)
+        self._timer.timeout.connect(self.refresh)  # type: ignore
+        self._timer.start()
+        self.refresh()
+
+        _LOGGER.debug("StatsPanel, constructor, end")
+
+    @Slot()
+    def refresh(self) -> None:
+        """Show the current measurements, nothing is done while the panel is hidden."""
+        if not self.isVisible():
+            return
+
+        metrics = telegram.rpc_metrics()
+        limiter = telegram.rate_limiter_state()
+        summary = (
+            f"Sent {metrics.bytes_sent / 1024:.1f} KiB, received {metrics.bytes_received / 1024:.1f} KiB, "
+            f"rate {limiter.rate:.2f} requests/s"
+        )
+        if limiter.in_backoff:
+            summary += f", flood wait {limiter.backoff_remaining:.0f} s left"
+        self._summary_label.setText(summary)
+
+        snapshot = metrics.snapshot()
+        self._table.setRowCount(len(snapshot))
+        for row, (method, stats) in enumerate(snapshot.items()):
+            cells: List[str] = [
+                method,
+                str(stats.count),
+                str(stats.error_count),
+                str(stats.flood_wait_count),
+                f"{stats.flood_wait_seconds:.0f}",
+                str(stats.items),
+                f"{stats.mean_seconds * 1000:.1f}",
+                f"≤ {stats.percentile(95) * 1000:.0f}",
+            ]
+            for column, text in enumerate(cells):
+                self._table.setItem(row, column, QTableWidgetItem(text))
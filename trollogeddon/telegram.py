@@ -18,140 +18,1408 @@
 
 """Telegram API and related routines."""
 
+import asyncio
 import logging
-from typing import Collection, Final, List, Optional
+import math
+import shutil
+import time
+from dataclasses import dataclass, field, replace
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import (
+    Any,
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    Collection,
+    Dict,
+    Final,
+    Iterable,
+    List,
+    Optional,
+    Set,
+    Tuple,
+    TypeVar,
+)
 
-from settings import AppSettings
+from app_logging import ProgressLog
+from archive import MessageArchive
+from cache import Cache, CachedDialog
+from journal import RETENTION_JOB, DeletionJob, DeletionJournal
+from message_filter import MessageFilter
+from metrics import MeteredQueue, RpcMetrics, metered_connection
+from peer_cache import InputPeerCache
+from rate_limiter import RateLimiter, RateLimiterState
+from settings import DEFAULT_ACCOUNT, DEFAULT_DELETE_CONCURRENCY, app_settings, data_dir
 from telethon import TelegramClient  # type: ignore
-from telethon.errors.rpcerrorlist import SessionPasswordNeededError  # type: ignore
+from telethon.errors.rpcerrorlist import (  # type: ignore
+    ChatAdminRequiredError,
+    FloodWaitError,
+    SessionPasswordNeededError,
+)
+from telethon.tl import functions, types  # type: ignore
 from telethon.tl.custom.dialog import Dialog  # type: ignore
 from telethon.tl.custom.message import Message  # type: ignore
 
 # Local logger instance for the current file.
 _LOGGER: Final = logging.getLogger(__name__)
 
-_SESSION_NAME: Final = "trollogeddon"
 _FROM_USER: Final = "me"
 
+# Maximum amount of message IDs which Telegram accepts in a single delete messages request.
+_DELETE_CHUNK_SIZE: Final = 100
+# Amount of messages which Telethon fetches with a single request while iterating over the messages.
+_MESSAGES_PAGE_SIZE: Final = 100
+# Amount of dialogs which Telethon fetches with a single request while iterating over the dialogs.
+_DIALOGS_PAGE_SIZE: Final = 100
+# Chunks queued between the scan and the delete stages of the deletion pipeline per delete stage worker.
+_CHUNKS_QUEUED_PER_WORKER: Final = 2
 
-async def fetch_all_dialogs() -> List[Dialog]:
+# Rate limiter shared by all the Telegram requests issued from this file.
+_RATE_LIMITER: Final = RateLimiter()
+# Measurements of all the Telegram requests issued from this file.
+_METRICS: Final = RpcMetrics()
+
+_T = TypeVar("_T")
+
+
+class DeletionCancelledError(Exception):
+    """Error of the entities which messages deletion was stopped by the cancel token."""
+
+
+class CancelToken:
+    """Stops a deletion job cooperatively.
+
+    Unlike the task cancellation, the chunk which is being deleted is finished and checkpointed before the deletion
+    stops, so the journal stays consistent and the job can be resumed later.
+    """
+
+    def __init__(self, parent: Optional["CancelToken"] = None) -> None:
+        """Construct a new instance of the cancel token, it's not cancelled yet.
+
+        Args:
+            parent: The token is cancelled together with the parent one too, if provided.
+        """
+        self._cancelled = False
+        self._parent = parent
+
+    @property
+    def cancelled(self) -> bool:
+        """Check whether the cancellation was requested.
+
+        Returns:
+            True if the deletion should stop.
+        """
+        return self._cancelled or (self._parent is not None and self._parent.cancelled)
+
+    def cancel(self) -> None:
+        """Request the deletion to stop after the chunks which are in flight."""
+        self._cancelled = True
+
+
+@dataclass(frozen=True)
+class DeletionProgress:
+    """Progress of the messages deletion from a single entity."""
+
+    entity_id: int
+    scanned_count: int
+    deleted_count: int
+    # Messages deleted per second since the entity was started in the current run.
+    rate: float
+    done: bool = False
+
+
+# Called with the entity progress after every deleted chunk and once the entity is done.
+ProgressCallback = Callable[[DeletionProgress], None]
+
+
+class PasswordRequiredError(Exception):
+    """The OTP code was accepted, but the account has a cloud password which has to be provided to sign in."""
+
+
+class ClientManager:
+    """Keeps a single long-lived Telegram client connection which is shared by all the callers.
+
+    The client is created and connected lazily on the first use and is connected again in case the connection was
+    lost. It stays alive until `shutdown` is called, so the callers don't pay for the handshake on every request.
+    The authorization state of the session is cached in memory until then too, it's only asked from Telegram once.
+    The client is rebuilt only when the settings report the API credentials of the current account have changed.
+    """
+
+    def __init__(self) -> None:
+        """Construct a new instance of the client manager."""
+        self._client: Optional[TelegramClient] = None
+        self._lock: Optional[asyncio.Lock] = None
+        self._authorized: Optional[bool] = None
+        self._listening = False
+        self._stale = False
+
+    async def client(self) -> TelegramClient:
+        """Get the shared Telegram client, creating and connecting it if needed.
+
+        Returns:
+            The shared connected Telegram client.
+        """
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            if self._stale and self._client is not None:
+                _LOGGER.debug("ClientManager, credentials changed, disconnect")
+                await self._client.disconnect()
+                self._client = None
+            self._stale = False
+            if self._client is None:
+                if not self._listening:
+                    app_settings().add_credentials_listener(self._credentials_changed)
+                    self._listening = True
+                self._client = _create_client()
+            if not self._client.is_connected():
+                _LOGGER.debug("ClientManager, connect")
+                started_at = time.perf_counter()
+                await self._client.connect()
+                _METRICS.record("connect", time.perf_counter() - started_at)
+            return self._client
+
+    async def is_authorized(self) -> bool:
+        """Check whether the session is authorized, Telegram is asked only if the state isn't cached yet.
+
+        Returns:
+            True if the user is signed in.
+        """
+        if self._authorized is None:
+            client = await self.client()
+            self._authorized = bool(await _call(client.is_user_authorized, "is_user_authorized"))
+        return self._authorized
+
+    def _credentials_changed(self, account: str) -> None:
+        """Mark the client to be rebuilt if the credentials of the current account change, it listens to the settings.
+
+        Args:
+            account: Name of the account which credentials have changed.
+        """
+        if account == _account and self._client is not None:
+            self._stale = True
+            self._authorized = None
+
+    def set_authorized(self) -> None:
+        """Cache the session as authorized, e.g. once the user has signed in."""
+        self._authorized = True
+
+    async def shutdown(self) -> None:
+        """Disconnect and drop the shared Telegram client if there's one, the authorization state is forgotten."""
+        self._authorized = None
+        client, self._client = self._client, None
+        if client is not None:
+            _LOGGER.debug("ClientManager, disconnect")
+            await client.disconnect()
+
+
+class AuthSession:
+    """Sign-in flow of the current account: the OTP code request, its verification and the cloud password check.
+
+    All the steps go over the shared connection of the client manager, the phone code hash and the state of the flow
+    are kept in between, so a cloud password can be provided after the code was accepted without requesting a new
+    code. The authorization state is cached by the client manager once the user has signed in.
+    """
+
+    def __init__(self, phone: str) -> None:
+        """Construct a new instance of the sign-in flow.
+
+        Args:
+            phone: Phone number, e.g. "+49 175 ...".
+        """
+        self.phone = phone
+        self._phone_hash: Optional[str] = None
+        self._code_accepted = False
+
+    @property
+    def password_required(self) -> bool:
+        """Check whether the OTP code was accepted and only the cloud password is left.
+
+        Returns:
+            True if the next `sign_in` call needs the cloud password.
+        """
+        return self._code_accepted
+
+    async def send_code(self) -> bool:
+        """Request the OTP code to be sent to the user, unless the session is authorized already.
+
+        Returns:
+            True if the code was requested, false if the user is signed in already.
+        """
+        _LOGGER.debug("AuthSession, send code, begin")
+
+        if await _CLIENT_MANAGER.is_authorized():
+            _LOGGER.debug("AuthSession, send code, already authorized, end")
+            return False
+        client = await _CLIENT_MANAGER.client()
+        result = await _call(lambda: client.send_code_request(phone=self.phone, force_sms=True), "send_code_request")
+        self._phone_hash = result.phone_code_hash
+        self._code_accepted = False
+
+        _LOGGER.debug("AuthSession, send code, end")
+        return True
+
+    async def sign_in(self, otp_code: str, password: Optional[str] = None) -> None:
+        """Sign in with the OTP code, and the cloud password if the account has one.
+
+        The code is sent only once: if the password is missing, the next call only sends the password.
+
+        Args:
+            otp_code: OTP code which was sent to the user.
+            password: Cloud password of the user, if it's set.
+
+        Raises:
+            PasswordRequiredError: The code was accepted, but the cloud password is not provided.
+            RuntimeError: The OTP code wasn't requested.
+        """
+        _LOGGER.debug("AuthSession, sign in, begin")
+
+        if await _CLIENT_MANAGER.is_authorized():
+            _LOGGER.debug("AuthSession, sign in, already authorized, end")
+            return
+        client = await _CLIENT_MANAGER.client()
+        if not self._code_accepted:
+            if self._phone_hash is None:
+                raise RuntimeError("The OTP code wasn't requested")
+            phone_hash = self._phone_hash
+            try:
+                await _call(
+                    lambda: client.sign_in(phone=self.phone, code=otp_code, phone_code_hash=phone_hash), "sign_in"
+                )
+            except SessionPasswordNeededError:
+                _LOGGER.debug("AuthSession, sign in, cloud password needed")
+                self._code_accepted = True
+        if self._code_accepted:
+            if not password:
+                raise PasswordRequiredError("The account has a cloud password, provide it to sign in")
+            await _call(lambda: client.sign_in(password=password), "sign_in")
+        _CLIENT_MANAGER.set_authorized()
+
+        _LOGGER.debug("AuthSession, sign in, end")
+
+
+# Account used by this process, it names the session, the cache and the journal files.
+_account: str = DEFAULT_ACCOUNT
+# Process-wide manager of the Telegram client connection.
+_CLIENT_MANAGER: Final = ClientManager()
+# Process-wide cache of the dialogs and own message IDs, opened lazily by `_cache`.
+_cache_instance: Optional[Cache] = None
+# Process-wide journal of the deletion jobs, opened lazily by `_journal`.
+_journal_instance: Optional[DeletionJournal] = None
+# Input peers of the dialogs of the current account, backed by the cache, created lazily.
+_peers_instance: Optional[InputPeerCache] = None
+
+
+@dataclass
+class DeletionResult:
+    """Outcome of the messages deletion from a single entity."""
+
+    deleted_count: int = 0
+    error: Optional[Exception] = None
+
+
+@dataclass
+class CountResult:
+    """Amount of the user's messages in a single entity, counted without deleting anything."""
+
+    message_count: int = 0
+    error: Optional[Exception] = None
+
+
+# Called with the entity ID and its count result as soon as the entity is counted.
+CountCallback = Callable[[int, CountResult], None]
+
+
+# Deletes a chunk of message IDs from an entity with a single request: client, input peer or entity ID, message IDs.
+_ChunkDeleter = Callable[[TelegramClient, Any, List[int]], Awaitable[Any]]
+# Deletes a part of the whole history of an entity with a single request: client, input peer or entity ID. Returns
+# the affected history, which offset is positive until the whole history is deleted.
+_HistoryDeleter = Callable[[TelegramClient, Any], Awaitable[Any]]
+
+
+@dataclass(frozen=True)
+class _DeletionStrategy:
+    """Telegram requests used to delete the messages of a single entity type."""
+
+    # Name of the chunk deletion request in the RPC metrics.
+    chunk_method: str
+    delete_chunk: _ChunkDeleter
+    # Name of the whole history deletion request in the RPC metrics.
+    history_method: str = ""
+    delete_history: Optional[_HistoryDeleter] = None
+
+
+# Message IDs of the channels & supergroups are per channel, so their messages are deleted with the channel request.
+# It always deletes them for everyone, and the whole history of the own messages can be deleted by the admins.
+_CHANNEL_STRATEGY: Final = _DeletionStrategy(
+    chunk_method="channels.deleteMessages",
+    delete_chunk=lambda client, peer, message_ids: client(
+        functions.channels.DeleteMessagesRequest(channel=peer, id=message_ids)
+    ),
+    history_method="channels.deleteParticipantHistory",
+    delete_history=lambda client, peer: client(
+        functions.channels.DeleteParticipantHistoryRequest(channel=peer, participant=types.InputPeerSelf())
+    ),
+)
+# Message IDs of the private chats & basic groups are per account, so their messages are deleted without resolving
+# the peer. The revoke flag deletes them for everyone, not only for the user.
+_REVOKE_STRATEGY: Final = _DeletionStrategy(
+    chunk_method="messages.deleteMessages",
+    delete_chunk=lambda client, peer, message_ids: client(
+        functions.messages.DeleteMessagesRequest(id=message_ids, revoke=True)
+    ),
+)
+# Whole history of a private chat is deleted for both sides with a single revoking request.
+_PRIVATE_CHAT_STRATEGY: Final = replace(
+    _REVOKE_STRATEGY,
+    history_method="messages.deleteHistory",
+    delete_history=lambda client, peer: client(
+        functions.messages.DeleteHistoryRequest(peer=peer, max_id=0, revoke=True)
+    ),
+)
+# Entities of the unknown type, e.g. the ones which aren't cached, are dispatched by Telethon after resolving them.
+_GENERIC_STRATEGY: Final = _DeletionStrategy(
+    chunk_method="delete_messages",
+    delete_chunk=lambda client, peer, message_ids: client.delete_messages(peer, message_ids),
+)
+# Deletion strategies by the entity class names shown in the "Entity Type" column.
+_DELETION_STRATEGIES: Final = {
+    "Channel": _CHANNEL_STRATEGY,
+    "Chat": _REVOKE_STRATEGY,
+    "User": _PRIVATE_CHAT_STRATEGY,
+}
+
+
+@dataclass
+class _EntityDeletion:
+    """Deletion of a single entity in flight, shared by its scan stage task and the delete stage workers."""
+
+    entity_id: int
+    strategy: _DeletionStrategy
+    # Called with the amount of the messages of every deleted chunk.
+    add_deleted: Callable[[int], None]
+    # Error of the first failed chunk, the scan stage stops then.
+    error: Optional[Exception] = None
+    # Set once the scan stage failed or was stopped, the queued chunks of the entity are skipped then.
+    abandoned: bool = False
+    queued_count: int = 0
+    drained: asyncio.Event = field(default_factory=asyncio.Event)
+
+    def chunk_done(self) -> None:
+        """Mark a queued chunk of the entity as handled by the delete stage, either deleted, failed or skipped."""
+        self.queued_count -= 1
+        if self.queued_count == 0:
+            self.drained.set()
+
+
+# Message IDs of an entity queued for the delete stage of the deletion pipeline.
+_QueuedChunk = Tuple[_EntityDeletion, List[int]]
+
+
+# Cancel tokens of the work bound to the current account, they are cancelled once another account is used.
+_account_tokens: List[CancelToken] = []
+
+
+def current_account() -> str:
+    """Get the account used by this process.
+
+    Returns:
+        Name of the account.
+    """
+    return _account
+
+
+async def use_account(account: str) -> None:
+    """Switch this process to another account, the current client, cache and journal are closed if it changes.
+
+    Args:
+        account: Name of the account.
+    """
+    global _account
+    if account == _account:
+        return
+    _LOGGER.debug("Use account, %s", account)
+    for token in _account_tokens:
+        token.cancel()
+    await shutdown()
+    _account = account
+
+
+async def fetch_all_dialogs(resync: bool = False) -> List[CachedDialog]:
     """Fetch all the chats and dialogs of the user.
 
+    Args:
+        resync: Fetch the dialogs from Telegram even if they are cached already.
+
     Returns:
         List with all the chats and dialogs of the user.
     """
     _LOGGER.debug("Fetch all dialogs, begin")
 
-    client = _create_client()
-    await client.connect()
-
-    dialogs = await client.get_dialogs()
-    await client.disconnect()
+    dialogs: List[CachedDialog] = []
+    async for page in iter_dialogs_pages(resync=resync):
+        dialogs.extend(page)
 
     _LOGGER.debug("Fetch all dialogs, end")
     return dialogs
 
 
-async def delete_messages(entity_ids: Collection[int]) -> None:
+async def iter_dialogs_pages(
+    page_size: int = _DIALOGS_PAGE_SIZE, resync: bool = False
+) -> AsyncIterator[List[CachedDialog]]:
+    """Fetch the chats and dialogs of the user page by page.
+
+    The cached dialogs are yielded if there are any. Otherwise the dialogs are fetched from Telegram one request at a
+    time through the rate limiter, every request continues after the last dialog of the previous one, so a flood wait
+    only retries the failed request. The cache is replaced only once all the dialogs were fetched.
+
+    Args:
+        page_size: Maximum amount of dialogs in a single page.
+        resync: Fetch the dialogs from Telegram even if they are cached already.
+
+    Yields:
+        Lists with the next chats and dialogs of the user.
+    """
+    _LOGGER.debug("Iterate dialogs pages, begin, resync: %s", resync)
+
+    cached = [] if resync else _cache().dialogs()
+    if cached:
+        for index in range(0, len(cached), page_size):
+            yield cached[index : index + page_size]
+        _LOGGER.debug("Iterate dialogs pages, end, cached dialogs: %d", len(cached))
+        return
+
+    client = await _CLIENT_MANAGER.client()
+    offset: Dict[str, Any] = {}
+
+    async def next_dialogs() -> List[Dialog]:
+        return [dialog async for dialog in client.iter_dialogs(limit=_DIALOGS_PAGE_SIZE, **offset)]
+
+    fetched: List[CachedDialog] = []
+    peers: Dict[int, Any] = {}
+    seen: Set[int] = set()
+    page: List[CachedDialog] = []
+    while True:
+        dialogs = await _call(next_dialogs, "iter_dialogs")
+        for dialog in dialogs:
+            # The dialogs which got a new message during the paging may come again.
+            if dialog.entity.id in seen:
+                continue
+            seen.add(dialog.entity.id)
+            page.append(CachedDialog(dialog.entity.id, dialog.name, dialog.entity.__class__.__name__))
+            if dialog.input_entity is not None:
+                peers[dialog.entity.id] = dialog.input_entity
+            if len(page) == page_size:
+                fetched.extend(page)
+                yield page
+                page = []
+        if len(dialogs) < _DIALOGS_PAGE_SIZE:
+            break
+        last = dialogs[-1]
+        offset.update(
+            offset_date=last.date,
+            offset_id=last.message.id if last.message is not None else 0,
+            offset_peer=last.input_entity,
+        )
+    if page:
+        fetched.extend(page)
+        yield page
+
+    _cache().replace_dialogs(fetched)
+    _peers().replace(peers)
+    _LOGGER.debug("Iterate dialogs pages, end, dialogs: %d", len(fetched))
+
+
+async def count_messages(
+    entity_ids: Collection[int],
+    concurrency: int = DEFAULT_DELETE_CONCURRENCY,
+    message_filter: Optional[MessageFilter] = None,
+    on_count: Optional[CountCallback] = None,
+) -> Dict[int, CountResult]:
+    """Count the user's messages which would be deleted from the provided entity IDs, without deleting them.
+
+    Every entity is counted with a single `limit=0` request which only returns the total count of the matching
+    messages, no messages are transferred, see `_count_entity_messages` for the accuracy of the counts.
+
+    Args:
+        entity_ids: Entity IDs to be used to count the messages of.
+        concurrency: Maximum amount of entities which messages are being counted at the same time.
+        message_filter: Filter of the messages to be counted, all the user's messages if not provided.
+        on_count: Called as soon as every entity is counted if provided.
+
+    Returns:
+        Count results mapped by entity IDs.
+    """
+    _LOGGER.debug("Count messages, begin, entities: %d", len(entity_ids))
+
+    message_filter = message_filter or MessageFilter()
+    client = await _CLIENT_MANAGER.client()
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+    results = {entity_id: CountResult() for entity_id in entity_ids}
+
+    async def count_isolated(entity_id: int) -> None:
+        result = results[entity_id]
+        async with semaphore:
+            try:
+                result.message_count = await _count_entity_messages(entity_id, client, message_filter)
+            except Exception as error:
+                _LOGGER.exception("Count messages, %d, failed", entity_id)
+                result.error = error
+        if on_count is not None:
+            on_count(entity_id, result)
+
+    await asyncio.gather(*(count_isolated(entity_id) for entity_id in results))
+
+    _LOGGER.debug("Count messages, end")
+    return results
+
+
+def estimate_deletion_seconds(message_counts: Iterable[int]) -> float:
+    """Estimate how long the deletion of the counted messages would take at the current rate limiter throughput.
+
+    Every page of the messages needs one request to be found and one more to be deleted, and all the requests share
+    the rate limiter, so the estimate doesn't depend on the deletion concurrency.
+
+    Args:
+        message_counts: Amounts of the messages to be deleted, one per entity.
+
+    Returns:
+        Estimated duration of the deletion in seconds.
+    """
+    requests = sum(
+        math.ceil(count / _MESSAGES_PAGE_SIZE) + math.ceil(count / _DELETE_CHUNK_SIZE) for count in message_counts
+    )
+    state = _RATE_LIMITER.state()
+    return state.backoff_remaining + requests / state.rate
+
+
+async def delete_messages(
+    entity_ids: Collection[int],
+    concurrency: int = DEFAULT_DELETE_CONCURRENCY,
+    message_filter: Optional[MessageFilter] = None,
+    progress: Optional[ProgressCallback] = None,
+    cancel_token: Optional[CancelToken] = None,
+    archive_path: str = "",
+    delete_workers: Optional[int] = None,
+) -> Dict[int, DeletionResult]:
     """Delete Telegram messages from the provided entity IDs.
 
+    The deletion runs as a new job of the journal, so it can be resumed with `resume_deletion` if it's interrupted.
+
     Args:
         entity_ids: Collection with entity IDs to be used to delete the messages from.
+        concurrency: Maximum amount of entities which messages are being scanned at the same time.
+        message_filter: Deletes only the matching messages if provided, otherwise all the user's messages.
+        progress: Called after every deleted chunk if provided.
+        cancel_token: Stops the deletion if provided and cancelled, the stopped entities fail with
+            `DeletionCancelledError`.
+        archive_path: Appends every message to the archive at the path before it's deleted, if provided. The messages
+            are archived in the same history pass which finds them for the deletion.
+        delete_workers: Maximum amount of chunks deleted at the same time, `concurrency` if not provided.
+
+    Returns:
+        Deletion results mapped by entity IDs.
     """
     _LOGGER.debug("Delete messages, all, begin")
 
-    client = _create_client()
-    await client.connect()
+    client = await _CLIENT_MANAGER.client()
+    filters = message_filter.to_dict() if message_filter is not None and message_filter != MessageFilter() else {}
+    job = _journal().start_job(entity_ids, filters, archive_path)
+    results = await _delete_messages_internal(
+        job=job,
+        client=client,
+        concurrency=concurrency,
+        delete_workers=delete_workers,
+        progress=progress,
+        cancel_token=cancel_token,
+    )
+
+    _LOGGER.debug("Delete messages, all, end")
+    return results
+
+
+def unfinished_deletion() -> Optional[DeletionJob]:
+    """Get the latest deletion job which was interrupted or had failed entities.
+
+    Returns:
+        The latest unfinished deletion job or `None` if there's none.
+    """
+    return _journal().unfinished_job()
+
+
+async def resume_deletion(
+    concurrency: int = DEFAULT_DELETE_CONCURRENCY,
+    progress: Optional[ProgressCallback] = None,
+    cancel_token: Optional[CancelToken] = None,
+    delete_workers: Optional[int] = None,
+) -> Dict[int, DeletionResult]:
+    """Resume the latest unfinished deletion job from its checkpoints.
+
+    The messages of the job are archived again if it was archiving, the last chunks of an entity which were archived
+    but not deleted before the interruption are archived twice then.
+
+    Args:
+        concurrency: Maximum amount of entities which messages are being scanned at the same time.
+        progress: Called after every deleted chunk if provided.
+        cancel_token: Stops the deletion if provided and cancelled.
+        delete_workers: Maximum amount of chunks deleted at the same time, `concurrency` if not provided.
+
+    Returns:
+        Deletion results mapped by entity IDs, empty if there's no job to resume.
+    """
+    _LOGGER.debug("Resume deletion, begin")
+
+    job = _journal().unfinished_job()
+    if job is None:
+        _LOGGER.debug("Resume deletion, nothing to resume, end")
+        return {}
+
+    client = await _CLIENT_MANAGER.client()
+    results = await _delete_messages_internal(
+        job=job,
+        client=client,
+        concurrency=concurrency,
+        delete_workers=delete_workers,
+        progress=progress,
+        cancel_token=cancel_token,
+    )
 
+    _LOGGER.debug("Resume deletion, end")
+    return results
+
+
+async def enforce_retention(
+    entity_ids: Collection[int],
+    retention: timedelta,
+    concurrency: int = DEFAULT_DELETE_CONCURRENCY,
+    now: Optional[datetime] = None,
+    progress: Optional[ProgressCallback] = None,
+    cancel_token: Optional[CancelToken] = None,
+) -> Dict[int, DeletionResult]:
+    """Run a single incremental retention pass, deleting the user's messages older than the retention period.
+
+    Everything older than the boundary of the last successful pass of an entity was deleted already, so the pass only
+    scans the messages which crossed the boundary since then, i.e. between the old and the new boundaries. The new
+    boundary is checkpointed in the cache for the entities which succeeded, the failed ones are rescanned from their
+    old checkpoints on the next pass. The pass is bound to the current account: it's cancelled if another account is
+    used meanwhile, and nothing is checkpointed into the cache of the other account then.
+
+    Args:
+        entity_ids: Collection with entity IDs to be used to delete the messages from.
+        retention: Age of the messages which are kept.
+        concurrency: Maximum amount of entities which messages are being deleted from at the same time.
+        now: Current time the boundary is computed from, the current UTC time if not provided.
+        progress: Called after every deleted chunk if provided.
+        cancel_token: Stops the pass if provided and cancelled.
+
+    Returns:
+        Deletion results mapped by entity IDs, entities with nothing crossed the boundary have empty results.
+    """
+    boundary = (now if now is not None else datetime.now(timezone.utc)) - retention
+    _LOGGER.debug("Enforce retention, begin, boundary: %s", boundary)
+
+    # Entities which share the checkpoint are deleted with a single job, usually that's all of them.
+    checkpoints: Dict[Optional[datetime], List[int]] = {}
+    for entity_id in entity_ids:
+        checkpoints.setdefault(_cache().retention_checkpoint(entity_id), []).append(entity_id)
+
+    account = _account
+    pass_token = CancelToken(cancel_token)
+    _account_tokens.append(pass_token)
+    results: Dict[int, DeletionResult] = {}
     try:
-        await _delete_messages_internal(entity_ids=entity_ids, client=client)
+        for checkpoint, checkpoint_ids in checkpoints.items():
+            if checkpoint is not None and checkpoint >= boundary:
+                results.update((entity_id, DeletionResult()) for entity_id in checkpoint_ids)
+                continue
+            if pass_token.cancelled:
+                results.update(
+                    (entity_id, DeletionResult(error=DeletionCancelledError())) for entity_id in checkpoint_ids
+                )
+                continue
+            # The pass runs as a retention job, so it doesn't abandon the user's unfinished deletion job and it isn't
+            # offered for the resumption itself.
+            job = _journal().start_job(
+                checkpoint_ids, MessageFilter(min_date=checkpoint, max_date=boundary).to_dict(), kind=RETENTION_JOB
+            )
+            checkpoint_results = await _delete_messages_internal(
+                job=job,
+                client=await _CLIENT_MANAGER.client(),
+                concurrency=concurrency,
+                progress=progress,
+                cancel_token=pass_token,
+            )
+            # The cache belongs to another account once it's switched, the entities are rescanned on the next pass.
+            if _account == account:
+                for entity_id, result in checkpoint_results.items():
+                    if result.error is None:
+                        _cache().set_retention_checkpoint(entity_id, boundary)
+            results.update(checkpoint_results)
     finally:
-        await client.disconnect()
+        _account_tokens.remove(pass_token)
+
+    _LOGGER.debug("Enforce retention, end")
+    return results
 
-    _LOGGER.debug("Delete messages, all, end")
 
+async def _delete_messages_internal(
+    job: DeletionJob,
+    client: TelegramClient,
+    concurrency: int,
+    delete_workers: Optional[int] = None,
+    progress: Optional[ProgressCallback] = None,
+    cancel_token: Optional[CancelToken] = None,
+) -> Dict[int, DeletionResult]:
+    """Delete Telegram messages from the entities of the job. Internal implementation.
 
-async def _delete_messages_internal(entity_ids: Collection[int], client: TelegramClient) -> None:
-    """Delete Telegram messages from the provided entity IDs. Internal implementation.
+    The deletion is a pipeline of two stages connected by a bounded queue of message ID chunks. The scan stage pages
+    through the messages of every entity in its own task over the shared client, at most `concurrency` entities at a
+    time, and queues their IDs. The messages are filtered by Telegram and archived while they are scanned. The delete
+    stage workers delete the queued chunks, at most `delete_workers` of them at a time, so the scans don't wait for the
+    deletions. A full queue holds the scans back until the workers catch up.
+
+    A failure in one entity is recorded in its result and does not abort the other entities. The entities which are
+    done already are skipped, the job is finished once all of its entities are done.
 
     Args:
-        entity_ids: Collection with entity IDs to be used to delete the messages from.
+        job: Deletion job with the entities to be used to delete the messages from.
         client: Telegram client which is already connected to be used to delete the messages.
+        concurrency: Maximum amount of entities which messages are being scanned at the same time.
+        delete_workers: Maximum amount of chunks deleted at the same time, `concurrency` if not provided.
+        progress: Called after every deleted chunk if provided.
+        cancel_token: Stops the deletion if provided and cancelled.
+
+    Returns:
+        Deletion results mapped by entity IDs.
     """
-    _LOGGER.debug("Delete messages, all internal, begin")
-    for entity_id in entity_ids:
-        _LOGGER.debug("Delete messages, %d, begin", entity_id)
+    workers = max(1, delete_workers if delete_workers is not None else concurrency)
+    _LOGGER.debug(
+        "Delete messages, all internal, begin, job: %d, concurrency: %d, workers: %d", job.job_id, concurrency, workers
+    )
+
+    scan_slots = asyncio.Semaphore(max(1, concurrency))
+    chunks: MeteredQueue[_QueuedChunk] = MeteredQueue("delete_chunks", workers * _CHUNKS_QUEUED_PER_WORKER, _METRICS)
+    journal = _journal()
+    message_filter = MessageFilter.from_dict(job.filters)
+    # Progress is logged in aggregate, every chunk is too frequent for a log line.
+    progress_log = ProgressLog(_LOGGER, f"Delete messages, job {job.job_id}")
+    deleted_counts = {entity_id: checkpoint.deleted_count for entity_id, checkpoint in job.entities.items()}
+    entity_types = {dialog.entity_id: dialog.entity_type for dialog in _cache().dialogs()}
+    archive = MessageArchive(job.archive_path) if job.archive_path else None
+
+    def report(event: DeletionProgress) -> None:
+        progress_log.add(event.deleted_count - deleted_counts[event.entity_id])
+        deleted_counts[event.entity_id] = event.deleted_count
+        if progress is not None:
+            progress(event)
 
-        message: Message
-        async for message in client.iter_messages(entity=entity_id, from_user=_FROM_USER):
-            _LOGGER.debug("Delete message, %d, %s, begin", entity_id, message.id)
-            await message.delete()
-            _LOGGER.debug("Delete message, %d, %s, end", entity_id, message.id)
+    async def delete_isolated(entity_id: int) -> DeletionResult:
+        checkpoint = job.entities[entity_id]
+        result = DeletionResult(deleted_count=checkpoint.deleted_count)
+        if checkpoint.done:
+            return result
+        try:
+            await _delete_entity_messages(
+                entity_id=entity_id,
+                client=client,
+                result=result,
+                scan_slots=scan_slots,
+                chunks=chunks,
+                message_filter=message_filter,
+                strategy=_DELETION_STRATEGIES.get(entity_types.get(entity_id, ""), _GENERIC_STRATEGY),
+                archive=archive,
+                progress=report,
+                cancel_token=cancel_token,
+            )
+            journal.finish_entity(job.job_id, entity_id)
+        except DeletionCancelledError as error:
+            _LOGGER.debug("Delete messages, %d, cancelled", entity_id)
+            result.error = error
+        except Exception as error:
+            _LOGGER.exception("Delete messages, %d, failed", entity_id)
+            result.error = error
+        return result
+
+    entity_ids = list(job.entities)
+    delete_tasks = [
+        asyncio.ensure_future(_delete_stage(chunks, client, job.job_id, archive, cancel_token)) for _ in range(workers)
+    ]
+    try:
+        results = dict(zip(entity_ids, await asyncio.gather(*(delete_isolated(entity_id) for entity_id in entity_ids))))
+    finally:
+        # Every entity waits for its queued chunks, so the workers are idle by now.
+        for task in delete_tasks:
+            task.cancel()
+        await asyncio.gather(*delete_tasks, return_exceptions=True)
+        if archive is not None:
+            archive.close()
+    progress_log.flush()
+    if all(result.error is None for result in results.values()):
+        journal.finish_job(job.job_id)
 
-        _LOGGER.debug("Delete messages, %d, end", entity_id)
     _LOGGER.debug("Delete messages, all internal, end")
+    return results
+
+
+async def _delete_stage(
+    chunks: MeteredQueue[_QueuedChunk],
+    client: TelegramClient,
+    job_id: int,
+    archive: Optional[MessageArchive],
+    cancel_token: Optional[CancelToken],
+) -> None:
+    """Delete the queued chunks one by one, a worker of the delete stage of the deletion pipeline.
+
+    The chunks of the failed and the abandoned entities are skipped, all of them are skipped after the cancellation.
+    The failed chunk fails its entity, the worker keeps going with the chunks of the other entities.
+
+    Args:
+        chunks: Queue of the chunks filled by the scan stage.
+        client: Telegram client which is already connected to be used to delete the messages.
+        job_id: ID of the deletion job which checkpoints every deleted chunk.
+        archive: Archive the messages of the chunks were written to, if they are archived.
+        cancel_token: Stops the deletion if provided and cancelled.
+    """
+    while True:
+        entity, message_ids = await chunks.get()
+        try:
+            if (
+                entity.error is None
+                and not entity.abandoned
+                and not (cancel_token is not None and cancel_token.cancelled)
+            ):
+                deleted_count = await _delete_chunk(
+                    entity_id=entity.entity_id,
+                    message_ids=message_ids,
+                    client=client,
+                    job_id=job_id,
+                    strategy=entity.strategy,
+                    archive=archive,
+                )
+                entity.add_deleted(deleted_count)
+        except Exception as error:
+            _LOGGER.debug("Delete messages, %d, chunk failed: %r", entity.entity_id, error)
+            if entity.error is None:
+                entity.error = error
+        finally:
+            entity.chunk_done()
+
+
+async def _delete_entity_messages(
+    entity_id: int,
+    client: TelegramClient,
+    result: DeletionResult,
+    scan_slots: asyncio.Semaphore,
+    chunks: MeteredQueue[_QueuedChunk],
+    message_filter: MessageFilter,
+    strategy: _DeletionStrategy = _GENERIC_STRATEGY,
+    archive: Optional[MessageArchive] = None,
+    progress: Optional[ProgressCallback] = None,
+    cancel_token: Optional[CancelToken] = None,
+) -> None:
+    """Delete the user's messages from a single entity, the scan stage of the deletion pipeline.
+
+    If the whole history deletion is requested, nothing is filtered, nothing is archived and the entity type allows
+    it, the history is deleted with the whole history requests, falling back to the message by message deletion if
+    the user isn't allowed to do it. Otherwise message IDs are collected from the own message IDs source, or from the
+    filtered search if there's a filter, into chunks of `_DELETE_CHUNK_SIZE` items which are queued for the delete
+    stage. The scan slot is held while scanning only, then the entity waits for its queued chunks. The cancel token
+    is checked for every message, the chunks in flight are finished on cancellation and the queued ones are skipped.
+
+    Args:
+        entity_id: Entity ID to be used to delete the messages from.
+        client: Telegram client which is already connected to be used to delete the messages.
+        result: Deletion result of the entity, updated after every deleted chunk.
+        scan_slots: Limits the amount of entities which messages are being scanned at the same time.
+        chunks: Queue of the chunks drained by the delete stage workers.
+        message_filter: Filter of the messages to be deleted, all the user's messages if it's empty.
+        strategy: Telegram requests used to delete the messages of the entity type.
+        archive: Archive every message is written to before it's deleted if provided. The cache is bypassed then,
+            since it doesn't keep the messages themselves.
+        progress: Called after every deleted chunk and once the entity is done, if provided.
+        cancel_token: Stops the deletion if provided and cancelled.
+
+    Raises:
+        DeletionCancelledError: The deletion was stopped by the cancel token.
+    """
+    _LOGGER.debug("Delete messages, %d, begin", entity_id)
+
+    started_at = time.perf_counter()
+    initial_count = result.deleted_count
+    scanned_count = 0
+
+    def report(done: bool = False) -> None:
+        if progress is None:
+            return
+        elapsed = time.perf_counter() - started_at
+        rate = (result.deleted_count - initial_count) / elapsed if elapsed > 0 else 0.0
+        progress(DeletionProgress(entity_id, scanned_count, result.deleted_count, rate, done))
+
+    def add_deleted(count: int) -> None:
+        result.deleted_count += count
+        report()
+
+    def cancelled() -> bool:
+        return cancel_token is not None and cancel_token.cancelled
+
+    entity = _EntityDeletion(entity_id=entity_id, strategy=strategy, add_deleted=add_deleted)
+
+    async def queue_chunk(message_ids: List[int]) -> None:
+        await chunks.put((entity, message_ids))
+        entity.queued_count += 1
+        entity.drained.clear()
+
+    try:
+        async with scan_slots:
+            if cancelled():
+                raise DeletionCancelledError()
+            if (
+                message_filter.whole_history
+                and message_filter.is_empty
+                and archive is None
+                and strategy.delete_history is not None
+            ):
+                try:
+                    add_deleted(
+                        await _delete_history(
+                            entity_id=entity_id,
+                            client=client,
+                            delete_history=strategy.delete_history,
+                            method=strategy.history_method,
+                        )
+                    )
+                    report(done=True)
+                    _LOGGER.debug(
+                        "Delete messages, %d, end, whole history deleted: %d", entity_id, result.deleted_count
+                    )
+                    return
+                except ChatAdminRequiredError:
+                    _LOGGER.debug(
+                        "Delete messages, %d, whole history not allowed, deleting message by message", entity_id
+                    )
+
+            chunk: List[int] = []
+            if message_filter.is_empty and archive is None:
+                message_ids = _own_message_ids(entity_id=entity_id, client=client)
+            else:
+                message_ids = _filtered_message_ids(
+                    entity_id=entity_id, client=client, message_filter=message_filter, archive=archive
+                )
+            async for message_id in message_ids:
+                if entity.error is not None or cancelled():
+                    break
+                scanned_count += 1
+                chunk.append(message_id)
+                if len(chunk) == _DELETE_CHUNK_SIZE:
+                    await queue_chunk(chunk)
+                    chunk = []
+            if chunk and entity.error is None and not cancelled():
+                await queue_chunk(chunk)
+    except BaseException:
+        entity.abandoned = True
+        raise
+    finally:
+        if entity.queued_count:
+            await entity.drained.wait()
+
+    if entity.error is not None:
+        raise entity.error
+    if cancelled():
+        raise DeletionCancelledError()
+    report(done=True)
+    _LOGGER.debug("Delete messages, %d, end, deleted: %d", entity_id, result.deleted_count)
+
+
+async def _count_entity_messages(entity_id: int, client: TelegramClient, message_filter: MessageFilter) -> int:
+    """Count the user's messages of a single entity which match the filter with the total count requests.
+
+    The lower date bound is applied by subtracting the count of the messages older than the bound. The count is an
+    upper bound in the private chats, where Telegram ignores the sender and counts the messages of both sides, and
+    when the message ID bounds are set, since Telethon applies them locally while iterating.
+
+    Args:
+        entity_id: Entity ID to be used to count the messages of.
+        client: Telegram client which is already connected.
+        message_filter: Filter of the messages.
+
+    Returns:
+        Amount of the matching messages.
+    """
+    peer = _input_peer(entity_id)
+    params = message_filter.iter_messages_params()
+    params.pop("min_id", None)
+    params.pop("max_id", None)
+
+    async def total(**extra: Any) -> int:
+        request_params = {**params, **extra}
+        messages = await _call(
+            lambda: client.get_messages(peer, limit=0, from_user=_FROM_USER, **request_params), "count_messages"
+        )
+        return messages.total
 
+    count = await total()
+    if message_filter.min_date is not None:
+        count -= await total(offset_date=message_filter.min_date)
+    return max(0, count)
 
-async def send_otp_code(phone: str) -> Optional[str]:
-    """Request a one time used OTP code to be sent to the user.
+
+async def _delete_chunk(
+    entity_id: int,
+    message_ids: List[int],
+    client: TelegramClient,
+    job_id: int,
+    strategy: _DeletionStrategy = _GENERIC_STRATEGY,
+    archive: Optional[MessageArchive] = None,
+) -> int:
+    """Delete a single chunk of messages with one bulk delete request and checkpoint it.
+
+    The archive is flushed first, so no message is deleted before it's written out. The IDs are dropped from the
+    cache and the job progress is written to the journal.
+
+    Args:
+        entity_id: Entity ID to be used to delete the messages from.
+        message_ids: IDs of the messages to be deleted, at most `_DELETE_CHUNK_SIZE` items.
+        client: Telegram client which is already connected to be used to delete the messages.
+        job_id: ID of the deletion job the chunk belongs to.
+        strategy: Telegram requests used to delete the messages of the entity type.
+        archive: Archive the messages of the chunk were written to, if they are archived.
 
     Returns:
-        The resulting phone code cash which was returned by the Telegram API.
-        None value is returned in case the user was already authorized (i.e. there's no need in OTP code).
+        Amount of the deleted messages.
     """
-    _LOGGER.debug("Send OTP code, begin")
+    if archive is not None:
+        archive.flush()
+    peer = _input_peer(entity_id)
+    await _call(lambda: strategy.delete_chunk(client, peer, message_ids), strategy.chunk_method, len(message_ids))
+    _cache().remove_message_ids(entity_id, message_ids)
+    _journal().record_chunk(job_id, entity_id, message_ids)
+    return len(message_ids)
+
 
-    client = _create_client()
-    await client.connect()
+async def _delete_history(entity_id: int, client: TelegramClient, delete_history: _HistoryDeleter, method: str) -> int:
+    """Delete the whole history of a single entity, repeating the request until Telegram reports nothing is left.
 
-    if await client.is_user_authorized():
-        await client.disconnect()
-        _LOGGER.debug("Send OTP code, already authorized, end")
-        return None
+    The cached message IDs of the entity are dropped, there's nothing to checkpoint since the entity is done at once.
 
-    result = await client.send_code_request(phone=phone, force_sms=True)
-    await client.disconnect()
+    Args:
+        entity_id: Entity ID to be used to delete the history of.
+        client: Telegram client which is already connected to be used to delete the history.
+        delete_history: Deletes a part of the whole history of the entity type.
+        method: Name of the whole history deletion request in the RPC metrics.
 
-    _LOGGER.debug("Send OTP code, code requested, end")
-    return result.phone_code_hash
+    Returns:
+        Amount of the deleted messages reported by Telegram.
+    """
+    peer = _input_peer(entity_id)
+    deleted_count = 0
+    while True:
+        affected = await _call(lambda: delete_history(client, peer), method)
+        deleted_count += affected.pts_count
+        if affected.offset <= 0:
+            break
+    cache = _cache()
+    cache.remove_message_ids(entity_id, cache.message_ids(entity_id))
+    return deleted_count
 
 
-async def verify_otp_code(phone: str, otp_code: str, phone_hash: str, password: Optional[str] = None) -> None:
-    """Verify the OTP code which was received by the user after requesting it.
+async def _own_message_ids(entity_id: int, client: TelegramClient) -> AsyncIterator[int]:
+    """Iterate over the user's own message IDs of a single entity, reading the cache first.
+
+    The cached IDs are yielded first. Then only the messages newer than the cache watermark are scanned; every page
+    of them is stored in the cache, moving the watermark, before its IDs are yielded.
 
     Args:
-         phone: phone number (e.g. "+49 175 ...").
-         otp_code: the OTP code to be verified.
-         phone_hash: phone hash which was returned in the Telegram API response.
-         password: user's cloud password. Don't provide it or use the `None` value if it's not used by the user.
+        entity_id: Entity ID to be used to iterate over the message IDs of.
+        client: Telegram client which is already connected.
+
+    Yields:
+        The user's own message IDs of the entity.
     """
-    _LOGGER.debug("Verify OTP code, begin")
+    cache = _cache()
+    for message_id in cache.message_ids(entity_id):
+        yield message_id
 
-    client = _create_client()
-    await client.connect()
+    page: List[int] = []
+    message: Message
+    params = {"min_id": cache.watermark(entity_id), "reverse": True}
+    async for message in _iter_messages(entity_id=entity_id, client=client, params=params, resume_key="min_id"):
+        page.append(message.id)
+        if len(page) < _MESSAGES_PAGE_SIZE:
+            continue
+        cache.add_message_ids(entity_id, page)
+        for message_id in page:
+            yield message_id
+        page = []
+
+    cache.add_message_ids(entity_id, page)
+    for message_id in page:
+        yield message_id
 
-    if await client.is_user_authorized():
-        await client.disconnect()
-        _LOGGER.debug("Verify OTP code, already authorized, end")
-        return
 
+async def _filtered_message_ids(
+    entity_id: int, client: TelegramClient, message_filter: MessageFilter, archive: Optional[MessageArchive] = None
+) -> AsyncIterator[int]:
+    """Iterate over the user's own message IDs of a single entity which match the filter, newest first.
+
+    The filter is applied by Telegram, the cache is bypassed because it only tracks the unfiltered messages. Every
+    yielded message is appended to the archive first, so the archiving costs no extra history pass.
+
+    Args:
+        entity_id: Entity ID to be used to iterate over the message IDs of.
+        client: Telegram client which is already connected.
+        message_filter: Filter of the messages.
+        archive: Archive the messages are written to if provided.
+
+    Yields:
+        The matching user's own message IDs of the entity.
+    """
+    message: Message
+    params = message_filter.iter_messages_params()
+    async for message in _iter_messages(entity_id=entity_id, client=client, params=params, resume_key="offset_id"):
+        if message_filter.is_below_min_date(message.date):
+            break
+        if archive is not None:
+            archive.write(entity_id, message)
+        yield message.id
+
+
+async def _iter_messages(
+    entity_id: int, client: TelegramClient, params: Dict[str, Any], resume_key: str
+) -> AsyncIterator[Message]:
+    """Iterate over the user's messages of a single entity respecting the rate limiter.
+
+    A token is acquired before every page fetch. After a flood wait the iteration is resumed from the last yielded
+    message by passing its ID as the `resume_key` parameter, so no message is yielded twice.
+
+    Args:
+        entity_id: Entity ID to be used to iterate over the messages of.
+        client: Telegram client which is already connected.
+        params: Extra parameters of the `TelegramClient.iter_messages` method.
+        resume_key: Name of the parameter which makes the iteration continue after the given message ID.
+
+    Yields:
+        The user's messages of the entity.
+    """
+    params = dict(params)
+    while True:
+        try:
+            await _RATE_LIMITER.acquire()
+            yielded_count = 0
+            message: Message
+            messages = client.iter_messages(entity=_input_peer(entity_id), from_user=_FROM_USER, **params)
+            async for message in _metered_pages(messages, "iter_messages", _MESSAGES_PAGE_SIZE):
+                yield message
+                params[resume_key] = message.id
+                yielded_count += 1
+                if yielded_count % _MESSAGES_PAGE_SIZE == 0:
+                    _RATE_LIMITER.on_success()
+                    await _RATE_LIMITER.acquire()
+            _RATE_LIMITER.on_success()
+            return
+        except FloodWaitError as error:
+            _RATE_LIMITER.on_flood_wait(error.seconds)
+
+
+async def shutdown() -> None:
+    """Disconnect the shared Telegram client, close the cache and the journal, they are opened again lazily."""
+    global _cache_instance, _journal_instance, _peers_instance
+    await _CLIENT_MANAGER.shutdown()
+    if _cache_instance is not None:
+        _cache_instance.close()
+        _cache_instance = None
+    _peers_instance = None
+    if _journal_instance is not None:
+        _journal_instance.close()
+        _journal_instance = None
+
+
+def clear_cache() -> None:
+    """Drop all the cached dialogs, input peers and message IDs, so the next requests sync everything again."""
+    global _peers_instance
+    _cache().clear()
+    _peers_instance = None
+
+
+def rpc_metrics() -> RpcMetrics:
+    """Get the measurements of all the Telegram requests issued by this process.
+
+    Returns:
+        The process-wide RPC metrics.
+    """
+    return _METRICS
+
+
+def rate_limiter_state() -> RateLimiterState:
+    """Take a snapshot of the rate limiter shared by all the Telegram requests.
+
+    Returns:
+        The current rate limiter state.
+    """
+    return _RATE_LIMITER.state()
+
+
+async def _call(request: Callable[[], Awaitable[_T]], method: str, items: int = 0) -> _T:
+    """Issue a single Telegram request through the shared rate limiter, retrying it after flood waits.
+
+    Every attempt is recorded in the RPC metrics.
+
+    Args:
+        request: function which issues the request when called.
+        method: name of the request in the RPC metrics.
+        items: amount of the items (e.g. message IDs) sent with the request.
+
+    Returns:
+        The request result.
+    """
+    while True:
+        await _RATE_LIMITER.acquire()
+        started_at = time.perf_counter()
+        try:
+            result = await request()
+        except FloodWaitError as error:
+            _METRICS.record(method, time.perf_counter() - started_at, items, error, error.seconds)
+            _RATE_LIMITER.on_flood_wait(error.seconds)
+            continue
+        except Exception as error:
+            _METRICS.record(method, time.perf_counter() - started_at, items, error)
+            raise
+        _METRICS.record(method, time.perf_counter() - started_at, items)
+        _RATE_LIMITER.on_success()
+        return result
+
+
+async def _metered_pages(iterator: AsyncIterator[_T], method: str, page_size: int) -> AsyncIterator[_T]:
+    """Pass the items of a paged Telethon iterator through, recording every page as a single RPC.
+
+    Telethon fetches a whole page when the first item of the page is requested and serves the rest from memory, so
+    the time spent waiting for the items of a page is the latency of its request.
+
+    Args:
+        iterator: Telethon iterator, e.g. of the messages or the dialogs.
+        method: name of the request in the RPC metrics.
+        page_size: amount of the items Telethon fetches with a single request.
+
+    Yields:
+        The items of the iterator.
+    """
+    waited = 0.0
+    items = 0
     try:
-        _LOGGER.debug("Verify OTP code, sign in")
-        await client.sign_in(phone=phone, code=otp_code, phone_code_hash=phone_hash)
-    except SessionPasswordNeededError:
-        _LOGGER.debug("Verify OTP code, caught SessionPasswordNeededError")
-        await client.sign_in(password=password)
+        while True:
+            started_at = time.perf_counter()
+            try:
+                item = await iterator.__anext__()
+            except StopAsyncIteration:
+                waited += time.perf_counter() - started_at
+                break
+            except FloodWaitError as error:
+                _METRICS.record(method, waited + time.perf_counter() - started_at, items, error, error.seconds)
+                waited, items = 0.0, 0
+                raise
+            except Exception as error:
+                _METRICS.record(method, waited + time.perf_counter() - started_at, items, error)
+                waited, items = 0.0, 0
+                raise
+            waited += time.perf_counter() - started_at
+            items += 1
+            if items == page_size:
+                _METRICS.record(method, waited, items)
+                waited, items = 0.0, 0
+            yield item
     finally:
-        await client.disconnect()
+        # The last page is partial or empty, or the caller stopped in the middle of the page.
+        if items or waited:
+            _METRICS.record(method, waited, items)
+
+
+def _cache() -> Cache:
+    """Get the process-wide cache, opening it on the first use.
+
+    Returns:
+        The process-wide cache of the dialogs and own message IDs.
+    """
+    global _cache_instance
+    if _cache_instance is None:
+        _cache_instance = Cache(_account_file(".cache"))
+    return _cache_instance
+
+
+def _peers() -> InputPeerCache:
+    """Get the process-wide input peers cache of the dialogs, creating it on the first use.
+
+    It's created again if the cache it's backed by was replaced, e.g. reopened after the shutdown.
+
+    Returns:
+        The process-wide input peers cache.
+    """
+    global _peers_instance
+    cache = _cache()
+    if _peers_instance is None or _peers_instance.cache is not cache:
+        _peers_instance = InputPeerCache(cache)
+    return _peers_instance
+
+
+def _input_peer(entity_id: int) -> Any:
+    """Get the input peer to be sent to Telegram instead of the entity ID, so Telethon doesn't resolve the entity.
 
-    _LOGGER.debug("Verify OTP code, end")
+    Args:
+        entity_id: Dialog entity ID.
+
+    Returns:
+        The cached input peer of the dialog, or the entity ID itself if the dialog wasn't fetched yet.
+    """
+    peer = _peers().get(entity_id)
+    return entity_id if peer is None else peer
+
+
+def _journal() -> DeletionJournal:
+    """Get the process-wide journal of the deletion jobs, opening it on the first use.
+
+    Returns:
+        The process-wide journal of the deletion jobs.
+    """
+    global _journal_instance
+    if _journal_instance is None:
+        _journal_instance = DeletionJournal(_account_file(".journal"))
+    return _journal_instance
+
+
+def _account_file(suffix: str) -> str:
+    """Get the path of the data file of the current account, so every working directory shares the same files.
+
+    The file left in the working directory by the older versions is moved to the data directory.
+
+    Args:
+        suffix: Extension of the file, e.g. ".cache".
+
+    Returns:
+        Path of the file in the data directory, the directory is created if needed.
+    """
+    path = data_dir() / f"{_account}{suffix}"
+    path.parent.mkdir(parents=True, exist_ok=True)
+    legacy_path = Path(f"{_account}{suffix}")
+    if not path.exists() and legacy_path.is_file():
+        _LOGGER.info("Moving %s to %s", legacy_path.resolve(), path)
+        shutil.move(str(legacy_path), str(path))
+    return str(path)
 
 
 def _create_client() -> TelegramClient:
     _LOGGER.debug("Create client, begin")
 
-    settings = AppSettings()
-    client = TelegramClient(_SESSION_NAME, int(settings.api_id()), settings.api_hash())
+    settings = app_settings()
+    api_id = settings.api_id(_account)
+    if api_id is None:
+        raise RuntimeError(f"API ID of the {_account!r} account isn't set")
+    # Flood waits are raised instead of being slept through silently, they are handled by the rate limiter.
+    client = TelegramClient(
+        _account_file(".session"),
+        api_id,
+        settings.api_hash(_account),
+        flood_sleep_threshold=0,
+        connection=metered_connection(_METRICS),
+    )
 
     _LOGGER.debug("Create client, end")
     return client
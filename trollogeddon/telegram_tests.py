@@ -20,28 +20,178 @@
 
 from __future__ import annotations
 
+import asyncio
 import logging
-from typing import Collection, Final, Tuple, TypeVar
-from unittest.mock import AsyncMock, MagicMock, call
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Any, Collection, Dict, Final, List, Optional, Tuple, TypeVar
+from unittest.mock import ANY, AsyncMock, MagicMock, call
 
 import pytest
+from archive import read_archive
+from cache import Cache, CachedDialog, CachedPeer
+from journal import DeletionJournal
+from message_filter import MessageFilter
+from metrics import RpcMetrics
 from mocks import (
+    MockedDialog,
     get_mocked_dialog1,
     get_mocked_dialog2,
     get_mocked_message1,
     get_mocked_message2,
+    get_mocked_messages,
 )
 from pytest_mock.plugin import MockerFixture
-from telegram import _FROM_USER, delete_messages, fetch_all_dialogs
+from rate_limiter import RateLimiter
+from settings import DATA_DIR_ENV, DEFAULT_ACCOUNT, AppSettings, FileSettings
+from telegram import (
+    _DELETE_CHUNK_SIZE,
+    _FROM_USER,
+    _MESSAGES_PAGE_SIZE,
+    AuthSession,
+    CancelToken,
+    ClientManager,
+    CountResult,
+    DeletionCancelledError,
+    DeletionProgress,
+    DeletionResult,
+    PasswordRequiredError,
+    _account_file,
+    count_messages,
+    current_account,
+    delete_messages,
+    enforce_retention,
+    estimate_deletion_seconds,
+    fetch_all_dialogs,
+    iter_dialogs_pages,
+    rate_limiter_state,
+    resume_deletion,
+    rpc_metrics,
+    shutdown,
+    unfinished_deletion,
+    use_account,
+)
+from telethon.errors.rpcerrorlist import (  # type: ignore
+    ChatAdminRequiredError,
+    FloodWaitError,
+    SessionPasswordNeededError,
+)
+from telethon.helpers import TotalList  # type: ignore
+from telethon.tl import functions, types  # type: ignore
 from telethon.tl.custom.dialog import Dialog  # type: ignore
+from telethon.tl.types import (  # type: ignore
+    InputMessagesFilterPhotos,
+    InputPeerUser,
+    User,
+)
 
 # Local logger instance for the current file.
 _LOGGER: Final = logging.getLogger(__name__)
 
 # Mocked dialogs list for testing purposes.
 _DIALOGS: Final = [get_mocked_dialog1(), get_mocked_dialog2()]
+# Cached records of the mocked dialogs list.
+_CACHED_DIALOGS: Final = [CachedDialog(111, "Chat 111", "User"), CachedDialog(222, "Chat 222", "Channel")]
 # Mocked entity IDs list for testing purposes.
 _ENTITY_IDS: Final = [123, 234, 345]
+# Rate high enough for the rate limiter to never slow the unit tests down.
+_UNLIMITED_RATE: Final = 1e9
+
+
+@pytest.fixture(autouse=True)
+def _unlimited_rate_limiter(mocker: MockerFixture) -> None:
+    """Replace the shared rate limiter with a fresh one which never makes the requests wait.
+
+    Args:
+        mocker: Mocker fixture instance to mock the things.
+    """
+    mocker.patch("telegram._RATE_LIMITER", RateLimiter(rate=_UNLIMITED_RATE, max_rate=_UNLIMITED_RATE))
+
+
+@pytest.fixture(autouse=True)
+def _fresh_metrics(mocker: MockerFixture) -> None:
+    """Replace the shared RPC metrics with empty ones.
+
+    Args:
+        mocker: Mocker fixture instance to mock the things.
+    """
+    mocker.patch("telegram._METRICS", RpcMetrics())
+
+
+@pytest.fixture(autouse=True)
+def cache(mocker: MockerFixture) -> Cache:
+    """Replace the on-disk cache with an in-memory one.
+
+    Args:
+        mocker: Mocker fixture instance to mock the things.
+
+    Returns:
+        The in-memory cache used by the unit test.
+    """
+    memory_cache = Cache(":memory:")
+    mocker.patch("telegram._cache", return_value=memory_cache)
+    return memory_cache
+
+
+@pytest.fixture(autouse=True)
+def journal(mocker: MockerFixture) -> DeletionJournal:
+    """Replace the on-disk deletion journal with an in-memory one.
+
+    Args:
+        mocker: Mocker fixture instance to mock the things.
+
+    Returns:
+        The in-memory deletion journal used by the unit test.
+    """
+    memory_journal = DeletionJournal(":memory:")
+    mocker.patch("telegram._journal", return_value=memory_journal)
+    return memory_journal
+
+
+@pytest.fixture(autouse=True)
+def data_path(monkeypatch: pytest.MonkeyPatch, tmp_path: Path) -> Path:
+    """Keep the session, cache and journal files of the unit test in its temporary directory.
+
+    Args:
+        monkeypatch: Monkeypatch fixture instance to set the environment variables.
+        tmp_path: Temporary directory of the unit test.
+
+    Returns:
+        The data directory used by the unit test.
+    """
+    path = tmp_path / "data"
+    monkeypatch.setenv(DATA_DIR_ENV, str(path))
+    return path
+
+
+@pytest.fixture(autouse=True)
+def _fresh_client_manager(mocker: MockerFixture) -> None:
+    """Replace the shared client manager with a fresh one, so no client is shared between the unit tests.
+
+    Args:
+        mocker: Mocker fixture instance to mock the things.
+    """
+    mocker.patch("telegram._CLIENT_MANAGER", ClientManager())
+    mocker.patch("settings._instance", None)
+    mocker.patch("telegram._account", DEFAULT_ACCOUNT)
+    mocker.patch("telegram._peers_instance", None)
+
+
+def test_account_files(monkeypatch: pytest.MonkeyPatch, tmp_path: Path, data_path: Path) -> None:
+    """Test the account files are kept in the data directory, the ones left in the working directory are moved there.
+
+    Args:
+        monkeypatch: Monkeypatch fixture instance to change the working directory.
+        tmp_path: Temporary directory of the unit test.
+        data_path: Data directory used by the unit test.
+    """
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / f"{DEFAULT_ACCOUNT}.journal").write_text("journal", encoding="utf-8")
+
+    assert _account_file(".journal") == str(data_path / f"{DEFAULT_ACCOUNT}.journal")
+    assert (data_path / f"{DEFAULT_ACCOUNT}.journal").read_text(encoding="utf-8") == "journal"
+    assert not (tmp_path / f"{DEFAULT_ACCOUNT}.journal").exists()
+    assert _account_file(".session") == str(data_path / f"{DEFAULT_ACCOUNT}.session")
 
 
 @pytest.mark.asyncio
@@ -53,21 +203,236 @@ async def test_fetch_all_dialogs(mocker: MockerFixture) -> None:
     """
     con_mock, disc_mock = _prepare_telegram_mocks(mocker)
     id_mock, hash_mock = _prepare_settings_mocks(mocker)
-    dial_mock = mocker.patch("telegram.TelegramClient.get_dialogs", side_effect=AsyncMock(return_value=_DIALOGS))
+    dial_mock = mocker.patch("telegram.TelegramClient.iter_dialogs", side_effect=lambda **_: _AsyncIterator(_DIALOGS))
 
     actual_result = await fetch_all_dialogs()
-    assert actual_result == _DIALOGS
+    assert actual_result == _CACHED_DIALOGS
 
     assert con_mock.call_count == 1
     assert con_mock.call_args_list == [call()]
-    assert disc_mock.call_count == 1
-    assert disc_mock.call_args_list == [call()]
+    assert disc_mock.call_count == 0
     assert id_mock.call_count == 1
-    assert id_mock.call_args_list == [call()]
+    assert id_mock.call_args_list == [call(DEFAULT_ACCOUNT)]
     assert hash_mock.call_count == 1
-    assert hash_mock.call_args_list == [call()]
+    assert hash_mock.call_args_list == [call(DEFAULT_ACCOUNT)]
+    assert dial_mock.call_count == 1
+    assert dial_mock.call_args_list == [call(limit=100)]
+
+
+@pytest.mark.asyncio
+async def test_iter_dialogs_pages(mocker: MockerFixture) -> None:
+    """Test the `iter_dialogs_pages` function yields the dialogs page by page and resumes them after a flood wait.
+
+    Args:
+        mocker: Mocker fixture instance to mock the things.
+    """
+    _prepare_telegram_mocks(mocker)
+    _prepare_settings_mocks(mocker)
+    mocker.patch("telegram._DIALOGS_PAGE_SIZE", 2)
+    dialogs = [
+        MockedDialog(
+            name=f"Chat {entity_id}",
+            entity=User(id=entity_id),
+            input_entity=InputPeerUser(entity_id, entity_id),
+            date=datetime(2023, 1, 10 - entity_id, tzinfo=timezone.utc),
+            message=get_mocked_message1(),
+        )
+        for entity_id in range(1, 6)
+    ]
+    expected = [CachedDialog(entity_id, f"Chat {entity_id}", "User") for entity_id in range(1, 6)]
+    dial_mock = mocker.patch(
+        "telegram.TelegramClient.iter_dialogs",
+        side_effect=[
+            _AsyncIterator(dialogs[:2]),
+            _AsyncIterator([], error=FloodWaitError(request=None, capture=0)),
+            # The second dialog got a new message during the flood wait and comes again.
+            _AsyncIterator(dialogs[1:3]),
+            _AsyncIterator(dialogs[3:]),
+            _AsyncIterator([]),
+        ],
+    )
+
+    actual_result = [page async for page in iter_dialogs_pages(page_size=3)]
+    assert actual_result == [expected[:3], expected[3:]]
+
+    def offset(dialog: MockedDialog) -> Dict[str, Any]:
+        return {"offset_date": dialog.date, "offset_id": dialog.message.id, "offset_peer": dialog.input_entity}
+
+    assert dial_mock.call_args_list == [
+        call(limit=2),
+        call(limit=2, **offset(dialogs[1])),
+        call(limit=2, **offset(dialogs[1])),
+        call(limit=2, **offset(dialogs[2])),
+        call(limit=2, **offset(dialogs[4])),
+    ]
+    stats = rpc_metrics().snapshot()["iter_dialogs"]
+    assert (stats.count, stats.error_count, stats.flood_wait_count) == (5, 1, 1)
+
+
+@pytest.mark.asyncio
+async def test_fetch_all_dialogs_cached(mocker: MockerFixture, cache: Cache) -> None:
+    """Test the `fetch_all_dialogs` function reads the cached dialogs unless asked to resync.
+
+    Args:
+        mocker: Mocker fixture instance to mock the things.
+        cache: In-memory cache used by the unit test.
+    """
+    con_mock, _ = _prepare_telegram_mocks(mocker)
+    _prepare_settings_mocks(mocker)
+    dial_mock = mocker.patch("telegram.TelegramClient.iter_dialogs", side_effect=lambda **_: _AsyncIterator(_DIALOGS))
+
+    assert await fetch_all_dialogs() == _CACHED_DIALOGS
+    assert cache.dialogs() == _CACHED_DIALOGS
+    assert await fetch_all_dialogs() == _CACHED_DIALOGS
     assert dial_mock.call_count == 1
-    assert dial_mock.call_args_list == [call()]
+
+    assert await fetch_all_dialogs(resync=True) == _CACHED_DIALOGS
+    assert dial_mock.call_count == 2
+    assert con_mock.call_count == 1
+
+
+@pytest.mark.asyncio
+async def test_delete_messages_input_peers(mocker: MockerFixture, cache: Cache) -> None:
+    """Test the deletion sends the input peers of the fetched dialogs instead of the entity IDs.
+
+    Args:
+        mocker: Mocker fixture instance to mock the things.
+        cache: In-memory cache used by the unit test.
+    """
+    _prepare_telegram_mocks(mocker)
+    _prepare_settings_mocks(mocker)
+    mocker.patch("telegram.TelegramClient.iter_dialogs", side_effect=lambda **_: _AsyncIterator(_DIALOGS))
+    iter_mock = mocker.patch(
+        "telegram.TelegramClient.iter_messages", side_effect=lambda **_: _AsyncIterator(get_mocked_messages(2))
+    )
+    call_mock = mocker.patch("telegram.TelegramClient.__call__", side_effect=AsyncMock())
+
+    await fetch_all_dialogs(resync=True)
+    assert cache.input_peer(222) == CachedPeer(222, "InputPeerChannel", 222, 2222)
+    await shutdown()
+    await delete_messages([222, 111, 333], concurrency=1)
+
+    assert [args.kwargs["entity"] for args in iter_mock.call_args_list] == [
+        types.InputPeerChannel(222, 2222),
+        types.InputPeerUser(111, 1111),
+        333,
+    ]
+    assert call_mock.call_args_list[0] == call(
+        functions.channels.DeleteMessagesRequest(channel=types.InputPeerChannel(222, 2222), id=[1, 2])
+    )
+
+
+@pytest.mark.asyncio
+async def test_shared_client(mocker: MockerFixture) -> None:
+    """Test the Telegram client is connected once, shared between the calls and disconnected on shutdown.
+
+    Args:
+        mocker: Mocker fixture instance to mock the things.
+    """
+    con_mock, disc_mock = _prepare_telegram_mocks(mocker)
+    id_mock, _ = _prepare_settings_mocks(mocker)
+    mocker.patch("telegram.TelegramClient.iter_dialogs", side_effect=lambda **_: _AsyncIterator(_DIALOGS))
+    mocker.patch("telegram.TelegramClient.iter_messages", side_effect=lambda **_: _AsyncIterator([]))
+
+    await fetch_all_dialogs()
+    await delete_messages(_ENTITY_IDS)
+    await fetch_all_dialogs()
+    assert con_mock.call_count == 1
+    assert disc_mock.call_count == 0
+    assert id_mock.call_count == 1
+
+    await shutdown()
+    assert disc_mock.call_count == 1
+
+    await delete_messages(_ENTITY_IDS)
+    assert con_mock.call_count == 2
+    assert id_mock.call_count == 2
+
+
+@pytest.mark.asyncio
+async def test_shared_client_credentials(mocker: MockerFixture, tmp_path: Path) -> None:
+    """Test the shared Telegram client is rebuilt only when the credentials of the current account change.
+
+    Args:
+        mocker: Mocker fixture instance to mock the things.
+        tmp_path: Temporary directory of the settings file.
+    """
+    con_mock, disc_mock = _prepare_telegram_mocks(mocker)
+    settings = AppSettings(FileSettings(tmp_path / "trollogeddon.conf"))
+    mocker.patch("settings._instance", settings)
+    settings.set_api_id(111999)
+    settings.set_api_hash("456999")
+    mocker.patch("telegram.TelegramClient.iter_dialogs", side_effect=lambda **_: _AsyncIterator(_DIALOGS))
+
+    await fetch_all_dialogs(resync=True)
+    settings.set_api_hash("456999")
+    settings.set_api_id(222, "work")
+    await fetch_all_dialogs(resync=True)
+    assert (con_mock.call_count, disc_mock.call_count) == (1, 0)
+
+    settings.set_api_hash("789")
+    await fetch_all_dialogs(resync=True)
+    assert (con_mock.call_count, disc_mock.call_count) == (2, 1)
+
+
+@pytest.mark.asyncio
+async def test_auth_session(mocker: MockerFixture) -> None:
+    """Test the sign-in flow goes over one connection and the authorization state is asked from Telegram once.
+
+    Args:
+        mocker: Mocker fixture instance to mock the things.
+    """
+    con_mock, _ = _prepare_telegram_mocks(mocker)
+    _prepare_settings_mocks(mocker)
+    auth_mock = mocker.patch("telegram.TelegramClient.is_user_authorized", side_effect=AsyncMock(return_value=False))
+    code_mock = mocker.patch(
+        "telegram.TelegramClient.send_code_request",
+        side_effect=AsyncMock(return_value=MagicMock(phone_code_hash="hash")),
+    )
+    sign_in_mock = mocker.patch("telegram.TelegramClient.sign_in", side_effect=AsyncMock())
+
+    session = AuthSession("+49 175")
+    assert await session.send_code()
+    await session.sign_in("12345")
+    assert not await AuthSession("+49 175").send_code()
+
+    code_mock.assert_called_once_with(phone="+49 175", force_sms=True)
+    sign_in_mock.assert_called_once_with(phone="+49 175", code="12345", phone_code_hash="hash")
+    assert con_mock.call_count == 1
+    assert auth_mock.call_count == 1
+
+
+@pytest.mark.asyncio
+async def test_auth_session_password(mocker: MockerFixture) -> None:
+    """Test the OTP code is sent once and only the cloud password is sent after it's reported as required.
+
+    Args:
+        mocker: Mocker fixture instance to mock the things.
+    """
+    _prepare_telegram_mocks(mocker)
+    _prepare_settings_mocks(mocker)
+    mocker.patch("telegram.TelegramClient.is_user_authorized", side_effect=AsyncMock(return_value=False))
+    mocker.patch(
+        "telegram.TelegramClient.send_code_request",
+        side_effect=AsyncMock(return_value=MagicMock(phone_code_hash="hash")),
+    )
+    sign_in_mock = mocker.patch(
+        "telegram.TelegramClient.sign_in", side_effect=AsyncMock(side_effect=[SessionPasswordNeededError(None), None])
+    )
+
+    session = AuthSession("+49 175")
+    with pytest.raises(RuntimeError):
+        await session.sign_in("12345")
+    await session.send_code()
+    with pytest.raises(PasswordRequiredError):
+        await session.sign_in("12345")
+    assert session.password_required
+    await session.sign_in("12345", "secret")
+
+    assert sign_in_mock.call_args_list == [
+        call(phone="+49 175", code="12345", phone_code_hash="hash"),
+        call(password="secret"),
+    ]
 
 
 @pytest.mark.asyncio
@@ -82,25 +447,679 @@ async def test_delete_messages(mocker: MockerFixture) -> None:
     msg1_mock = get_mocked_message1()
     msg2_mock = get_mocked_message2()
     iter_mock = mocker.patch(
-        "telegram.TelegramClient.iter_messages", return_value=_AsyncIterator([msg1_mock, msg2_mock])
+        "telegram.TelegramClient.iter_messages", side_effect=lambda **_: _AsyncIterator([msg1_mock, msg2_mock])
     )
+    del_mock = mocker.patch("telegram.TelegramClient.delete_messages", side_effect=AsyncMock())
 
-    await delete_messages(_ENTITY_IDS)
+    actual_result = await delete_messages(_ENTITY_IDS)
+    assert actual_result == {entity_id: DeletionResult(deleted_count=2) for entity_id in _ENTITY_IDS}
 
     assert con_mock.call_count == 1
     assert con_mock.call_args_list == [call()]
-    assert disc_mock.call_count == 1
-    assert disc_mock.call_args_list == [call()]
+    assert disc_mock.call_count == 0
     assert id_mock.call_count == 1
-    assert id_mock.call_args_list == [call()]
+    assert id_mock.call_args_list == [call(DEFAULT_ACCOUNT)]
     assert hash_mock.call_count == 1
-    assert hash_mock.call_args_list == [call()]
+    assert hash_mock.call_args_list == [call(DEFAULT_ACCOUNT)]
     assert iter_mock.call_count == 3
-    assert iter_mock.call_args_list == [call(entity=entity_id, from_user=_FROM_USER) for entity_id in _ENTITY_IDS]
-    assert msg1_mock.delete.call_count == 1
-    assert msg1_mock.delete.call_args_list == [call()]
-    assert msg2_mock.delete.call_count == 1
-    assert msg2_mock.delete.call_args_list == [call()]
+    assert iter_mock.call_args_list == [
+        call(entity=entity_id, from_user=_FROM_USER, min_id=0, reverse=True) for entity_id in _ENTITY_IDS
+    ]
+    assert del_mock.call_count == 3
+    assert del_mock.call_args_list == [call(entity_id, [msg1_mock.id, msg2_mock.id]) for entity_id in _ENTITY_IDS]
+    assert msg1_mock.delete.call_count == 0
+    assert msg2_mock.delete.call_count == 0
+
+
+@pytest.mark.asyncio
+async def test_delete_messages_chunks(mocker: MockerFixture) -> None:
+    """Test the `delete_messages` function sends the message IDs in chunks of the maximum size.
+
+    Args:
+        mocker: Mocker fixture instance to mock the things.
+    """
+    _prepare_telegram_mocks(mocker)
+    _prepare_settings_mocks(mocker)
+    messages = get_mocked_messages(_DELETE_CHUNK_SIZE * 2 + 50)
+    message_ids = [message.id for message in messages]
+    iter_mock = mocker.patch("telegram.TelegramClient.iter_messages", side_effect=lambda **_: _AsyncIterator(messages))
+    del_mock = mocker.patch("telegram.TelegramClient.delete_messages", side_effect=AsyncMock())
+    progress_mock = MagicMock()
+
+    await delete_messages(_ENTITY_IDS[:1], progress=progress_mock)
+
+    assert iter_mock.call_count == 1
+    # The scan stage runs ahead of the delete stage, all the messages are scanned before the first chunk is deleted.
+    assert progress_mock.call_args_list == [
+        call(DeletionProgress(_ENTITY_IDS[0], _DELETE_CHUNK_SIZE * 2 + 50, _DELETE_CHUNK_SIZE, ANY)),
+        call(DeletionProgress(_ENTITY_IDS[0], _DELETE_CHUNK_SIZE * 2 + 50, _DELETE_CHUNK_SIZE * 2, ANY)),
+        call(DeletionProgress(_ENTITY_IDS[0], _DELETE_CHUNK_SIZE * 2 + 50, _DELETE_CHUNK_SIZE * 2 + 50, ANY)),
+        call(DeletionProgress(_ENTITY_IDS[0], _DELETE_CHUNK_SIZE * 2 + 50, _DELETE_CHUNK_SIZE * 2 + 50, ANY, True)),
+    ]
+    assert del_mock.call_count == 3
+    assert del_mock.call_args_list == [
+        call(_ENTITY_IDS[0], message_ids[:_DELETE_CHUNK_SIZE]),
+        call(_ENTITY_IDS[0], message_ids[_DELETE_CHUNK_SIZE : _DELETE_CHUNK_SIZE * 2]),
+        call(_ENTITY_IDS[0], message_ids[_DELETE_CHUNK_SIZE * 2 :]),
+    ]
+
+
+@pytest.mark.asyncio
+async def test_delete_messages_isolation(mocker: MockerFixture) -> None:
+    """Test the `delete_messages` function keeps going when one of the entities fails.
+
+    Args:
+        mocker: Mocker fixture instance to mock the things.
+    """
+    _prepare_telegram_mocks(mocker)
+    _prepare_settings_mocks(mocker)
+    error = RuntimeError("Could not find the input entity")
+
+    def iter_messages(entity: int, from_user: str, min_id: int, reverse: bool) -> _AsyncIterator:
+        if entity == _ENTITY_IDS[1]:
+            raise error
+        return _AsyncIterator(get_mocked_messages(3))
+
+    mocker.patch("telegram.TelegramClient.iter_messages", side_effect=iter_messages)
+    mocker.patch("telegram.TelegramClient.delete_messages", side_effect=AsyncMock())
+
+    actual_result = await delete_messages(_ENTITY_IDS)
+    assert actual_result == {
+        _ENTITY_IDS[0]: DeletionResult(deleted_count=3),
+        _ENTITY_IDS[1]: DeletionResult(error=error),
+        _ENTITY_IDS[2]: DeletionResult(deleted_count=3),
+    }
+
+
+@pytest.mark.asyncio
+async def test_delete_messages_concurrency(mocker: MockerFixture) -> None:
+    """Test the `delete_messages` function processes no more entities at the same time than allowed.
+
+    Args:
+        mocker: Mocker fixture instance to mock the things.
+    """
+    _prepare_telegram_mocks(mocker)
+    _prepare_settings_mocks(mocker)
+    mocker.patch(
+        "telegram.TelegramClient.iter_messages", side_effect=lambda **_: _AsyncIterator(get_mocked_messages(1))
+    )
+    active = 0
+    peak = 0
+
+    async def delete(entity: int, message_ids: List[int]) -> None:
+        nonlocal active, peak
+        active += 1
+        peak = max(peak, active)
+        await asyncio.sleep(0.01)
+        active -= 1
+
+    mocker.patch("telegram.TelegramClient.delete_messages", side_effect=delete)
+
+    actual_result = await delete_messages(list(range(1, 11)), concurrency=3)
+    assert len(actual_result) == 10
+    assert peak == 3
+
+
+@pytest.mark.asyncio
+async def test_delete_messages_pipeline(mocker: MockerFixture) -> None:
+    """Test the delete stage workers delete the queued chunks in parallel and the queue depth is bounded and metered.
+
+    Args:
+        mocker: Mocker fixture instance to mock the things.
+    """
+    _prepare_telegram_mocks(mocker)
+    _prepare_settings_mocks(mocker)
+    error = RuntimeError("Message delete forbidden")
+    mocker.patch(
+        "telegram.TelegramClient.iter_messages",
+        side_effect=lambda **_: _AsyncIterator(get_mocked_messages(_DELETE_CHUNK_SIZE * 8)),
+    )
+    active = 0
+    peak = 0
+
+    async def delete(entity: int, message_ids: List[int]) -> None:
+        nonlocal active, peak
+        if entity == _ENTITY_IDS[1]:
+            raise error
+        active += 1
+        peak = max(peak, active)
+        await asyncio.sleep(0.01)
+        active -= 1
+
+    del_mock = mocker.patch("telegram.TelegramClient.delete_messages", side_effect=delete)
+
+    actual_result = await delete_messages(_ENTITY_IDS, concurrency=1, delete_workers=3)
+    assert actual_result == {
+        _ENTITY_IDS[0]: DeletionResult(deleted_count=_DELETE_CHUNK_SIZE * 8),
+        _ENTITY_IDS[1]: DeletionResult(error=error),
+        _ENTITY_IDS[2]: DeletionResult(deleted_count=_DELETE_CHUNK_SIZE * 8),
+    }
+    assert peak == 3
+    # The failed entity stops scanning, its chunks queued before the failure are skipped.
+    assert sum(1 for c in del_mock.call_args_list if c.args[0] == _ENTITY_IDS[1]) < 8
+    queue = rpc_metrics().queue_snapshot()["delete_chunks"]
+    assert queue.capacity == 6
+    assert queue.max_depth == 6
+    assert queue.put_wait_seconds > 0
+
+
+@pytest.mark.asyncio
+async def test_delete_messages_flood_wait(mocker: MockerFixture) -> None:
+    """Test the `delete_messages` function retries the requests which were answered with a flood wait.
+
+    Args:
+        mocker: Mocker fixture instance to mock the things.
+    """
+    _prepare_telegram_mocks(mocker)
+    _prepare_settings_mocks(mocker)
+    messages = get_mocked_messages(3)
+    mocker.patch("telegram.TelegramClient.iter_messages", side_effect=lambda **_: _AsyncIterator(messages))
+    del_mock = mocker.patch(
+        "telegram.TelegramClient.delete_messages", side_effect=[FloodWaitError(request=None, capture=0), None]
+    )
+
+    actual_result = await delete_messages(_ENTITY_IDS[:1])
+    assert actual_result == {_ENTITY_IDS[0]: DeletionResult(deleted_count=3)}
+
+    assert del_mock.call_count == 2
+    assert rate_limiter_state().flood_wait_count == 1
+
+
+@pytest.mark.asyncio
+async def test_delete_messages_flood_wait_iteration(mocker: MockerFixture) -> None:
+    """Test the `delete_messages` function resumes the messages iteration after a flood wait.
+
+    Args:
+        mocker: Mocker fixture instance to mock the things.
+    """
+    _prepare_telegram_mocks(mocker)
+    _prepare_settings_mocks(mocker)
+    messages = get_mocked_messages(5)
+    iter_mock = mocker.patch(
+        "telegram.TelegramClient.iter_messages",
+        side_effect=[
+            _AsyncIterator(messages[:2], error=FloodWaitError(request=None, capture=0)),
+            _AsyncIterator(messages[2:]),
+        ],
+    )
+    del_mock = mocker.patch("telegram.TelegramClient.delete_messages", side_effect=AsyncMock())
+
+    await delete_messages(_ENTITY_IDS[:1])
+
+    assert iter_mock.call_args_list == [
+        call(entity=_ENTITY_IDS[0], from_user=_FROM_USER, min_id=0, reverse=True),
+        call(entity=_ENTITY_IDS[0], from_user=_FROM_USER, min_id=messages[1].id, reverse=True),
+    ]
+    assert del_mock.call_args_list == [call(_ENTITY_IDS[0], [message.id for message in messages])]
+    stats = rpc_metrics().snapshot()
+    assert list(stats) == ["connect", "delete_messages", "iter_messages"]
+    assert (stats["iter_messages"].count, stats["iter_messages"].items) == (2, len(messages))
+    assert (stats["iter_messages"].error_count, stats["iter_messages"].flood_wait_count) == (1, 1)
+    assert (stats["delete_messages"].count, stats["delete_messages"].items) == (1, len(messages))
+
+
+@pytest.mark.asyncio
+async def test_delete_messages_cached(mocker: MockerFixture, cache: Cache) -> None:
+    """Test the `delete_messages` function deletes the cached IDs first and scans the newer messages only.
+
+    Args:
+        mocker: Mocker fixture instance to mock the things.
+        cache: In-memory cache used by the unit test.
+    """
+    _prepare_telegram_mocks(mocker)
+    _prepare_settings_mocks(mocker)
+    cache.add_message_ids(_ENTITY_IDS[0], [5, 7])
+    messages = get_mocked_messages(2, first_id=8)
+    iter_mock = mocker.patch("telegram.TelegramClient.iter_messages", side_effect=lambda **_: _AsyncIterator(messages))
+    del_mock = mocker.patch("telegram.TelegramClient.delete_messages", side_effect=AsyncMock())
+
+    actual_result = await delete_messages(_ENTITY_IDS[:1])
+    assert actual_result == {_ENTITY_IDS[0]: DeletionResult(deleted_count=4)}
+
+    assert iter_mock.call_args_list == [call(entity=_ENTITY_IDS[0], from_user=_FROM_USER, min_id=7, reverse=True)]
+    assert del_mock.call_args_list == [call(_ENTITY_IDS[0], [5, 7, 8, 9])]
+    assert cache.message_ids(_ENTITY_IDS[0]) == []
+    assert cache.watermark(_ENTITY_IDS[0]) == 9
+
+
+@pytest.mark.asyncio
+async def test_delete_messages_filtered(mocker: MockerFixture, cache: Cache, journal: DeletionJournal) -> None:
+    """Test the `delete_messages` function pushes the filter down to the search and stops at the lower date bound.
+
+    Args:
+        mocker: Mocker fixture instance to mock the things.
+        cache: In-memory cache used by the unit test.
+        journal: In-memory deletion journal used by the unit test.
+    """
+    _prepare_telegram_mocks(mocker)
+    _prepare_settings_mocks(mocker)
+    now = datetime(2023, 6, 1, tzinfo=timezone.utc)
+    messages = list(reversed(get_mocked_messages(5)))
+    for message in messages:
+        message.date = now - timedelta(days=10 - message.id)
+    message_filter = MessageFilter(search="hello", media="Photos", min_date=now - timedelta(days=7), max_date=now)
+    iter_mock = mocker.patch("telegram.TelegramClient.iter_messages", side_effect=lambda **_: _AsyncIterator(messages))
+    del_mock = mocker.patch("telegram.TelegramClient.delete_messages", side_effect=AsyncMock())
+    mocker.patch("telegram.DeletionJournal.finish_job")
+
+    actual_result = await delete_messages(_ENTITY_IDS[:1], message_filter=message_filter)
+    assert actual_result == {_ENTITY_IDS[0]: DeletionResult(deleted_count=3)}
+
+    assert iter_mock.call_args_list == [
+        call(
+            entity=_ENTITY_IDS[0],
+            from_user=_FROM_USER,
+            search="hello",
+            filter=InputMessagesFilterPhotos,
+            offset_date=now,
+        )
+    ]
+    assert del_mock.call_args_list == [call(_ENTITY_IDS[0], [5, 4, 3])]
+    assert cache.watermark(_ENTITY_IDS[0]) == 0
+    job = journal.unfinished_job()
+    assert job is not None
+    assert MessageFilter.from_dict(job.filters) == message_filter
+
+
+@pytest.mark.asyncio
+async def test_delete_messages_archived(
+    mocker: MockerFixture, cache: Cache, journal: DeletionJournal, tmp_path: Path
+) -> None:
+    """Test the `delete_messages` function archives the messages in the history pass, bypassing the cached IDs.
+
+    Args:
+        mocker: Mocker fixture instance to mock the things.
+        cache: In-memory cache used by the unit test.
+        journal: In-memory deletion journal used by the unit test.
+        tmp_path: Temporary directory of the archive.
+    """
+    _prepare_telegram_mocks(mocker)
+    _prepare_settings_mocks(mocker)
+    cache.add_message_ids(_ENTITY_IDS[0], [1, 2])
+    messages = list(reversed(get_mocked_messages(3)))
+    iter_mock = mocker.patch("telegram.TelegramClient.iter_messages", side_effect=lambda **_: _AsyncIterator(messages))
+    del_mock = mocker.patch("telegram.TelegramClient.delete_messages", side_effect=AsyncMock())
+    mocker.patch("telegram.DeletionJournal.finish_job")
+    archive_path = str(tmp_path / "archive.jsonl.gz")
+
+    actual_result = await delete_messages(
+        _ENTITY_IDS[:1], message_filter=MessageFilter(whole_history=True), archive_path=archive_path
+    )
+    assert actual_result == {_ENTITY_IDS[0]: DeletionResult(deleted_count=3)}
+
+    assert iter_mock.call_args_list == [call(entity=_ENTITY_IDS[0], from_user=_FROM_USER)]
+    assert del_mock.call_args_list == [call(_ENTITY_IDS[0], [3, 2, 1])]
+    assert [(record["entity_id"], record["id"]) for record in read_archive(archive_path)] == [
+        (_ENTITY_IDS[0], 3),
+        (_ENTITY_IDS[0], 2),
+        (_ENTITY_IDS[0], 1),
+    ]
+    job = journal.unfinished_job()
+    assert job is not None and job.archive_path == archive_path
+
+
+@pytest.mark.asyncio
+async def test_enforce_retention(mocker: MockerFixture, cache: Cache) -> None:
+    """Test the `enforce_retention` function only scans the messages which crossed the boundary since the last pass.
+
+    Args:
+        mocker: Mocker fixture instance to mock the things.
+        cache: In-memory cache used by the unit test.
+    """
+    _prepare_telegram_mocks(mocker)
+    _prepare_settings_mocks(mocker)
+    now = datetime(2023, 6, 1, tzinfo=timezone.utc)
+    messages = list(reversed(get_mocked_messages(6)))
+    for message in messages:
+        message.date = now - timedelta(days=10 - message.id)
+
+    def iter_messages(offset_date: datetime, **_: Any) -> _AsyncIterator:
+        return _AsyncIterator(
+            [message for message in messages if message.date is not None and message.date < offset_date]
+        )
+
+    iter_mock = mocker.patch("telegram.TelegramClient.iter_messages", side_effect=iter_messages)
+    del_mock = mocker.patch("telegram.TelegramClient.delete_messages", side_effect=AsyncMock())
+    mocker.patch("telegram.DeletionJournal.finish_job")
+
+    first = await enforce_retention(_ENTITY_IDS[:1], timedelta(days=7), now=now)
+    assert first == {_ENTITY_IDS[0]: DeletionResult(deleted_count=2)}
+    assert cache.retention_checkpoint(_ENTITY_IDS[0]) == now - timedelta(days=7)
+
+    second = await enforce_retention(_ENTITY_IDS[:1], timedelta(days=7), now=now + timedelta(days=2))
+    assert second == {_ENTITY_IDS[0]: DeletionResult(deleted_count=2)}
+    assert cache.retention_checkpoint(_ENTITY_IDS[0]) == now - timedelta(days=5)
+
+    idle = await enforce_retention(_ENTITY_IDS[:1], timedelta(days=7), now=now + timedelta(days=2))
+    assert idle == {_ENTITY_IDS[0]: DeletionResult()}
+
+    assert [c.kwargs["offset_date"] for c in iter_mock.call_args_list] == [
+        now - timedelta(days=7),
+        now - timedelta(days=5),
+    ]
+    assert del_mock.call_args_list == [call(_ENTITY_IDS[0], [2, 1]), call(_ENTITY_IDS[0], [4, 3])]
+
+
+@pytest.mark.asyncio
+async def test_enforce_retention_unfinished_deletion(mocker: MockerFixture, journal: DeletionJournal) -> None:
+    """Test the retention passes keep the unfinished deletion job resumable and aren't resumable themselves.
+
+    Args:
+        mocker: Mocker fixture instance to mock the things.
+        journal: In-memory deletion journal used by the unit test.
+    """
+    _prepare_telegram_mocks(mocker)
+    _prepare_settings_mocks(mocker)
+    mocker.patch("telegram.TelegramClient.iter_messages", side_effect=lambda **_: _AsyncIterator([]))
+    now = datetime(2023, 6, 1, tzinfo=timezone.utc)
+    job = journal.start_job(_ENTITY_IDS[:2])
+
+    results = await enforce_retention(_ENTITY_IDS[2:], timedelta(days=30), now=now)
+    assert results == {_ENTITY_IDS[2]: DeletionResult()}
+    unfinished = unfinished_deletion()
+    assert unfinished is not None and unfinished.job_id == job.job_id
+
+    # The interrupted pass is left unfinished, but it's rescanned by the next pass instead of being resumed.
+    mocker.patch(
+        "telegram.TelegramClient.iter_messages",
+        side_effect=lambda **_: _AsyncIterator([], error=RuntimeError("Interrupted")),
+    )
+    results = await enforce_retention(_ENTITY_IDS[2:], timedelta(days=30), now=now + timedelta(days=1))
+    assert results[_ENTITY_IDS[2]].error is not None
+    unfinished = unfinished_deletion()
+    assert unfinished is not None and unfinished.job_id == job.job_id
+
+
+@pytest.mark.asyncio
+async def test_enforce_retention_account_switch(mocker: MockerFixture, cache: Cache) -> None:
+    """Test the retention pass is cancelled and checkpoints nothing once another account is used in its middle.
+
+    Args:
+        mocker: Mocker fixture instance to mock the things.
+        cache: In-memory cache used by the unit test.
+    """
+    _prepare_telegram_mocks(mocker)
+    _prepare_settings_mocks(mocker)
+    now = datetime(2023, 6, 1, tzinfo=timezone.utc)
+    old_checkpoint = now - timedelta(days=20)
+    cache.set_retention_checkpoint(_ENTITY_IDS[1], old_checkpoint)
+    mocker.patch(
+        "telegram.TelegramClient.iter_messages", side_effect=lambda **_: _AsyncIterator(get_mocked_messages(2))
+    )
+
+    async def delete(entity: int, message_ids: List[int]) -> None:
+        await use_account("work")
+
+    del_mock = mocker.patch("telegram.TelegramClient.delete_messages", side_effect=delete)
+    mocker.patch("telegram.DeletionJournal.finish_job")
+
+    results = await enforce_retention(_ENTITY_IDS[:2], timedelta(days=7), now=now)
+
+    assert del_mock.call_count == 1
+    assert isinstance(results[_ENTITY_IDS[1]].error, DeletionCancelledError)
+    assert cache.retention_checkpoint(_ENTITY_IDS[0]) is None
+    assert cache.retention_checkpoint(_ENTITY_IDS[1]) == old_checkpoint
+
+
+@pytest.mark.asyncio
+async def test_delete_messages_strategies(mocker: MockerFixture, cache: Cache) -> None:
+    """Test the `delete_messages` function dispatches the deletion requests on the cached entity types.
+
+    Args:
+        mocker: Mocker fixture instance to mock the things.
+        cache: In-memory cache used by the unit test.
+    """
+    _prepare_telegram_mocks(mocker)
+    _prepare_settings_mocks(mocker)
+    cache.replace_dialogs(
+        [
+            CachedDialog(_ENTITY_IDS[0], "Channel", "Channel"),
+            CachedDialog(_ENTITY_IDS[1], "Group", "Chat"),
+            CachedDialog(_ENTITY_IDS[2], "Bob", "User"),
+        ]
+    )
+    mocker.patch(
+        "telegram.TelegramClient.iter_messages", side_effect=lambda **_: _AsyncIterator(get_mocked_messages(2))
+    )
+    call_mock = mocker.patch("telegram.TelegramClient.__call__", side_effect=AsyncMock())
+    del_mock = mocker.patch("telegram.TelegramClient.delete_messages", side_effect=AsyncMock())
+
+    actual_result = await delete_messages(_ENTITY_IDS, concurrency=1)
+
+    assert actual_result == {entity_id: DeletionResult(deleted_count=2) for entity_id in _ENTITY_IDS}
+    assert del_mock.call_count == 0
+    assert call_mock.call_args_list == [
+        call(functions.channels.DeleteMessagesRequest(channel=_ENTITY_IDS[0], id=[1, 2])),
+        call(functions.messages.DeleteMessagesRequest(id=[1, 2], revoke=True)),
+        call(functions.messages.DeleteMessagesRequest(id=[1, 2], revoke=True)),
+    ]
+    metrics = rpc_metrics().snapshot()
+    assert (metrics["channels.deleteMessages"].count, metrics["messages.deleteMessages"].count) == (1, 2)
+
+
+@pytest.mark.asyncio
+async def test_delete_messages_whole_history(mocker: MockerFixture, cache: Cache) -> None:
+    """Test the whole history is deleted where it's allowed, other entities are deleted message by message.
+
+    Args:
+        mocker: Mocker fixture instance to mock the things.
+        cache: In-memory cache used by the unit test.
+    """
+    _prepare_telegram_mocks(mocker)
+    _prepare_settings_mocks(mocker)
+    cache.replace_dialogs(
+        [
+            CachedDialog(_ENTITY_IDS[0], "Channel", "Channel"),
+            CachedDialog(_ENTITY_IDS[1], "Group", "Chat"),
+            CachedDialog(_ENTITY_IDS[2], "Bob", "User"),
+        ]
+    )
+    cache.add_message_ids(_ENTITY_IDS[2], [1, 2])
+    iter_mock = mocker.patch(
+        "telegram.TelegramClient.iter_messages", side_effect=lambda **_: _AsyncIterator(get_mocked_messages(2))
+    )
+    history = [
+        types.messages.AffectedHistory(pts=1, pts_count=100, offset=1),
+        types.messages.AffectedHistory(pts=2, pts_count=5, offset=0),
+    ]
+
+    async def send(request: Any) -> Any:
+        if isinstance(request, functions.channels.DeleteParticipantHistoryRequest):
+            raise ChatAdminRequiredError(request=request)
+        if isinstance(request, functions.messages.DeleteHistoryRequest):
+            return history.pop(0)
+        return None
+
+    call_mock = mocker.patch("telegram.TelegramClient.__call__", side_effect=send)
+
+    actual_result = await delete_messages(_ENTITY_IDS, concurrency=1, message_filter=MessageFilter(whole_history=True))
+
+    assert actual_result == {
+        _ENTITY_IDS[0]: DeletionResult(deleted_count=2),
+        _ENTITY_IDS[1]: DeletionResult(deleted_count=2),
+        _ENTITY_IDS[2]: DeletionResult(deleted_count=105),
+    }
+    assert iter_mock.call_count == 2
+    # The chunks are deleted by the delete stage workers, the whole history is deleted by the scan stage.
+    expected_calls = [
+        call(
+            functions.channels.DeleteParticipantHistoryRequest(
+                channel=_ENTITY_IDS[0], participant=types.InputPeerSelf()
+            )
+        ),
+        call(functions.channels.DeleteMessagesRequest(channel=_ENTITY_IDS[0], id=[1, 2])),
+        call(functions.messages.DeleteMessagesRequest(id=[1, 2], revoke=True)),
+        call(functions.messages.DeleteHistoryRequest(peer=_ENTITY_IDS[2], max_id=0, revoke=True)),
+        call(functions.messages.DeleteHistoryRequest(peer=_ENTITY_IDS[2], max_id=0, revoke=True)),
+    ]
+    assert len(call_mock.call_args_list) == len(expected_calls)
+    assert all(expected in call_mock.call_args_list for expected in expected_calls)
+    assert cache.message_ids(_ENTITY_IDS[2]) == []
+    assert unfinished_deletion() is None
+
+
+@pytest.mark.asyncio
+async def test_resume_deletion(mocker: MockerFixture) -> None:
+    """Test the `resume_deletion` function continues the failed entities of the interrupted job only.
+
+    Args:
+        mocker: Mocker fixture instance to mock the things.
+    """
+    _prepare_telegram_mocks(mocker)
+    _prepare_settings_mocks(mocker)
+    error = RuntimeError("Connection lost")
+    failing = True
+
+    def iter_messages(entity: int, from_user: str, min_id: int, reverse: bool) -> _AsyncIterator:
+        if entity == _ENTITY_IDS[1] and failing:
+            return _AsyncIterator(get_mocked_messages(_MESSAGES_PAGE_SIZE), error=error)
+        return _AsyncIterator(get_mocked_messages(2, first_id=min_id + 1))
+
+    iter_mock = mocker.patch("telegram.TelegramClient.iter_messages", side_effect=iter_messages)
+    del_mock = mocker.patch("telegram.TelegramClient.delete_messages", side_effect=AsyncMock())
+
+    assert unfinished_deletion() is None
+    actual_result = await delete_messages(_ENTITY_IDS[:2])
+    assert actual_result == {
+        _ENTITY_IDS[0]: DeletionResult(deleted_count=2),
+        _ENTITY_IDS[1]: DeletionResult(error=error),
+    }
+    job = unfinished_deletion()
+    assert job is not None
+    assert job.pending_ids == [_ENTITY_IDS[1]]
+
+    failing = False
+    iter_mock.reset_mock()
+    del_mock.reset_mock()
+    actual_result = await resume_deletion()
+    assert actual_result == {
+        _ENTITY_IDS[0]: DeletionResult(deleted_count=2),
+        _ENTITY_IDS[1]: DeletionResult(deleted_count=_MESSAGES_PAGE_SIZE + 2),
+    }
+    assert iter_mock.call_args_list == [
+        call(entity=_ENTITY_IDS[1], from_user=_FROM_USER, min_id=_MESSAGES_PAGE_SIZE, reverse=True)
+    ]
+    assert del_mock.call_args_list == [
+        call(_ENTITY_IDS[1], list(range(1, _MESSAGES_PAGE_SIZE + 1))),
+        call(_ENTITY_IDS[1], [_MESSAGES_PAGE_SIZE + 1, _MESSAGES_PAGE_SIZE + 2]),
+    ]
+    assert unfinished_deletion() is None
+    assert await resume_deletion() == {}
+
+
+@pytest.mark.asyncio
+async def test_delete_messages_cancelled(mocker: MockerFixture) -> None:
+    """Test the `delete_messages` function finishes the chunk in flight and keeps the job resumable on cancellation.
+
+    Args:
+        mocker: Mocker fixture instance to mock the things.
+    """
+    _prepare_telegram_mocks(mocker)
+    _prepare_settings_mocks(mocker)
+    cancel_token = CancelToken()
+    mocker.patch(
+        "telegram.TelegramClient.iter_messages",
+        side_effect=lambda **_: _AsyncIterator(get_mocked_messages(_DELETE_CHUNK_SIZE * 3)),
+    )
+
+    async def delete(entity: int, message_ids: List[int]) -> None:
+        cancel_token.cancel()
+
+    del_mock = mocker.patch("telegram.TelegramClient.delete_messages", side_effect=delete)
+
+    actual_result = await delete_messages(_ENTITY_IDS[:2], concurrency=1, cancel_token=cancel_token)
+
+    assert list(actual_result) == _ENTITY_IDS[:2]
+    assert actual_result[_ENTITY_IDS[0]].deleted_count == _DELETE_CHUNK_SIZE
+    assert isinstance(actual_result[_ENTITY_IDS[0]].error, DeletionCancelledError)
+    assert actual_result[_ENTITY_IDS[1]].deleted_count == 0
+    assert isinstance(actual_result[_ENTITY_IDS[1]].error, DeletionCancelledError)
+    assert del_mock.call_count == 1
+    job = unfinished_deletion()
+    assert job is not None
+    assert job.pending_ids == _ENTITY_IDS[:2]
+
+
+@pytest.mark.asyncio
+async def test_count_messages(mocker: MockerFixture) -> None:
+    """Test the `count_messages` function asks for the total counts only and isolates the failing entities.
+
+    Args:
+        mocker: Mocker fixture instance to mock the things.
+    """
+    _prepare_telegram_mocks(mocker)
+    _prepare_settings_mocks(mocker)
+    error = RuntimeError("Could not find the input entity")
+    min_date = datetime(2023, 1, 1, tzinfo=timezone.utc)
+
+    async def get_messages(entity: int, limit: int, from_user: str, **params: Any) -> TotalList:
+        if entity == _ENTITY_IDS[1]:
+            raise error
+        result = TotalList()
+        result.total = 10 if "offset_date" in params else 250
+        return result
+
+    get_mock = mocker.patch("telegram.TelegramClient.get_messages", side_effect=get_messages)
+    iter_mock = mocker.patch("telegram.TelegramClient.iter_messages")
+    on_count_mock = MagicMock()
+
+    actual_result = await count_messages(_ENTITY_IDS[:2], on_count=on_count_mock)
+    assert actual_result == {
+        _ENTITY_IDS[0]: CountResult(message_count=250),
+        _ENTITY_IDS[1]: CountResult(error=error),
+    }
+    assert on_count_mock.call_count == 2
+    assert get_mock.call_args_list[0] == call(_ENTITY_IDS[0], limit=0, from_user=_FROM_USER)
+
+    get_mock.reset_mock()
+    actual_result = await count_messages(_ENTITY_IDS[:1], message_filter=MessageFilter(search="x", min_date=min_date))
+    assert actual_result == {_ENTITY_IDS[0]: CountResult(message_count=240)}
+    assert get_mock.call_args_list == [
+        call(_ENTITY_IDS[0], limit=0, from_user=_FROM_USER, search="x"),
+        call(_ENTITY_IDS[0], limit=0, from_user=_FROM_USER, search="x", offset_date=min_date),
+    ]
+    assert iter_mock.call_count == 0
+    assert rpc_metrics().snapshot()["count_messages"].count == 4
+
+
+def test_estimate_deletion_seconds(mocker: MockerFixture) -> None:
+    """Test the `estimate_deletion_seconds` function counts the scan & delete requests at the current rate.
+
+    Args:
+        mocker: Mocker fixture instance to mock the things.
+    """
+    mocker.patch("telegram._RATE_LIMITER", RateLimiter(rate=2.0))
+
+    assert estimate_deletion_seconds([]) == 0.0
+    assert estimate_deletion_seconds([250, 0, 100]) == pytest.approx((3 + 3 + 1 + 1) / 2.0)
+
+
+@pytest.mark.asyncio
+async def test_use_account(mocker: MockerFixture, data_path: Path) -> None:
+    """Test the `use_account` function switches the session and the credentials of the client.
+
+    Args:
+        mocker: Mocker fixture instance to mock the things.
+        data_path: Data directory used by the unit test.
+    """
+    con_mock, disc_mock = _prepare_telegram_mocks(mocker)
+    init_mock = mocker.patch("telegram.TelegramClient.__init__", return_value=None)
+    id_mock, hash_mock = _prepare_settings_mocks(mocker)
+    mocker.patch("telegram.TelegramClient.iter_dialogs", side_effect=lambda **_: _AsyncIterator(_DIALOGS))
+
+    await fetch_all_dialogs(resync=True)
+    await use_account("second")
+    await fetch_all_dialogs(resync=True)
+
+    assert current_account() == "second"
+    assert con_mock.call_count == 2
+    assert disc_mock.call_count == 1
+    assert init_mock.call_args_list == [
+        call(str(data_path / f"{DEFAULT_ACCOUNT}.session"), 111999, "456999", flood_sleep_threshold=0, connection=ANY),
+        call(str(data_path / "second.session"), 111999, "456999", flood_sleep_threshold=0, connection=ANY),
+    ]
+    assert id_mock.call_args_list == [call(DEFAULT_ACCOUNT), call("second")]
+    assert hash_mock.call_args_list == [call(DEFAULT_ACCOUNT), call("second")]
 
 
 def _prepare_telegram_mocks(mocker: MockerFixture) -> Tuple[MagicMock, MagicMock]:
@@ -110,13 +1129,14 @@ def _prepare_telegram_mocks(mocker: MockerFixture) -> Tuple[MagicMock, MagicMock
         Telegram client mocks to be used with the unit tests.
     """
 
-    def telegram_client_constructor(session_name: str, api_id: int, api_hash: str) -> None:
+    def telegram_client_constructor(session_name: str, api_id: int, api_hash: str, **kwargs: Any) -> None:
         """Fake constructor implementation of the Telethon client library."""
         _LOGGER.debug("Telethon ctor. Session: %s. API ID: %d. API hash: %s", session_name, api_id, api_hash)
 
     mocker.patch("telegram.TelegramClient.__init__", wraps=telegram_client_constructor)
     con_mock = mocker.patch("telegram.TelegramClient.connect", wraps=AsyncMock())
     disc_mock = mocker.patch("telegram.TelegramClient.disconnect", wraps=AsyncMock())
+    mocker.patch("telegram.TelegramClient.is_connected", side_effect=lambda: con_mock.call_count > disc_mock.call_count)
     return con_mock, disc_mock
 
 
@@ -126,8 +1146,8 @@ def _prepare_settings_mocks(mocker: MockerFixture) -> Tuple[MagicMock, MagicMock
     Returns:
         Application settings related mocks to be used with the unit tests.
     """
-    id_mock = mocker.patch("telegram.AppSettings.api_id", return_value=111999)
-    hash_mock = mocker.patch("telegram.AppSettings.api_hash", return_value="456999")
+    id_mock = mocker.patch("settings.AppSettings.api_id", return_value=111999)
+    hash_mock = mocker.patch("settings.AppSettings.api_hash", return_value="456999")
     return id_mock, hash_mock
 
 
@@ -136,8 +1156,9 @@ class _AsyncIterator:
 
     AsyncIteratorType = TypeVar("AsyncIteratorType")
 
-    def __init__(self, seq: Collection[AsyncIteratorType]) -> None:
+    def __init__(self, seq: Collection[AsyncIteratorType], error: Optional[Exception] = None) -> None:
         self._iter = iter(seq)
+        self._error = error
 
     def __aiter__(self) -> _AsyncIterator:
         return self
@@ -146,4 +1167,6 @@ class _AsyncIterator:
         try:
             return next(self._iter)
         except StopIteration:
+            if self._error is not None:
+                raise self._error
             raise StopAsyncIteration